@@ -1,11 +1,19 @@
 """
 AI Service
 Handles AI text generation using Anthropic Claude
+
+One long-lived client per process (connection pool reused across requests).
+429 / 5xx / connection errors are retried by the SDK with exponential backoff,
+honouring Retry-After (same LLM_MAX_RETRIES / LLM_TIMEOUT_SECONDS settings as
+the backend's LLM gateway). ANTHROPIC_BASE_URL points it at a local stub.
 """
 import os
 from anthropic import Anthropic
 from typing import Optional
 
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
 # Global client for lazy loading
 _claude_client = None
 
@@ -20,7 +28,7 @@ def get_claude_client():
             print("⚠️ ANTHROPIC_API_KEY not found in environment")
             return None
 
-        _claude_client = Anthropic(api_key=api_key)
+        _claude_client = Anthropic(api_key=api_key, max_retries=LLM_MAX_RETRIES, timeout=LLM_TIMEOUT_SECONDS)
         print("✅ Claude client initialized")
 
     return _claude_client
@@ -11,6 +11,7 @@ from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
 
 from ..services.gemini_script_generator import GeminiScriptGenerator
+from ..services.llm_gateway import llm_gateway
 from ..core.database import get_db
 from ..db.models import User, UserScript, ChatMessage, UserSettings
 from ..api.dependencies import get_current_user
@@ -294,7 +295,8 @@ async def generate_script(
             )
 
         # Generate script
-        script = _get_generator().generate_script(
+        script = await llm_gateway.run(
+            _get_generator().generate_script,
             video_description=request.video_description,
             video_stats=request.video_stats,
             tone=request.tone,
@@ -417,8 +419,7 @@ Keep the response focused and actionable."""
                 from pathlib import Path
                 import uuid as _uuid
 
-                gen = _get_generator()
-                if gen.client is None:
+                if not llm_gateway.available("gemini"):
                     raise Exception("Gemini API not initialized")
 
                 uploads_dir = Path(__file__).parent.parent.parent / "uploads" / "generated"
@@ -429,12 +430,18 @@ Keep the response focused and actionable."""
                 img_response = None
                 for img_model in image_models:
                     try:
-                        img_response = gen.client.models.generate_content(
-                            model=img_model,
-                            contents=request.message,
-                            config=types.GenerateContentConfig(
-                                response_modalities=["Text", "Image"]
-                            )
+                        img_response = await llm_gateway.run(
+                            llm_gateway.call,
+                            "gemini",
+                            lambda client, img_model=img_model: client.models.generate_content(
+                                model=img_model,
+                                contents=request.message,
+                                config=types.GenerateContentConfig(
+                                    response_modalities=["Text", "Image"]
+                                )
+                            ),
+                            img_model,
+                            request.message
                         )
                         if img_response.candidates:
                             print(f"[AI] Image generated with model: {img_model}")
@@ -470,12 +477,13 @@ Keep the response focused and actionable."""
                 ai_response = f"Ошибка генерации изображения: {str(img_err)}"
         else:
             # Generate text response
-            response = _get_generator().client.models.generate_content(
-                model="gemini-2.0-flash" if model_name == "gemini-flash" else "gemini-2.0-pro",
-                contents=prompt
+            ai_response = await llm_gateway.run(
+                llm_gateway.generate,
+                "gemini",
+                prompt,
+                "gemini-2.0-flash" if model_name == "gemini-flash" else "gemini-2.0-pro"
             )
-
-            ai_response = response.text.strip() if response.text else "I couldn't generate a response. Please try again."
+            ai_response = ai_response or "I couldn't generate a response. Please try again."
 
         # Deduct credits
         deduct_credits(current_user, cost, db)
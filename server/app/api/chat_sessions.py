@@ -5,7 +5,6 @@ Chat Sessions API
 Manages AI chat sessions and message history for users.
 Supports multiple AI providers: Gemini, Claude, GPT
 """
-import os
 import uuid
 from datetime import datetime
 from typing import List, Optional
@@ -17,64 +16,63 @@ from sqlalchemy import desc
 from ..core.database import get_db
 from ..db.models import User, ChatSession, ChatMessage
 from .dependencies import get_current_user, CreditManager
+from ..services.partitions import partition_manager
+from ..services.llm_gateway import llm_gateway, LLMRateLimitError, LLMUnavailableError
 
 router = APIRouter(tags=["Chat Sessions"])
 
 # =============================================================================
-# AI CLIENTS - Lazy initialization
+# AI GENERATION (clients, rate limits and retries live in the LLM gateway)
 # =============================================================================
 
-_gemini_client = None
-_anthropic_client = None
-_openai_client = None
+def _generate_image(user_message: str) -> str:
+    """Nano Bana: image generation with Gemini (blocking)"""
+    from google.genai import types
+    from pathlib import Path
+    import uuid as _uuid
+
+    model = "gemini-2.5-flash-image"
+    response = llm_gateway.call(
+        "gemini",
+        lambda client: client.models.generate_content(
+            model=model,
+            contents=user_message,
+            config=types.GenerateContentConfig(
+                response_modalities=["Text", "Image"]
+            )
+        ),
+        model,
+        prompt=user_message
+    )
 
-def get_gemini_client():
-    """Get or create Gemini client"""
-    global _gemini_client
-    if _gemini_client is None:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if api_key:
-            try:
-                from google import genai
-                _gemini_client = genai.Client(api_key=api_key)
-                print("[AI] Gemini client initialized")
-            except Exception as e:
-                print(f"[AI] Failed to initialize Gemini: {e}")
-    return _gemini_client
-
-def get_anthropic_client():
-    """Get or create Anthropic (Claude) client"""
-    global _anthropic_client
-    if _anthropic_client is None:
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if api_key and not api_key.startswith("your-"):
-            try:
-                import anthropic
-                _anthropic_client = anthropic.Anthropic(api_key=api_key)
-                print("[AI] Anthropic client initialized")
-            except Exception as e:
-                print(f"[AI] Failed to initialize Anthropic: {e}")
-    return _anthropic_client
-
-def get_openai_client():
-    """Get or create OpenAI client"""
-    global _openai_client
-    if _openai_client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key and not api_key.startswith("your-"):
-            try:
-                from openai import OpenAI
-                _openai_client = OpenAI(api_key=api_key)
-                print("[AI] OpenAI client initialized")
-            except Exception as e:
-                print(f"[AI] Failed to initialize OpenAI: {e}")
-    return _openai_client
+    result_parts = []
+    uploads_dir = Path(__file__).parent.parent.parent / "uploads" / "generated"
+    uploads_dir.mkdir(parents=True, exist_ok=True)
+
+    for part in response.candidates[0].content.parts:
+        if hasattr(part, 'inline_data') and part.inline_data:
+            # Save image to file
+            ext = "png" if "png" in (part.inline_data.mime_type or "") else "jpg"
+            filename = f"{_uuid.uuid4().hex}.{ext}"
+            filepath = uploads_dir / filename
+            filepath.write_bytes(part.inline_data.data)
+            img_url = f"/uploads/generated/{filename}"
+            result_parts.append(f"![Generated Image]({img_url})")
+            print(f"[AI] Image saved: {filepath} ({len(part.inline_data.data)} bytes)")
+        elif hasattr(part, 'text') and part.text:
+            result_parts.append(part.text.strip())
+
+    if result_parts:
+        return "\n\n".join(result_parts)
+    return "Could not generate an image. Try a more descriptive prompt."
 
 
 async def generate_ai_response(model: str, system_prompt: str, user_message: str, history_text: str = "", mode: str = "") -> str:
     """
     Generate AI response using the specified model.
     Supports: gemini, claude, gpt4
+    Calls go through the LLM gateway in a worker thread: a burst waits for
+    the provider's rate budget instead of blocking the event loop or failing.
     """
     # Skip generic formatting instructions for modes that have strict formatting rules
     if mode == "prompt-enhancer":
@@ -90,94 +88,23 @@ CONVERSATION HISTORY:
 USER REQUEST: {user_message}{suffix}"""
 
     try:
-        if model == "gemini":
-            client = get_gemini_client()
-            if not client:
-                raise Exception("Gemini API not configured - add GEMINI_API_KEY to .env")
-
-            # Try newer model first, fallback to older
-            try:
-                response = client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=full_prompt
-                )
-            except Exception:
-                # Fallback to gemini-1.5-flash-latest
-                response = client.models.generate_content(
-                    model="gemini-1.5-flash-latest",
-                    contents=full_prompt
-                )
-            return response.text.strip() if response.text else "I couldn't generate a response."
-
-        elif model == "claude":
-            client = get_anthropic_client()
-            if not client:
-                raise Exception("Claude API not configured - add valid ANTHROPIC_API_KEY to .env")
-
-            response = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=4096,
-                messages=[
-                    {"role": "user", "content": full_prompt}
-                ]
-            )
-            return response.content[0].text.strip() if response.content else "I couldn't generate a response."
+        if model in ("gemini", "claude"):
+            text = await llm_gateway.run(llm_gateway.generate, model, full_prompt)
+            return text or "I couldn't generate a response."
 
         elif model == "gpt4":
-            client = get_openai_client()
-            if not client:
-                raise Exception("OpenAI API not configured - add valid OPENAI_API_KEY to .env")
-
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"CONVERSATION HISTORY:\n{history_text}\n\nUSER REQUEST: {user_message}"}
-                ],
-                max_tokens=4096
+            text = await llm_gateway.run(
+                llm_gateway.generate, "gpt4",
+                f"CONVERSATION HISTORY:\n{history_text}\n\nUSER REQUEST: {user_message}",
+                system=system_prompt
             )
-            return response.choices[0].message.content.strip() if response.choices else "I couldn't generate a response."
+            return text or "I couldn't generate a response."
 
         elif model == "nano-bana":
-            # Image generation using Gemini
-            client = get_gemini_client()
-            if not client:
-                raise Exception("Gemini API not configured - add GEMINI_API_KEY to .env")
-
             try:
-                from google.genai import types
-                from pathlib import Path
-                import uuid as _uuid
-
-                response = client.models.generate_content(
-                    model="gemini-2.5-flash-image",
-                    contents=user_message,
-                    config=types.GenerateContentConfig(
-                        response_modalities=["Text", "Image"]
-                    )
-                )
-
-                result_parts = []
-                uploads_dir = Path(__file__).parent.parent.parent / "uploads" / "generated"
-                uploads_dir.mkdir(parents=True, exist_ok=True)
-
-                for part in response.candidates[0].content.parts:
-                    if hasattr(part, 'inline_data') and part.inline_data:
-                        # Save image to file
-                        ext = "png" if "png" in (part.inline_data.mime_type or "") else "jpg"
-                        filename = f"{_uuid.uuid4().hex}.{ext}"
-                        filepath = uploads_dir / filename
-                        filepath.write_bytes(part.inline_data.data)
-                        img_url = f"/uploads/generated/{filename}"
-                        result_parts.append(f"![Generated Image]({img_url})")
-                        print(f"[AI] Image saved: {filepath} ({len(part.inline_data.data)} bytes)")
-                    elif hasattr(part, 'text') and part.text:
-                        result_parts.append(part.text.strip())
-
-                if result_parts:
-                    return "\n\n".join(result_parts)
-                return "Could not generate an image. Try a more descriptive prompt."
-
+                return await llm_gateway.run(_generate_image, user_message)
+            except LLMUnavailableError:
+                raise
             except Exception as img_err:
                 print(f"[AI] Nano Bana image generation error: {img_err}")
                 return await generate_ai_response("gemini", "You are an image generation assistant. The user wants to generate an image. Describe in detail what the image would look like, and apologize that image generation is temporarily unavailable.", user_message, history_text)
@@ -196,7 +123,7 @@ USER REQUEST: {user_message}{suffix}"""
             raise Exception(f"{model_name}: insufficient API credits. Top up your provider account.")
         elif "invalid x-api-key" in error_str or "invalid api key" in error_str or "authentication_error" in error_str:
             raise Exception(f"Invalid API key for {model}. Check your .env settings.")
-        elif "rate_limit" in error_str or "429" in error_str:
+        elif isinstance(e, LLMRateLimitError):
             raise Exception(f"Rate limit exceeded for {model}. Try again in a minute.")
         else:
             raise e
@@ -382,6 +309,7 @@ async def get_credits_info(
     """
     # Check and reset monthly credits if needed
     CreditManager.check_and_reset_monthly(current_user, db)
+    db.commit()
 
     return CreditManager.get_credits_info(current_user)
 
@@ -401,13 +329,21 @@ async def get_chat_sessions(
         ChatSession.user_id == current_user.id
     ).order_by(desc(ChatSession.updated_at)).offset(skip).limit(limit).all()
 
+    # Last message preview for every session in one query (DISTINCT ON session_id)
+    last_messages = {}
+    if sessions:
+        last_messages = dict(
+            db.query(ChatMessage.session_id, ChatMessage.content).filter(
+                ChatMessage.session_id.in_([s.session_id for s in sessions]),
+                ChatMessage.created_at >= partition_manager.retention_cutoff(current_user.subscription_tier)
+            ).distinct(ChatMessage.session_id).order_by(
+                ChatMessage.session_id, desc(ChatMessage.created_at)
+            ).all()
+        )
+
     result = []
     for session in sessions:
-        # Get last message preview
-        last_msg = db.query(ChatMessage).filter(
-            ChatMessage.session_id == session.session_id
-        ).order_by(desc(ChatMessage.created_at)).first()
-
+        last_msg = last_messages.get(session.session_id)
         session_dict = {
             "id": session.id,
             "session_id": session.session_id,
@@ -420,7 +356,7 @@ async def get_chat_sessions(
             "context_data": session.context_data,
             "created_at": session.created_at,
             "updated_at": session.updated_at,
-            "last_message": last_msg.content[:100] + "..." if last_msg and len(last_msg.content) > 100 else (last_msg.content if last_msg else None)
+            "last_message": last_msg[:100] + "..." if last_msg and len(last_msg) > 100 else last_msg
         }
         result.append(ChatSessionResponse(**session_dict))
 
@@ -607,8 +543,10 @@ async def get_session_messages(
             detail="Chat session not found"
         )
 
+    # Only the tier's retention window (also prunes older partitions)
     messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session_id
+        ChatMessage.session_id == session_id,
+        ChatMessage.created_at >= partition_manager.retention_cutoff(current_user.subscription_tier)
     ).order_by(ChatMessage.created_at).offset(skip).limit(limit).all()
 
     return [ChatMessageResponse.model_validate(msg) for msg in messages]
@@ -655,7 +593,8 @@ async def send_message(
 
     # Get conversation history (last 10 messages for context)
     history = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session_id
+        ChatMessage.session_id == session_id,
+        ChatMessage.created_at >= partition_manager.retention_cutoff(current_user.subscription_tier)
     ).order_by(desc(ChatMessage.created_at)).limit(10).all()
 
     history = list(reversed(history))  # Oldest first
@@ -728,7 +667,7 @@ async def send_message(
     db.add(ai_msg)
 
     # --- DEDUCT CREDITS after successful response ---
-    remaining_credits = await CreditManager.deduct_credits(credit_cost, current_user, db)
+    remaining_credits = await CreditManager.deduct_credits(credit_cost, current_user, db, reason=f"chat:{current_model}")
     print(f"[Credits] User {current_user.id}: deducted {credit_cost}, remaining={remaining_credits}")
 
     # Update session
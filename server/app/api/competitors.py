@@ -22,7 +22,7 @@ from ..services.instagram_profile_adapter import adapt_instagram_profile_to_post
 from ..services.scorer import TrendScorer
 from ..services.apify_storage import ApifyStorage
 from ..services.storage import SupabaseStorage
-from .dependencies import get_current_user, check_rate_limit, CreditManager
+from .dependencies import get_current_user, get_read_db, check_rate_limit, CreditManager
 from .schemas.competitors import (
     CompetitorCreate,
     CompetitorUpdate,
@@ -111,11 +111,12 @@ def normalize_video_data(item: dict) -> dict:
     # Upload thumbnail to Supabase Storage using ORIGINAL signed URL
     # The signature is needed to download from TikTok CDN!
     cover_url_final = fix_tt_url(cover_raw) or cover_raw  # fallback default
+    cover_srcset = None
     if cover_raw:
         # Try with original signed URL first (best chance of success)
         uploaded_cover = SupabaseStorage.upload_thumbnail(cover_raw)
         if uploaded_cover:
-            cover_url_final = uploaded_cover
+            cover_url_final, cover_srcset = uploaded_cover[0], uploaded_cover[1] or None
         else:
             # Fallback: try with fixed URL (remove signatures, works ~1-3 days)
             cover_url_final = ApifyStorage.fix_tiktok_url(cover_raw)
@@ -126,6 +127,7 @@ def normalize_video_data(item: dict) -> dict:
         "url": item.get("postPage") or item.get("webVideoUrl") or item.get("url"),
         "cover_url": cover_url_final,
         "thumbnail_url": cover_url_final,  # Frontend expects this field
+        "cover_srcset": cover_srcset,  # Responsive WebP/AVIF variants
         "video_url": video_url,
         "uploaded_at": uploaded_at,
         "views": int(views),
@@ -224,7 +226,7 @@ def get_all_competitors(
     per_page: int = 20,
     active_only: bool = True,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get paginated list of tracked competitors.
@@ -316,6 +318,7 @@ async def add_competitor(
 
     # Deduct credits
     await CreditManager.check_and_deduct("competitor_add", current_user, db)
+    db.commit()  # Don't hold the users row lock through the Apify fetch
 
     logger.info(f"[SEARCH] User {current_user.id} adding competitor: @{clean_username}")
 
@@ -526,7 +529,8 @@ def delete_competitor(
         # Clean up images from Supabase Storage before deleting DB record
         deleted_count = SupabaseStorage.cleanup_competitor(
             avatar_url=competitor.avatar_url or "",
-            recent_videos=competitor.recent_videos or []
+            recent_videos=competitor.recent_videos or [],
+            competitor_id=competitor.id
         )
         if deleted_count:
             logger.info(f"[DELETE] Cleaned {deleted_count} images from Supabase for @{clean_username}")
@@ -676,6 +680,7 @@ def spy_competitor(
             title=vid.get("title", ""),
             url=vid.get("url", ""),
             cover_url=vid.get("cover_url"),
+            cover_srcset=vid.get("cover_srcset"),
             uploaded_at=vid.get("uploaded_at"),
             views=vid.get("views", 0),
             stats=CompetitorVideoStats(**vid.get("stats", {})),
@@ -706,7 +711,7 @@ def spy_competitor(
 def get_competitor_feed(
     username: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get competitor's full feed with recent videos.
@@ -790,6 +795,7 @@ def get_competitor_feed(
             title=vid.get("title", ""),
             description=vid.get("title", ""),  # TikTok doesn't have separate description
             thumbnail_url=cover_url_value,
+            cover_srcset=vid.get("cover_srcset"),
             video_url=vid.get("video_url"),  # Add video URL for playback
             url=vid.get("url", ""),
             stats=CompetitorVideoStats(
@@ -13,20 +13,25 @@ Security Standards:
 - Timing-safe comparisons
 - Proper error masking (no information leakage)
 """
+import asyncio
+import math
 import time
 import hashlib
 import logging
 from datetime import datetime
 from typing import Optional, Dict, Any
-from collections import defaultdict
 
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import Depends, HTTPException, status, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
 from ..core.database import get_db
-from ..core.security import decode_token
+from ..core.db_router import replica_router
+from ..core.rate_limit import RateLimitResult, create_rate_limit_store
+from ..core.security import decode_token_async
+from ..core.user_cache import user_cache
 from ..db.models import User, UserSettings, SubscriptionTier
+from ..services.credit_ledger import credit_ledger
 
 # Logger for authentication debugging and monitoring
 logger = logging.getLogger(__name__)
@@ -45,9 +50,10 @@ security = HTTPBearer(auto_error=False)  # auto_error=False for optional auth
 
 class RateLimiter:
     """
-    In-memory rate limiter with sliding window algorithm.
+    Per-tier rate limiter (GCRA, O(1) state per user).
 
-    For production at scale, consider Redis-based implementation.
+    State lives in the shared store (Redis) when REDIS_URL is set, so limits hold
+    across all uvicorn workers; otherwise it is kept in-process.
 
     Limits per tier (requests per minute):
     - FREE: 10 req/min
@@ -71,37 +77,37 @@ class RateLimiter:
         SubscriptionTier.AGENCY: 100,
     }
 
-    def __init__(self):
-        # {user_id: [(timestamp, count), ...]}
-        self._requests: Dict[int, list] = defaultdict(list)
-        self._deep_analyze_daily: Dict[str, int] = defaultdict(int)  # "user_id:date" -> count
+    def __init__(self, store=None):
+        self._store = store
         self._window_seconds = 60  # 1 minute window
 
-    def _clean_old_requests(self, user_id: int) -> None:
-        """Remove requests older than the window."""
-        cutoff = time.time() - self._window_seconds
-        self._requests[user_id] = [
-            (ts, count) for ts, count in self._requests[user_id]
-            if ts > cutoff
-        ]
+    @property
+    def store(self):
+        """Lazy init -- the backend is chosen on first use, after settings are loaded."""
+        if self._store is None:
+            self._store = create_rate_limit_store()
+        return self._store
 
-    def _get_request_count(self, user_id: int) -> int:
-        """Get total requests in current window."""
-        self._clean_old_requests(user_id)
-        return sum(count for _, count in self._requests[user_id])
+    @staticmethod
+    def _seconds_until_midnight() -> float:
+        now = datetime.utcnow()
+        return 86400 - (now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6)
 
-    def check_rate_limit(self, user_id: int, tier: SubscriptionTier) -> None:
+    def check_rate_limit(self, user_id: int, tier: SubscriptionTier) -> RateLimitResult:
         """
-        Check if user is within rate limits.
+        Check if user is within rate limits and count this request.
+
+        Returns:
+            RateLimitResult for the X-RateLimit-* response headers
 
         Raises:
             HTTPException: 429 if rate limit exceeded
         """
         limit = self.TIER_LIMITS.get(tier, 10)
-        current = self._get_request_count(user_id)
+        result = self.store.gcra(f"req:{user_id}", limit, self._window_seconds)
 
-        if current >= limit:
-            retry_after = self._window_seconds
+        if not result.allowed:
+            retry_after = max(1, math.ceil(result.retry_after))
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 detail={
@@ -112,11 +118,10 @@ class RateLimiter:
                     "retry_after": retry_after,
                     "upgrade_url": "/pricing"
                 },
-                headers={"Retry-After": str(retry_after)}
+                headers={"Retry-After": str(retry_after), **rate_limit_headers(result)}
             )
 
-        # Record this request
-        self._requests[user_id].append((time.time(), 1))
+        return result
 
     def check_deep_analyze_limit(self, user_id: int, tier: SubscriptionTier) -> None:
         """
@@ -148,38 +153,37 @@ class RateLimiter:
             )
 
         today = datetime.utcnow().strftime("%Y-%m-%d")
-        key = f"{user_id}:{today}"
+        key = f"deep:{user_id}:{today}"
 
-        if self._deep_analyze_daily[key] >= daily_limit:
+        # Counter expires at UTC midnight -- no stale per-day keys are kept
+        allowed, current = self.store.hit_counter(key, daily_limit, self._seconds_until_midnight())
+        if not allowed:
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 detail={
                     "error": "Daily Deep Analyze limit reached",
                     "limit": daily_limit,
-                    "current": self._deep_analyze_daily[key],
+                    "current": current,
                     "resets_at": f"{today}T00:00:00Z (next day)",
                     "upgrade_url": "/pricing"
                 }
             )
 
-        # Increment counter
-        self._deep_analyze_daily[key] += 1
-
     def get_remaining_limits(self, user_id: int, tier: SubscriptionTier) -> Dict[str, Any]:
-        """Get remaining limits for user."""
+        """Get remaining limits for user (does not count as a request)."""
         limit = self.TIER_LIMITS.get(tier, 10)
-        current = self._get_request_count(user_id)
+        result = self.store.gcra(f"req:{user_id}", limit, self._window_seconds, cost=0)
 
         today = datetime.utcnow().strftime("%Y-%m-%d")
-        deep_key = f"{user_id}:{today}"
         deep_limit = self.DEEP_ANALYZE_LIMITS.get(tier, 0)
-        deep_current = self._deep_analyze_daily.get(deep_key, 0)
+        deep_current = self.store.get_counter(f"deep:{user_id}:{today}")
 
         return {
             "rate_limit": {
                 "limit": limit,
-                "remaining": max(0, limit - current),
-                "window_seconds": self._window_seconds
+                "remaining": result.remaining,
+                "window_seconds": self._window_seconds,
+                "reset_after": math.ceil(result.reset_after)
             },
             "deep_analyze": {
                 "limit": deep_limit,
@@ -189,6 +193,15 @@ class RateLimiter:
         }
 
 
+def rate_limit_headers(result: RateLimitResult) -> Dict[str, str]:
+    """X-RateLimit-* response headers for a limiter result."""
+    return {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(result.remaining),
+        "X-RateLimit-Reset": str(math.ceil(result.reset_after)),
+    }
+
+
 # Global rate limiter instance
 rate_limiter = RateLimiter()
 
@@ -242,7 +255,7 @@ async def get_current_user(
             detail="Authentication required",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    payload = decode_token(token)
+    payload = await decode_token_async(token)
 
     if payload is None:
         raise HTTPException(
@@ -270,8 +283,8 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
+    # Get user (short-TTL snapshot cache, falls back to the database)
+    user = user_cache.load(db, user_id)
 
     if user is None:
         raise HTTPException(
@@ -287,9 +300,28 @@ async def get_current_user(
             detail="Account is disabled. Contact support.",
         )
 
+    # Commits on this session pin the user's reads to the primary (read-your-writes)
+    db.info["user_id"] = user.id
+
     return user
 
 
+def get_read_db(current_user: User = Depends(get_current_user)):
+    """
+    Session for read-only endpoints: the replica when it is fresh enough and the
+    user hasn't written recently, otherwise the primary (see core.db_router).
+    Flushing a replica session raises -- endpoints that write use get_db.
+    """
+    db = replica_router.read_session(current_user.id)
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 async def get_current_user_optional(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
@@ -419,12 +451,18 @@ require_agency = RequireSubscription(SubscriptionTier.AGENCY)
 # =============================================================================
 
 async def check_rate_limit(
+    response: Response,
     current_user: User = Depends(get_current_user)
 ) -> User:
     """
     Check and enforce rate limits based on user's subscription tier.
+    Sets X-RateLimit-Remaining / X-RateLimit-Reset on the response.
+    The store call is blocking (Redis round trip) -- run off the event loop.
     """
-    rate_limiter.check_rate_limit(current_user.id, current_user.subscription_tier)
+    result = await asyncio.to_thread(
+        rate_limiter.check_rate_limit, current_user.id, current_user.subscription_tier
+    )
+    response.headers.update(rate_limit_headers(result))
     return current_user
 
 
@@ -434,7 +472,9 @@ async def check_deep_analyze_limit(
     """
     Check and enforce deep analyze limits.
     """
-    rate_limiter.check_deep_analyze_limit(current_user.id, current_user.subscription_tier)
+    await asyncio.to_thread(
+        rate_limiter.check_deep_analyze_limit, current_user.id, current_user.subscription_tier
+    )
     return current_user
 
 
@@ -444,7 +484,8 @@ async def get_user_limits(
     """
     Get user's current rate limit status.
     """
-    return rate_limiter.get_remaining_limits(
+    return await asyncio.to_thread(
+        rate_limiter.get_remaining_limits,
         current_user.id,
         current_user.subscription_tier
     )
@@ -595,6 +636,11 @@ class CreditManager:
         """Get credit cost for an AI model per message."""
         return cls.MODEL_COSTS.get(model, 1)
 
+    @staticmethod
+    def reload_credits(user: User, db: Session) -> None:
+        """Re-read the balance from the DB -- the user may come from the snapshot cache."""
+        db.refresh(user, attribute_names=["credits", "credits_reset_at"])
+
     @classmethod
     def check_and_reset_monthly(cls, user: User, db: Session) -> None:
         """
@@ -605,20 +651,18 @@ class CreditManager:
 
         now = datetime.utcnow()
 
-        # If credits_reset_at is not set, initialize it
-        if user.credits_reset_at is None:
-            user.credits_reset_at = now + relativedelta(months=1)
-            monthly_limit = cls.get_monthly_limit(user.subscription_tier)
-            user.credits = monthly_limit
-            db.commit()
-            return
-
-        # Check if reset time has passed
-        if now >= user.credits_reset_at:
-            monthly_limit = cls.get_monthly_limit(user.subscription_tier)
-            user.credits = monthly_limit
-            user.credits_reset_at = now + relativedelta(months=1)
-            db.commit()
+        # Live balance -- callers check credits right after this
+        cls.reload_credits(user, db)
+
+        # Not initialized yet, or a month has passed: reset to the plan's allocation
+        # (atomic + conditional, so concurrent requests reset only once)
+        if user.credits_reset_at is None or now >= user.credits_reset_at:
+            credit_ledger.reset_monthly(
+                db,
+                user,
+                cls.get_monthly_limit(user.subscription_tier),
+                now + relativedelta(months=1)
+            )
 
     @classmethod
     async def check_credits_for_chat(
@@ -657,12 +701,11 @@ class CreditManager:
         cls,
         cost: int,
         user: User,
-        db: Session
+        db: Session,
+        reason: str = "chat"
     ) -> int:
-        """Deduct credits after successful AI response. Returns remaining credits."""
-        user.credits = max(0, user.credits - cost)
-        db.commit()
-        return user.credits
+        """Deduct credits after successful AI response (never below 0). Returns remaining credits."""
+        return credit_ledger.debit(db, user, cost, reason, allow_partial=True)
 
     @classmethod
     async def check_and_deduct(
@@ -673,13 +716,15 @@ class CreditManager:
     ) -> None:
         """
         Check if user has enough credits and deduct (for non-chat operations).
+        One atomic statement -- no read-modify-write. The caller commits.
 
         Raises:
             HTTPException: 402 if insufficient credits
         """
         cost = cls.OPERATION_COSTS.get(operation, 1)
 
-        if user.credits < cost:
+        if credit_ledger.debit(db, user, cost, operation) is None:
+            cls.reload_credits(user, db)
             raise HTTPException(
                 status_code=status.HTTP_402_PAYMENT_REQUIRED,
                 detail={
@@ -691,9 +736,6 @@ class CreditManager:
                 }
             )
 
-        user.credits -= cost
-        db.commit()
-
     @classmethod
     def get_operation_cost(cls, operation: str) -> int:
         """Get cost for an operation."""
@@ -732,4 +774,5 @@ async def require_credits(
             ...
     """
     await CreditManager.check_and_deduct(operation, current_user, db)
+    db.commit()  # Nothing else pending yet -- charge before the handler runs
     return current_user
@@ -13,8 +13,10 @@ from sqlalchemy.orm import Session, joinedload
 
 from ..core.database import get_db
 from pydantic import BaseModel
-from ..db.models import User, Trend, UserFavorite, SearchMode as DBSearchMode
-from .dependencies import get_current_user, check_rate_limit
+from ..db.models import User, Trend, UserTrend, UserFavorite, SearchMode as DBSearchMode
+from ..services.thumbnail_pipeline import thumbnail_pipeline
+from ..services.trend_upsert import bulk_upsert_trends
+from .dependencies import get_current_user, get_read_db, check_rate_limit
 from .schemas.favorites import (
     FavoriteCreate,
     FavoriteUpdate,
@@ -31,6 +33,16 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _set_favorite_flag(db: Session, user_id: int, trend_ids: List[int], value: bool) -> None:
+    """Mirror favorite state onto the user's own trend rows (no-op for other users' trends)."""
+    if not trend_ids:
+        return
+    db.query(UserTrend).filter(
+        UserTrend.id.in_(trend_ids),
+        UserTrend.user_id == user_id
+    ).update({UserTrend.is_favorite: value}, synchronize_session=False)
+
+
 # =============================================================================
 # CRUD OPERATIONS
 # =============================================================================
@@ -41,7 +53,7 @@ def get_favorites(
     per_page: int = 20,
     tag: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get paginated list of user's favorites.
@@ -74,6 +86,7 @@ def get_favorites(
                 play_addr=fav.trend.play_addr,  # Direct CDN URL for inline video playback
                 description=fav.trend.description,
                 cover_url=fav.trend.cover_url,
+                cover_srcset=fav.trend.cover_srcset,
                 author_username=fav.trend.author_username,
                 uts_score=fav.trend.uts_score or 0.0,
                 stats=fav.trend.stats or {}
@@ -140,6 +153,7 @@ def add_favorite(
     )
 
     db.add(favorite)
+    _set_favorite_flag(db, current_user.id, [data.trend_id], True)
     db.commit()
     db.refresh(favorite)
 
@@ -152,6 +166,7 @@ def add_favorite(
         url=trend.url,
         description=trend.description,
         cover_url=trend.cover_url,
+        cover_srcset=trend.cover_srcset,
         author_username=trend.author_username,
         uts_score=trend.uts_score or 0.0,
         stats=trend.stats or {}
@@ -168,11 +183,129 @@ def add_favorite(
     )
 
 
+# =============================================================================
+# BULK OPERATIONS
+# =============================================================================
+# Declared before the /{favorite_id} routes: "DELETE /bulk" would match those first
+
+@router.post("/bulk", response_model=BulkOperationResult)
+def bulk_add_favorites(
+    data: BulkFavoriteCreate,
+    current_user: User = Depends(check_rate_limit),
+    db: Session = Depends(get_db)
+):
+    """
+    Add multiple trends to favorites at once.
+
+    User Isolation: All trends must belong to authenticated user.
+    """
+    success_count = 0
+    failed_count = 0
+    errors = []
+    added_trend_ids = []
+
+    # Existence and already-favorited checks for the whole batch (2 queries, not 2 per id)
+    trend_ids = set(data.trend_ids)
+    found = {
+        row.id for row in db.query(Trend.id).filter(Trend.id.in_(trend_ids)).all()
+    } if trend_ids else set()
+    already = {
+        row.trend_id for row in db.query(UserFavorite.trend_id).filter(
+            UserFavorite.user_id == current_user.id,
+            UserFavorite.trend_id.in_(found)
+        ).all()
+    } if found else set()
+
+    for trend_id in data.trend_ids:
+        # User can favorite any trend they can see
+        if trend_id not in found:
+            failed_count += 1
+            errors.append(f"Trend {trend_id} not found")
+            continue
+
+        # Already favorited (or repeated in this request)
+        if trend_id in already:
+            failed_count += 1
+            errors.append(f"Trend {trend_id} already in favorites")
+            continue
+
+        # Create favorite
+        favorite = UserFavorite(
+            user_id=current_user.id,
+            trend_id=trend_id,
+            tags=data.tags or []
+        )
+        db.add(favorite)
+        already.add(trend_id)
+        added_trend_ids.append(trend_id)
+        success_count += 1
+
+    _set_favorite_flag(db, current_user.id, added_trend_ids, True)
+    db.commit()
+
+    logger.info(f"[STAR] User {current_user.id} bulk added {success_count} favorites")
+
+    return BulkOperationResult(
+        success_count=success_count,
+        failed_count=failed_count,
+        errors=errors[:10]  # Limit errors in response
+    )
+
+
+@router.delete("/bulk", response_model=BulkOperationResult)
+def bulk_delete_favorites(
+    data: BulkFavoriteDelete,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Remove multiple favorites at once.
+
+    User Isolation: Only deletes favorites belonging to authenticated user.
+    """
+    success_count = 0
+    failed_count = 0
+    errors = []
+    removed_trend_ids = []
+
+    # One query for the batch; ids of other users simply aren't found
+    favorite_ids = set(data.favorite_ids)
+    favorites = {
+        favorite.id: favorite for favorite in db.query(UserFavorite).filter(
+            UserFavorite.id.in_(favorite_ids),
+            UserFavorite.user_id == current_user.id
+        ).all()
+    } if favorite_ids else {}
+
+    for favorite_id in data.favorite_ids:
+        favorite = favorites.pop(favorite_id, None)
+
+        if not favorite:
+            failed_count += 1
+            errors.append(f"Favorite {favorite_id} not found")
+            continue
+
+        removed_trend_ids.append(favorite.trend_id)
+        db.delete(favorite)
+        success_count += 1
+
+    _set_favorite_flag(db, current_user.id, removed_trend_ids, False)
+    db.commit()
+
+    logger.info(f"[DELETE] User {current_user.id} bulk removed {success_count} favorites")
+
+    return BulkOperationResult(
+        success_count=success_count,
+        failed_count=failed_count,
+        errors=errors[:10]
+    )
+
+
 @router.get("/{favorite_id}", response_model=FavoriteResponse)
 def get_favorite(
     favorite_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get a specific favorite by ID.
@@ -198,6 +331,7 @@ def get_favorite(
             url=favorite.trend.url,
             description=favorite.trend.description,
             cover_url=favorite.trend.cover_url,
+            cover_srcset=favorite.trend.cover_srcset,
             author_username=favorite.trend.author_username,
             uts_score=favorite.trend.uts_score or 0.0,
             stats=favorite.trend.stats or {}
@@ -256,6 +390,7 @@ def update_favorite(
             url=favorite.trend.url,
             description=favorite.trend.description,
             cover_url=favorite.trend.cover_url,
+            cover_srcset=favorite.trend.cover_srcset,
             author_username=favorite.trend.author_username,
             uts_score=favorite.trend.uts_score or 0.0,
             stats=favorite.trend.stats or {}
@@ -294,111 +429,13 @@ def delete_favorite(
             detail="Favorite not found"
         )
 
+    _set_favorite_flag(db, current_user.id, [favorite.trend_id], False)
     db.delete(favorite)
     db.commit()
 
     logger.info(f"[DELETE] User {current_user.id} removed favorite {favorite_id}")
 
 
-# =============================================================================
-# BULK OPERATIONS
-# =============================================================================
-
-@router.post("/bulk", response_model=BulkOperationResult)
-def bulk_add_favorites(
-    data: BulkFavoriteCreate,
-    current_user: User = Depends(check_rate_limit),
-    db: Session = Depends(get_db)
-):
-    """
-    Add multiple trends to favorites at once.
-
-    User Isolation: All trends must belong to authenticated user.
-    """
-    success_count = 0
-    failed_count = 0
-    errors = []
-
-    for trend_id in data.trend_ids:
-        # Check if trend exists (user can favorite any trend they can see)
-        trend = db.query(Trend).filter(Trend.id == trend_id).first()
-
-        if not trend:
-            failed_count += 1
-            errors.append(f"Trend {trend_id} not found")
-            continue
-
-        # Check if already favorited
-        existing = db.query(UserFavorite).filter(
-            UserFavorite.user_id == current_user.id,
-            UserFavorite.trend_id == trend_id
-        ).first()
-
-        if existing:
-            failed_count += 1
-            errors.append(f"Trend {trend_id} already in favorites")
-            continue
-
-        # Create favorite
-        favorite = UserFavorite(
-            user_id=current_user.id,
-            trend_id=trend_id,
-            tags=data.tags or []
-        )
-        db.add(favorite)
-        success_count += 1
-
-    db.commit()
-
-    logger.info(f"[STAR] User {current_user.id} bulk added {success_count} favorites")
-
-    return BulkOperationResult(
-        success_count=success_count,
-        failed_count=failed_count,
-        errors=errors[:10]  # Limit errors in response
-    )
-
-
-@router.delete("/bulk", response_model=BulkOperationResult)
-def bulk_delete_favorites(
-    data: BulkFavoriteDelete,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """
-    Remove multiple favorites at once.
-
-    User Isolation: Only deletes favorites belonging to authenticated user.
-    """
-    success_count = 0
-    failed_count = 0
-    errors = []
-
-    for favorite_id in data.favorite_ids:
-        favorite = db.query(UserFavorite).filter(
-            UserFavorite.id == favorite_id,
-            UserFavorite.user_id == current_user.id
-        ).first()
-
-        if not favorite:
-            failed_count += 1
-            errors.append(f"Favorite {favorite_id} not found")
-            continue
-
-        db.delete(favorite)
-        success_count += 1
-
-    db.commit()
-
-    logger.info(f"[DELETE] User {current_user.id} bulk removed {success_count} favorites")
-
-    return BulkOperationResult(
-        success_count=success_count,
-        failed_count=failed_count,
-        errors=errors[:10]
-    )
-
-
 # =============================================================================
 # UTILITY ENDPOINTS
 # =============================================================================
@@ -406,7 +443,7 @@ def bulk_delete_favorites(
 @router.get("/tags/all", response_model=List[str])
 def get_all_tags(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all unique tags used by the user in favorites.
@@ -427,7 +464,7 @@ def get_all_tags(
 def check_if_favorited(
     trend_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Check if a specific trend is in user's favorites.
@@ -475,38 +512,28 @@ def save_video_to_favorites(
     try:
         logger.info(f"[DOWNLOAD] save-video request: platform_id={data.platform_id}, user={current_user.id}")
 
-        # Check if trend already exists for this user
-        existing_trend = db.query(Trend).filter(
-            Trend.platform_id == data.platform_id,
-            Trend.user_id == current_user.id
-        ).first()
-
-        if existing_trend:
-            trend = existing_trend
-            # Update stats
-            trend.stats = data.stats
-            trend.cover_url = data.cover_url
-            trend.play_addr = data.play_addr
-        else:
-            # Create new trend
-            trend = Trend(
-                user_id=current_user.id,
-                platform_id=data.platform_id,
-                url=data.url,
-                play_addr=data.play_addr,
-                cover_url=data.cover_url,
-                description=data.description,
-                stats=data.stats,
-                initial_stats=data.stats,
-                author_username=data.author_username,
-                author_followers=0,
-                uts_score=data.viral_score,
-                vertical="saved",
-                search_mode=DBSearchMode.KEYWORDS,
-                is_deep_scan=False,
-            )
-            db.add(trend)
-            db.flush()
+        # Light results carry the temporary cover -- use the permanent one if uploaded
+        cover_url = thumbnail_pipeline.resolve(data.cover_url)
+        cover_srcset = thumbnail_pipeline.srcset(data.cover_url)
+
+        # Create the trend or refresh the user's existing copy in one statement
+        trend = bulk_upsert_trends(db, [{
+            "user_id": current_user.id,
+            "platform_id": data.platform_id,
+            "url": data.url,
+            "play_addr": data.play_addr,
+            "cover_url": cover_url,
+            "cover_srcset": cover_srcset,
+            "description": data.description,
+            "stats": data.stats,
+            "initial_stats": data.stats,
+            "author_username": data.author_username,
+            "author_followers": 0,
+            "uts_score": data.viral_score,
+            "vertical": "saved",
+            "search_mode": DBSearchMode.KEYWORDS,
+            "is_deep_scan": False,
+        }], update_columns=("stats", "cover_url", "play_addr") + (("cover_srcset",) if cover_srcset else ()))[0]
 
         # Check if already favorited
         existing_fav = db.query(UserFavorite).filter(
@@ -530,6 +557,7 @@ def save_video_to_favorites(
             tags=data.tags or []
         )
         db.add(favorite)
+        _set_favorite_flag(db, current_user.id, [trend.id], True)
         db.commit()
 
         logger.info(f"[STAR] User {current_user.id} saved video {data.platform_id} to favorites")
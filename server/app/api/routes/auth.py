@@ -2,18 +2,21 @@
 Authentication routes for user registration, login, and token management.
 Production-ready implementation with proper error handling and security.
 """
+import asyncio
 import os
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from ...core.database import get_db
+from ...core.user_cache import user_cache
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from ...core.security import (
-    verify_password,
-    get_password_hash,
+    password_hasher,
+    PasswordHasherBusy,
     create_access_token,
     create_refresh_token,
     decode_token,
+    decode_token_async,
     token_blacklist,
 )
 
@@ -34,6 +37,15 @@ from ..dependencies import get_current_user
 router = APIRouter(tags=["Authentication"])
 
 
+def _hasher_busy() -> HTTPException:
+    """503 for when the password hashing queue is full (login/register storm)."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=AuthResponse, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     """
@@ -58,7 +70,10 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
         )
 
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     new_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -124,8 +139,12 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Verify password
-    if not verify_password(credentials.password, user.hashed_password):
+    # Verify password (bcrypt runs in the password hashing pool)
+    try:
+        valid, new_hash = await password_hasher.verify(credentials.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -139,8 +158,10 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Account is disabled. Please contact support."
         )
 
-    # Update last login time
+    # Update last login time (and upgrade the hash if the cost parameters changed)
     user.last_login_at = datetime.utcnow()
+    if new_hash:
+        user.hashed_password = new_hash
     db.commit()
 
     # Generate tokens (sub must be string for JWT standard)
@@ -171,7 +192,7 @@ async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db))
         HTTPException: 401 if refresh token is invalid
     """
     # Decode refresh token
-    payload = decode_token(token_data.refresh_token)
+    payload = await decode_token_async(token_data.refresh_token)
     if payload is None or payload.get("type") != "refresh":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -399,9 +420,10 @@ async def logout(
     auth_header = request.headers.get("Authorization", "")
     if auth_header.startswith("Bearer "):
         token = auth_header[7:]
-        payload = decode_token(token)
+        # Already checked against the blacklist by get_current_user
+        payload = decode_token(token, check_blacklist=False)
         if payload and payload.get("jti"):
-            token_blacklist.blacklist(payload["jti"])
+            await asyncio.to_thread(token_blacklist.blacklist, payload["jti"], payload.get("exp"))
 
     return {"status": "logged_out"}
 
@@ -468,6 +490,7 @@ async def dev_upgrade_subscription(
     # Update user subscription
     current_user.subscription_tier = tier_map[data.plan.lower()]
     db.commit()
+    user_cache.invalidate(current_user.id)
     db.refresh(current_user)
 
     return {
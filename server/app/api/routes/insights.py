@@ -10,7 +10,6 @@ Features:
 - Returns 3 actionable recommendations
 - Secure: only processes user's own data
 """
-import os
 import logging
 from datetime import datetime
 from typing import Optional, List
@@ -21,6 +20,7 @@ from pydantic import BaseModel
 from ...core.database import get_db
 from ...db.models import User, UserAccount, SocialPlatform
 from ..dependencies import get_current_user
+from ...services.llm_gateway import llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -75,27 +75,18 @@ def get_gemini_insights(user_data: dict) -> List[InsightItem]:
         List of InsightItem recommendations
     """
     try:
-        from google import genai
-
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        if not api_key:
+        if not llm_gateway.available("gemini"):
             logger.warning("Gemini API key not configured, using fallback insights")
             return get_fallback_insights(user_data)
 
-        # Initialize Gemini client
-        client = genai.Client(api_key=api_key)
-
         # Build prompt with user's data
         prompt = build_insights_prompt(user_data)
 
-        # Call Gemini
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt
-        )
+        # Call Gemini (shared client, rate limits and retries in the LLM gateway)
+        response_text = llm_gateway.generate("gemini", prompt, model="gemini-2.0-flash")
 
         # Parse response into InsightItems
-        insights = parse_gemini_response(response.text)
+        insights = parse_gemini_response(response_text)
 
         if not insights:
             return get_fallback_insights(user_data)
@@ -290,7 +281,7 @@ async def get_ai_insights(
         data_sources.append(acc.platform.value)
 
     # Generate insights
-    insights = get_gemini_insights(user_data)
+    insights = await llm_gateway.run(get_gemini_insights, user_data)
 
     return InsightsResponse(
         insights=insights,
@@ -12,6 +12,7 @@ import os
 import logging
 
 from ...core.database import get_db
+from ...core.user_cache import user_cache
 from ...db.models import User
 from ..routes.auth import get_current_user
 from sqlalchemy.orm import Session
@@ -305,6 +306,7 @@ async def handle_checkout_completed(session: dict, db: Session):
     user.subscription = plan
     user.stripe_subscription_id = session.get("subscription")
     db.commit()
+    user_cache.invalidate(user.id)
 
     logger.info(f"User {user_id} upgraded to {plan}")
 
@@ -328,6 +330,7 @@ async def handle_subscription_updated(subscription: dict, db: Session):
 
     user.stripe_subscription_id = subscription.get("id")
     db.commit()
+    user_cache.invalidate(user.id)
 
     logger.info(f"Updated subscription for user {user.id}: {status}")
 
@@ -345,6 +348,7 @@ async def handle_subscription_deleted(subscription: dict, db: Session):
     user.subscription = "free"
     user.stripe_subscription_id = None
     db.commit()
+    user_cache.invalidate(user.id)
 
     logger.info(f"User {user.id} subscription canceled, downgraded to free")
 
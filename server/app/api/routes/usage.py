@@ -21,7 +21,7 @@ from ..schemas.usage import (
     AutoModeToggleRequest,
     AutoModeToggleResponse
 )
-from ..dependencies import get_current_user
+from ..dependencies import get_current_user, get_read_db
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/usage", tags=["Usage"])
@@ -60,7 +60,7 @@ def get_next_reset_date() -> str:
 @router.get("", response_model=UsageResponse)
 async def get_usage_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get comprehensive usage statistics for the current user.
@@ -75,18 +75,11 @@ async def get_usage_stats(
     Real tracking will be implemented with AI model integration.
     """
     try:
-        # Get user settings (for auto_mode - will be added to DB later)
+        # Get user settings (for auto_mode; created on first toggle, defaults apply until then)
         settings = db.query(UserSettings).filter(
             UserSettings.user_id == current_user.id
         ).first()
 
-        if not settings:
-            # Create default settings if not exist
-            settings = UserSettings(user_id=current_user.id)
-            db.add(settings)
-            db.commit()
-            db.refresh(settings)
-
         # Get plan-based credit limit (from DB)
         plan = current_user.subscription_tier.value
         monthly_limit = current_user.monthly_credits_limit
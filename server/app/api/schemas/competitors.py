@@ -122,6 +122,7 @@ class CompetitorVideo(BaseModel):
     title: str
     url: str
     cover_url: Optional[str] = None
+    cover_srcset: Optional[Dict[str, Dict[str, str]]] = None  # Responsive variants {format: {width: url}}
     uploaded_at: Optional[int] = None  # Unix timestamp
     views: int = 0
     stats: CompetitorVideoStats
@@ -255,6 +256,7 @@ class CompetitorFeedVideo(BaseModel):
     title: str
     description: str = ""
     thumbnail_url: Optional[str] = None
+    cover_srcset: Optional[Dict[str, Dict[str, str]]] = None  # Responsive variants {format: {width: url}}
     video_url: Optional[str] = None  # URL for video playback
     url: str
     stats: CompetitorVideoStats
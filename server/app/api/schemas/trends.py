@@ -28,6 +28,13 @@ class Platform(str, Enum):
     INSTAGRAM = "instagram"
 
 
+class TrendSort(str, Enum):
+    """Sort orders for saved trends (each backed by a (user_id, ...) index)."""
+    RECENT = "recent"
+    VIEWS = "views"
+    ENGAGEMENT = "engagement"
+
+
 class SubscriptionTier(str, Enum):
     """User subscription tiers."""
     FREE = "free"
@@ -229,6 +236,7 @@ class TrendBase(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     cover_url: Optional[str] = None
+    cover_srcset: Optional[Dict[str, Dict[str, str]]] = None  # Responsive variants {format: {width: url}}
     author_username: Optional[str] = None
 
 
@@ -320,6 +328,7 @@ class SavedTrendResponse(BaseModel):
     url: Optional[str] = None
     description: Optional[str] = None
     cover_url: Optional[str] = None
+    cover_srcset: Optional[Dict[str, Dict[str, str]]] = None  # Responsive variants {format: {width: url}}
     author_username: Optional[str] = None
     stats: Dict[str, Any] = {}
     uts_score: float = 0.0
@@ -13,12 +13,12 @@ import logging
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, delete
 
 from ..core.database import get_db
-from ..db.models import Trend, User, UserSearch, SearchMode as DBSearchMode
+from ..db.models import Trend, UserTrend, User, UserSearch, SearchMode as DBSearchMode
 from ..services.collector import TikTokCollector
 from ..services.instagram_collector import InstagramCollector
 from ..services.instagram_adapter import adapt_instagram_to_standard
@@ -27,12 +27,13 @@ from ..services.scorer import TrendScorer
 from ..services.ml_client import get_ml_client
 from ..services.clustering import cluster_trends_by_visuals
 from ..services.scheduler import scheduler, rescan_videos_task
-from ..services.storage import SupabaseStorage
-from ..services.apify_storage import ApifyStorage
+from ..services.thumbnail_pipeline import thumbnail_pipeline
+from ..services.trend_upsert import bulk_upsert_trends, get_initial_stats
 
 from .dependencies import (
     get_current_user,
     get_current_user_optional,
+    get_read_db,
     check_rate_limit,
     check_deep_analyze_limit,
     rate_limiter
@@ -45,6 +46,7 @@ from .schemas.trends import (
     TrendDeep,
     SavedTrendResponse,
     TrendListResponse,
+    TrendSort,
     VideoStats,
     AuthorInfo,
     MusicInfo,
@@ -75,6 +77,7 @@ def trend_to_dict(trend: Trend) -> dict:
         "url": trend.url,
         "play_addr": trend.play_addr,  # Direct CDN video playback URL
         "cover_url": trend.cover_url,
+        "cover_srcset": trend.cover_srcset,
         "description": trend.description,
         "author_username": trend.author_username,
         "stats": trend.stats,
@@ -104,18 +107,14 @@ def parse_video_data(item: dict, idx: int = 0) -> dict:
         cover_url = item.get("coverUrl") or item.get("cover") or item.get("videoCover") or ""
     cover_url = cover_url.replace(".heic", ".jpeg").replace(".webp", ".jpeg") if cover_url else ""
 
-    # Upload thumbnail to Supabase Storage (permanent, no expiration)
-    # Fallback: if Supabase fails, use fix_tiktok_url (works ~1-3 days)
+    # Upload thumbnail to Supabase Storage in the background (permanent, no expiration)
+    # Response gets fix_tiktok_url (works ~1-3 days) until the upload finishes,
+    # then the pipeline swaps the permanent URL into saved trends
+    cover_srcset = None
     if cover_url:
-        video_id = str(item.get("id", "unknown"))
-        uploaded_cover = SupabaseStorage.upload_thumbnail(cover_url)
-        if uploaded_cover:
-            cover_url = uploaded_cover
-            logger.info(f"[OK] Thumbnail uploaded to Supabase for video {video_id[:20]}")
-        else:
-            # Fallback: remove TikTok signatures (temporary fix)
-            cover_url = ApifyStorage.fix_tiktok_url(cover_url)
-            logger.warning(f"[WARNING] Supabase upload failed, using fix_tiktok_url for {video_id[:20]}")
+        video_id = str(item.get("id", "")) or None
+        cover_srcset = thumbnail_pipeline.srcset(cover_url)
+        cover_url = thumbnail_pipeline.submit(cover_url, platform_id=video_id)
 
     # Video URL
     video_url = (
@@ -208,6 +207,7 @@ def parse_video_data(item: dict, idx: int = 0) -> dict:
         "description": description,
         "url": video_url,
         "cover_url": cover_url,
+        "cover_srcset": cover_srcset,
         "author_username": username,
         "play_addr": play_addr,
         "author": author_info,
@@ -299,11 +299,11 @@ def get_saved_results(
     ids_to_clean = [t.id for t in results if t.last_scanned_at is not None]
 
     if ids_to_clean:
-        # Only delete user's own trends
+        # Only delete user's own trends (catalog videos are shared and stay)
         db.execute(
-            delete(Trend).where(
-                Trend.id.in_(ids_to_clean),
-                Trend.user_id == current_user.id
+            delete(UserTrend).where(
+                UserTrend.id.in_(ids_to_clean),
+                UserTrend.user_id == current_user.id
             )
         )
         db.commit()
@@ -317,23 +317,34 @@ def get_my_trends(
     page: int = 1,
     per_page: int = 20,
     vertical: Optional[str] = None,
+    sort: TrendSort = TrendSort.RECENT,
+    min_views: int = Query(0, ge=0),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get paginated list of user's saved trends.
 
     User Isolation: Only returns trends belonging to the authenticated user.
+    Sorting by views/engagement and min_views use the typed stat columns
+    (index scans on user_trends), not the stats JSONB.
     """
     query = db.query(Trend).filter(Trend.user_id == current_user.id)
 
     if vertical:
         query = query.filter(Trend.vertical.ilike(f"%{vertical}%"))
+    if min_views:
+        query = query.filter(UserTrend.video_play_count >= min_views)
 
     total = query.count()
     offset = (page - 1) * per_page
 
-    trends = query.order_by(Trend.created_at.desc()).offset(offset).limit(per_page).all()
+    order_by = {
+        TrendSort.RECENT: Trend.created_at.desc(),
+        TrendSort.VIEWS: UserTrend.video_play_count.desc(),
+        TrendSort.ENGAGEMENT: UserTrend.video_engagement_rate.desc(),
+    }[sort]
+    trends = query.order_by(order_by).offset(offset).limit(per_page).all()
 
     items = [
         SavedTrendResponse(
@@ -343,6 +354,7 @@ def get_my_trends(
             url=t.url,
             description=t.description,
             cover_url=t.cover_url,
+            cover_srcset=t.cover_srcset,
             author_username=t.author_username,
             stats=t.stats or {},
             uts_score=t.uts_score or 0.0,
@@ -552,6 +564,7 @@ def search_trends(
                 "description": parsed["description"],
                 "url": parsed["url"],
                 "cover_url": parsed["cover_url"],
+                "cover_srcset": parsed["cover_srcset"],
                 "author_username": parsed["author_username"],
                 "play_addr": parsed["play_addr"],
                 "author": parsed["author"],
@@ -590,8 +603,12 @@ def search_trends(
         if music_id:
             music_cascade_map[str(music_id)] = music_cascade_map.get(str(music_id), 0) + 1
 
-    for item in clean_items:
-        parsed = parse_video_data(item)
+    # Parse everything first, then load Point A stats for the whole batch in one query
+    parsed_items = [(item, parse_video_data(item)) for item in clean_items]
+    existing_initial_stats = get_initial_stats(db, current_user.id, [parsed["id"] for _, parsed in parsed_items])
+
+    trend_rows = []
+    for item, parsed in parsed_items:
         p_id = parsed["id"]
         video_url = parsed["url"]
         stats = parsed["stats"]
@@ -615,12 +632,6 @@ def search_trends(
             "shareCount": shares
         }
 
-        # Check if video exists for this user
-        existing = db.query(Trend).filter(
-            Trend.user_id == current_user.id,  # USER ISOLATION
-            or_(Trend.platform_id == p_id, Trend.url == video_url)
-        ).first()
-
         try:
             uts_data = {
                 'views': int(views_now or 0),
@@ -632,54 +643,56 @@ def search_trends(
             }
 
             history_data = None
-            if existing and existing.initial_stats:
+            initial_stats = existing_initial_stats.get(p_id)
+            if initial_stats:
                 history_data = {
-                    'play_count': existing.initial_stats.get('playCount', views_now)
+                    'play_count': initial_stats.get('playCount', views_now)
                 }
 
             uts_breakdown = scorer.calculate_uts_breakdown(uts_data, history_data, cascade_count)
 
-            if existing:
-                existing.initial_stats = current_stats
-                existing.stats = current_stats
-                existing.uts_score = uts_breakdown['final_score']
-                existing.last_scanned_at = None
-                existing.is_deep_scan = True
-                db.add(existing)
-                processed_trends.append(existing)
-            else:
-                new_trend = Trend(
-                    user_id=current_user.id,  # USER ISOLATION
-                    platform_id=p_id,
-                    url=video_url,
-                    play_addr=parsed.get("play_addr"),  # Direct CDN video playback URL
-                    cover_url=parsed["cover_url"],
-                    description=parsed["description"],
-                    stats=current_stats,
-                    initial_stats=current_stats,
-                    author_username=parsed["author_username"],
-                    author_followers=followers,
-                    uts_score=uts_breakdown['final_score'],
-                    vertical=search_targets[0] or "deep_scan",
-                    music_id=str(music_id) if music_id else None,
-                    music_title=(item.get("music") or {}).get("title"),
-                    search_query=search_targets[0],
-                    search_mode=DBSearchMode.USERNAME if req.mode == SearchMode.USERNAME else DBSearchMode.KEYWORDS,
-                    is_deep_scan=True,
-                    last_scanned_at=None
-                )
-                db.add(new_trend)
-                processed_trends.append(new_trend)
+            # Existing catalog videos only refresh stats; score and scan state are this user's (see DEFAULT_UPDATE_COLUMNS)
+            trend_rows.append({
+                "user_id": current_user.id,  # USER ISOLATION
+                "platform": req.platform.value,
+                "platform_id": p_id,
+                "url": video_url,
+                "play_addr": parsed.get("play_addr"),  # Direct CDN video playback URL
+                "cover_url": parsed["cover_url"],
+                "cover_srcset": parsed["cover_srcset"],
+                "description": parsed["description"],
+                "stats": current_stats,
+                "initial_stats": current_stats,
+                "author_username": parsed["author_username"],
+                "author_followers": followers,
+                "uts_score": uts_breakdown['final_score'],
+                "vertical": search_targets[0] or "deep_scan",
+                "music_id": str(music_id) if music_id else None,
+                "music_title": (item.get("music") or {}).get("title"),
+                "search_query": search_targets[0],
+                "search_mode": DBSearchMode.USERNAME if req.mode == SearchMode.USERNAME else DBSearchMode.KEYWORDS,
+                "is_deep_scan": True,
+                "last_scanned_at": None,
+            })
 
         except Exception as e:
             logger.error(f"Error processing video {p_id}: {e}")
 
-    # Batch commit -- one transaction for all videos instead of one per video
+    # Batch upsert -- one INSERT ... ON CONFLICT statement per table for all videos
     try:
+        processed_trends = bulk_upsert_trends(db, trend_rows)
+        trend_ids = [t.id for t in processed_trends]
         db.commit()
+        # Commit expired the returned objects -- reload the batch in one query
+        if trend_ids:
+            db.query(Trend).filter(Trend.id.in_(trend_ids)).all()
     except Exception as e:
-        logger.error(f"Batch commit failed, rolling back: {e}")
+        logger.error(f"Batch upsert failed, rolling back: {e}")
         db.rollback()
+        processed_trends = []
+
+    # Thumbnails that finished uploading before the rows existed
+    thumbnail_pipeline.apply_resolved(db, processed_trends)
 
     # Clustering
     if req.is_deep and processed_trends:
@@ -700,7 +713,7 @@ def search_trends(
             scheduler.add_job(
                 rescan_videos_task, 'date',
                 run_date=run_date,
-                args=[saved_urls, f"batch_{int(time.time())}_{current_user.id}"]
+                args=[saved_urls, f"batch_{int(time.time())}_{current_user.id}", current_user.id]
             )
             logger.info(f"[TIMER] Rescan scheduled in {req.rescan_hours}h for user {current_user.id}")
 
@@ -708,12 +721,12 @@ def search_trends(
     deep_results = []
     for trend in processed_trends:
         uts_data = {
-            'views': trend.stats.get('playCount', 0),
+            'views': trend.play_count,
             'author_followers': trend.author_followers or 1,
-            'collect_count': trend.stats.get('collectCount', 0) or trend.stats.get('saveCount', 0),
-            'share_count': trend.stats.get('shareCount', 0),
-            'likes': trend.stats.get('diggCount', 0),
-            'comments': trend.stats.get('commentCount', 0)
+            'collect_count': trend.collect_count,
+            'share_count': trend.share_count,
+            'likes': trend.digg_count,
+            'comments': trend.comment_count
         }
         history_data = None
         if trend.initial_stats:
@@ -789,11 +802,12 @@ def clear_user_trends(
 
     User Isolation: Only deletes trends belonging to the authenticated user.
     """
-    query = db.query(Trend).filter(Trend.user_id == current_user.id)
+    query = db.query(UserTrend).filter(UserTrend.user_id == current_user.id)
 
     if vertical:
-        query = query.filter(Trend.vertical.ilike(f"%{vertical}%"))
+        query = query.filter(UserTrend.vertical.ilike(f"%{vertical}%"))
 
+    # Only the user's associations -- catalog videos are shared and stay
     deleted_count = query.delete(synchronize_session=False)
     db.commit()
 
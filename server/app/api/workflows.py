@@ -6,22 +6,31 @@ Supports per-node model selection (Gemini, Claude, GPT-4).
 """
 from datetime import datetime
 from pathlib import Path
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Set, Callable, AsyncIterator
 from sqlalchemy.orm import Session
+from sqlalchemy import or_
+import asyncio
+import json
 import logging
+import time
 import uuid
 import shutil
 
-from ..core.database import get_db
+from ..core.database import get_db, SessionLocal
 from ..services.gemini_script_generator import GeminiScriptGenerator
-from .dependencies import get_current_user, CreditManager
+from .dependencies import get_current_user, get_read_db, CreditManager
+from ..services.credit_ledger import credit_ledger
+from ..services.partitions import partition_manager
 from ..db.models import User, Workflow, WorkflowStatus, WorkflowRun, WorkflowRunStatus
 from ..services.workflow_templates import get_templates, get_template_by_id
-
-# Reuse AI clients from chat_sessions
-from ..api.chat_sessions import get_gemini_client, get_anthropic_client, get_openai_client
+from ..services.workflow_executor import dag_executor, execution_levels, current_delta_sink, NodeOutcome, WorkflowCycleError
+from ..services.node_cache import node_cache, content_hash, begin_node, mark_uncacheable, is_cacheable
+from ..services.video_assets import video_assets, VideoAssetScope
+from ..services.workflow_queue import workflow_queue, run_events, WORKFLOW_POLL_SECONDS
+from ..services.llm_gateway import llm_gateway
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -47,46 +56,18 @@ def generate_with_model(model: str, prompt: str) -> str:
     """
     Generate AI content using the specified model.
     Supports: gemini (default), claude, gpt4
+    In a streamed workflow run, token deltas are forwarded as they arrive.
     """
+    provider = model if model in ("claude", "gpt4") else "gemini"
+    if provider != "gemini" and not llm_gateway.available(provider):
+        logger.warning(f"[WORKFLOW] {provider} not available, falling back to Gemini")
+        provider = "gemini"
     try:
-        if model == "claude":
-            client = get_anthropic_client()
-            if not client:
-                logger.warning("[WORKFLOW] Claude not available, falling back to Gemini")
-                return generate_with_model("gemini", prompt)
-            response = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=4096,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            return response.content[0].text.strip() if response.content else "No response generated"
-
-        elif model == "gpt4":
-            client = get_openai_client()
-            if not client:
-                logger.warning("[WORKFLOW] GPT-4 not available, falling back to Gemini")
-                return generate_with_model("gemini", prompt)
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=4096,
-            )
-            return response.choices[0].message.content.strip() if response.choices else "No response generated"
-
-        else:
-            # Default: Gemini
-            client = get_gemini_client()
-            if not client:
-                raise Exception("Gemini API not configured - add GEMINI_API_KEY to .env")
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt
-            )
-            return response.text.strip() if response.text else "No response generated"
-
+        text = llm_gateway.generate(provider, prompt, sink=current_delta_sink())
     except Exception as e:
         logger.error(f"[WORKFLOW] generate_with_model({model}) error: {e}")
         raise
+    return text or "No response generated"
 
 
 # ============================================================================
@@ -149,6 +130,8 @@ class NodeResult(BaseModel):
     content: str
     success: bool = True
     error: Optional[str] = None
+    cached: bool = False  # Reused from an earlier run with identical inputs (no credits)
+    credits: int = 0
 
 
 class WorkflowExecuteResponse(BaseModel):
@@ -493,14 +476,16 @@ async def analyze_video(
             'url': request.url,
         }
 
-        result = analyze_video_with_gemini(
+        # Blocking (download, upload, LLM gateway queueing) -- keep it off the event loop
+        result = await llm_gateway.run(
+            analyze_video_with_gemini,
             video_url=request.url,
             video_metadata=metadata,
             custom_prompt=request.custom_prompt,
         )
 
-        # Deduct credits
-        current_user.credits -= CREDIT_COST
+        # Deduct credits (atomic, never below 0)
+        credit_ledger.debit(db, current_user, CREDIT_COST, "video_analysis", allow_partial=True)
         db.commit()
 
         return {
@@ -580,12 +565,16 @@ async def list_workflow_runs(
     limit: int = 50,
     offset: int = 0,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List all workflow runs for the current user (pinned first, then most recent)"""
+    """List workflow runs in the user's retention window (pinned first, then most recent)"""
+    cutoff = partition_manager.retention_cutoff(current_user.subscription_tier)
     runs = (
         db.query(WorkflowRun)
-        .filter(WorkflowRun.user_id == current_user.id)
+        .filter(
+            WorkflowRun.user_id == current_user.id,
+            or_(WorkflowRun.is_pinned.is_(True), WorkflowRun.started_at >= cutoff)
+        )
         .order_by(WorkflowRun.is_pinned.desc(), WorkflowRun.started_at.desc())
         .offset(offset)
         .limit(limit)
@@ -598,7 +587,7 @@ async def list_workflow_runs(
 async def get_workflow_run(
     run_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get details of a specific workflow run"""
     run = db.query(WorkflowRun).filter(WorkflowRun.id == run_id).first()
@@ -662,6 +651,78 @@ async def clear_workflow_history(
     logger.info(f"[WORKFLOW] User {current_user.id} cleared {deleted} runs from history")
 
 
+@router.post("/history/{run_id}/resume", response_model=WorkflowRunListItem)
+async def resume_workflow_run(
+    run_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a failed or cancelled run again. Nodes that already succeeded are
+    kept from its checkpoint; only the rest run (and are charged).
+    """
+    run = db.query(WorkflowRun).filter(WorkflowRun.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Workflow run not found")
+    if run.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if run.status not in (WorkflowRunStatus.FAILED, WorkflowRunStatus.CANCELLED):
+        raise HTTPException(status_code=409, detail="Only failed or cancelled runs can be resumed")
+
+    request = _queued_request(run)
+    done = _checkpointed(run)
+    try:
+        topological_sort(request.nodes, request.connections)
+    except WorkflowCycleError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "Workflow has a cycle", "node_ids": e.node_ids}
+        )
+
+    CreditManager.check_and_reset_monthly(current_user, db)
+    estimated_cost = CreditManager.estimate_workflow_cost([n for n in request.nodes if n.id not in done])
+    if current_user.credits < estimated_cost:
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail={
+                "error": "Insufficient credits for workflow",
+                "message": f"Resuming this workflow costs ~{estimated_cost} credits, you have {current_user.credits}",
+                "required": estimated_cost,
+                "available": current_user.credits,
+                "upgrade_url": "/pricing"
+            }
+        )
+
+    run.results = [r.model_dump() for r in done.values()]
+    run.error_message = None
+    run.completed_at = None
+    run.attempts = 0
+    run.claimed_by = None
+    _enqueue_run(run, db)
+    logger.info(f"[WORKFLOW] User {current_user.id} resumed run {run_id} ({len(done)} nodes kept)")
+    return _run_to_list_item(run)
+
+
+@router.get("/history/{run_id}/events")
+async def stream_workflow_run_events(
+    run_id: int,
+    format: str = Query("sse", pattern="^(sse|ndjson)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Follow a run (e.g. after a dropped /execute/stream connection or a resume):
+    nodes completed so far, then live events until it completes or fails.
+    Same format and events as /execute/stream.
+    """
+    run = db.query(WorkflowRun).filter(WorkflowRun.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Workflow run not found")
+    if run.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return _event_stream(run_id, run_events.subscribe(run_id), format)
+
+
 # ============================================================================
 # CRUD ENDPOINTS (continued - parameterized routes)
 # ============================================================================
@@ -765,32 +826,67 @@ def get_node_dependencies(node_id: int, connections: List[Connection]) -> List[i
 
 
 def topological_sort(nodes: List[WorkflowNode], connections: List[Connection]) -> List[int]:
-    """Sort nodes in execution order (topological sort)"""
-    node_ids = {n.id for n in nodes}
-    in_degree = {n.id: 0 for n in nodes}
-    adj = {n.id: [] for n in nodes}
+    """Sort nodes in execution order (raises WorkflowCycleError on cycles)"""
+    levels = execution_levels([n.id for n in nodes], [(c.from_node, c.to_node) for c in connections])
+    return [node_id for level in levels for node_id in level]
+
 
-    for conn in connections:
-        if conn.from_node in node_ids and conn.to_node in node_ids:
-            adj[conn.from_node].append(conn.to_node)
-            in_degree[conn.to_node] += 1
+# Node types that never call a model
+_NO_MODEL_NODES = {"brand"}
+# Node types that go to Gemini Vision when a video is attached upstream
+_VISION_NODES = {"analyze", "extract", "style"}
 
-    queue = [nid for nid, deg in in_degree.items() if deg == 0]
-    result = []
 
-    while queue:
-        node_id = queue.pop(0)
-        result.append(node_id)
+def node_provider(node: WorkflowNode, upstream_video: Optional['VideoData'] = None) -> Optional[str]:
+    """Provider a node will call (for concurrency caps), None if it makes no model call."""
+    if node.type in _NO_MODEL_NODES:
+        return None
+    if node.type == "video" or (node.type in _VISION_NODES and upstream_video):
+        return "gemini"
+    return node.config.model if node.config and node.config.model else "gemini"
 
-        for neighbor in adj[node_id]:
-            in_degree[neighbor] -= 1
-            if in_degree[neighbor] == 0:
-                queue.append(neighbor)
 
-    return result
+# Node types worth memoizing (model calls / video analysis; brand is instant)
+_CACHED_NODE_TYPES = {"video", "analyze", "extract", "style", "generate", "refine", "script", "storyboard"}
 
 
-def analyze_with_video(video_data: 'VideoData', prompt: str, language: str = "English") -> Optional[str]:
+def _video_identity(video: Optional['VideoData']) -> Optional[Dict[str, Any]]:
+    """What identifies a video's content (uploads: path plus size/mtime)"""
+    if not video:
+        return None
+    identity = {"id": video.id, "url": video.url, "localPath": video.localPath}
+    if video.localPath:
+        try:
+            stat = Path(video.localPath).stat()
+            identity["file"] = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            pass
+    return identity
+
+
+def node_cache_key(
+    node: WorkflowNode,
+    upstream_outputs: Dict[int, str],
+    language: str,
+    user_id: int,
+    upstream_video: Optional['VideoData'] = None
+) -> Optional[str]:
+    """Content-addressed cache key for a node, None if the node isn't memoized"""
+    if node.type not in _CACHED_NODE_TYPES:
+        return None
+    return node_cache.key(
+        user_id=user_id,
+        type=node.type,
+        config=node.config.model_dump(exclude_none=True) if node.config else {},
+        model=node_provider(node, upstream_video),
+        language=language,
+        # Ordered: inputs are concatenated in connection order
+        upstream=[content_hash(output) for output in upstream_outputs.values()],
+        video=_video_identity(node.videoData if node.type == "video" else upstream_video),
+    )
+
+
+def analyze_with_video(video_data: 'VideoData', prompt: str, language: str = "English", assets: Optional['VideoAssetScope'] = None) -> Optional[str]:
     """
     Analyze video with Gemini Vision using a custom prompt.
     Returns result text or None if video analysis is unavailable.
@@ -816,15 +912,17 @@ def analyze_with_video(video_data: 'VideoData', prompt: str, language: str = "En
                 video_metadata=metadata,
                 custom_prompt=full_prompt,
                 local_path=video_data.localPath,
+                assets=assets,
             )
             return result
     except Exception as e:
         logger.error(f"[WORKFLOW] Video analysis failed in AI node: {e}")
+        mark_uncacheable()
 
     return None
 
 
-def process_video_node(node: WorkflowNode, language: str = "English") -> str:
+def process_video_node(node: WorkflowNode, language: str = "English", assets: Optional['VideoAssetScope'] = None) -> str:
     """Process video input node - downloads actual video and analyzes it with Gemini Vision."""
     if not node.videoData:
         return "No video attached. Drag a saved video onto this node."
@@ -860,11 +958,13 @@ def process_video_node(node: WorkflowNode, language: str = "English") -> str:
                 video_metadata=metadata,
                 custom_prompt=custom_prompt,
                 local_path=video.localPath,
+                assets=assets,
             )
             return result
 
         except Exception as e:
             logger.error(f"[WORKFLOW] Video analysis failed, using fallback: {e}")
+            mark_uncacheable()
 
     uts_label = "HIGH" if video.uts >= 70 else ("MEDIUM" if video.uts >= 40 else "LOW")
 
@@ -920,7 +1020,7 @@ To get better results, double-click this node and add:
 **Instructions for downstream nodes:** All generated content MUST align with this brand identity."""
 
 
-def process_analyze_node(input_content: str, config: Optional[NodeConfig] = None, language: str = "English", video_data: Optional['VideoData'] = None) -> str:
+def process_analyze_node(input_content: str, config: Optional[NodeConfig] = None, language: str = "English", video_data: Optional['VideoData'] = None, assets: Optional['VideoAssetScope'] = None) -> str:
     """Deep content analysis. Uses Gemini Vision when video is available upstream."""
     if not input_content or input_content.strip() == "":
         return "No input content to analyze. Connect a Video Input or Brand Brief node."
@@ -948,7 +1048,7 @@ Provide a concise analysis:
 
 Be specific about what you actually see and hear in the video."""
 
-        result = analyze_with_video(video_data, vision_prompt, language)
+        result = analyze_with_video(video_data, vision_prompt, language, assets)
         if result:
             return result
         logger.warning("[WORKFLOW] Video vision failed for analyze node, falling back to text")
@@ -1002,10 +1102,11 @@ Be specific and actionable."""
         return generate_with_model(model, prompt)
     except Exception as e:
         logger.error(f"Analyze node error: {e}")
+        mark_uncacheable()
         return f"Analysis error: {str(e)}"
 
 
-def process_extract_node(input_content: str, config: Optional[NodeConfig] = None, language: str = "English", video_data: Optional['VideoData'] = None) -> str:
+def process_extract_node(input_content: str, config: Optional[NodeConfig] = None, language: str = "English", video_data: Optional['VideoData'] = None, assets: Optional['VideoAssetScope'] = None) -> str:
     """Extract key elements. Uses Gemini Vision when video is available upstream."""
     if not input_content or input_content.strip() == "":
         return "No input content to extract from. Connect upstream nodes first."
@@ -1022,7 +1123,7 @@ def process_extract_node(input_content: str, config: Optional[NodeConfig] = None
 ## SUCCESS FORMULA
 Be specific about what you see and hear."""
 
-        result = analyze_with_video(video_data, vision_prompt, language)
+        result = analyze_with_video(video_data, vision_prompt, language, assets)
         if result:
             return result
 
@@ -1071,10 +1172,11 @@ Keep it brief and immediately usable."""
         return generate_with_model(model, prompt)
     except Exception as e:
         logger.error(f"Extract node error: {e}")
+        mark_uncacheable()
         return f"Extraction error: {str(e)}"
 
 
-def process_style_node(input_content: str, config: Optional[NodeConfig] = None, language: str = "English", video_data: Optional['VideoData'] = None) -> str:
+def process_style_node(input_content: str, config: Optional[NodeConfig] = None, language: str = "English", video_data: Optional['VideoData'] = None, assets: Optional['VideoAssetScope'] = None) -> str:
     """Style matching. Uses Gemini Vision when video is available upstream."""
     if not input_content or input_content.strip() == "":
         return "No input content for style matching. Connect upstream nodes first."
@@ -1090,7 +1192,7 @@ def process_style_node(input_content: str, config: Optional[NodeConfig] = None,
 ## AUDIO GUIDELINES (music genre, tempo, voiceover)
 Be specific about what you see and hear."""
 
-        result = analyze_with_video(video_data, vision_prompt, language)
+        result = analyze_with_video(video_data, vision_prompt, language, assets)
         if result:
             return result
 
@@ -1134,6 +1236,7 @@ Keep this concise and actionable."""
         return generate_with_model(model, prompt)
     except Exception as e:
         logger.error(f"Style node error: {e}")
+        mark_uncacheable()
         return f"Style matching error: {str(e)}"
 
 
@@ -1201,6 +1304,7 @@ Keep it natural and scroll-stopping."""
         return generate_with_model(model, prompt)
     except Exception as e:
         logger.error(f"Generate node error: {e}")
+        mark_uncacheable()
         return f"Generation error: {str(e)}"
 
 
@@ -1240,6 +1344,7 @@ The refined version should feel noticeably more engaging."""
         return generate_with_model(model, prompt)
     except Exception as e:
         logger.error(f"Refine node error: {e}")
+        mark_uncacheable()
         return f"Refinement error: {str(e)}"
 
 
@@ -1285,6 +1390,7 @@ Remove analysis/meta-commentary. Keep ONLY actionable content."""
         return generate_with_model(model, prompt)
     except Exception as e:
         logger.error(f"Script output node error: {e}")
+        mark_uncacheable()
         return input_content
 
 
@@ -1334,6 +1440,7 @@ Keep it detailed enough to film from but not verbose."""
         return generate_with_model(model, prompt)
     except Exception as e:
         logger.error(f"Storyboard node error: {e}")
+        mark_uncacheable()
         return f"Storyboard error: {str(e)}"
 
 
@@ -1349,23 +1456,14 @@ class WorkflowExecuteRequestV2(BaseModel):
     workflow_id: Optional[int] = None
     workflow_name: Optional[str] = None
     language: Optional[str] = "English"
+    use_cache: bool = True  # False = recompute every node and refresh the cached outputs
 
 
-@router.post("/execute", response_model=WorkflowExecuteResponse)
-async def execute_workflow(
-    request: WorkflowExecuteRequestV2,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def _create_run(request: WorkflowExecuteRequestV2, current_user: User, db: Session) -> WorkflowRun:
     """
-    Execute a node-based workflow.
-    Processes nodes in topological order and returns results for each node.
-    Saves execution to history for future reference.
+    Create the history record for a run. It stays RUNNING without a heartbeat
+    (invisible to the workers) until _check_run passes and _enqueue_run queues it.
     """
-    import time
-    start_time = time.time()
-
-    # Create workflow run record for history
     workflow_name = request.workflow_name or "Untitled Workflow"
     run_number = 1
 
@@ -1380,7 +1478,6 @@ async def execute_workflow(
                 WorkflowRun.workflow_id == request.workflow_id
             ).count() + 1
 
-    # Create the run record
     workflow_run = WorkflowRun(
         user_id=current_user.id,
         workflow_id=request.workflow_id,
@@ -1392,134 +1489,285 @@ async def execute_workflow(
             "connections": [c.model_dump(by_alias=True) for c in request.connections]
         },
         node_count=len(request.nodes),
+        options={
+            "brand_context": request.brand_context,
+            "language": request.language,
+            "use_cache": request.use_cache,
+        },
         started_at=datetime.utcnow(),
     )
     db.add(workflow_run)
     db.commit()
     db.refresh(workflow_run)
+    return workflow_run
 
-    try:
-        logger.info(f"[WORKFLOW] User {current_user.id} executing workflow (run {workflow_run.id}) with {len(request.nodes)} nodes")
 
-        if not request.nodes:
-            workflow_run.status = WorkflowRunStatus.FAILED
-            workflow_run.error_message = "No nodes in workflow"
-            workflow_run.completed_at = datetime.utcnow()
-            db.commit()
-            return WorkflowExecuteResponse(
-                success=False,
-                results=[],
-                error="No nodes in workflow"
-            )
+def _enqueue_run(workflow_run: WorkflowRun, db: Session) -> None:
+    workflow_run.status = WorkflowRunStatus.QUEUED
+    workflow_run.queued_at = datetime.utcnow()
+    db.commit()
+    workflow_queue.notify()
+
+
+def _queued_request(workflow_run: WorkflowRun) -> WorkflowExecuteRequestV2:
+    """Rebuild the execute request a run was created from"""
+    graph = workflow_run.input_graph or {}
+    return WorkflowExecuteRequestV2(
+        nodes=graph.get("nodes", []),
+        connections=graph.get("connections", []),
+        workflow_id=workflow_run.workflow_id,
+        workflow_name=workflow_run.workflow_name,
+        **(workflow_run.options or {})
+    )
 
-        # Check monthly credit reset
-        CreditManager.check_and_reset_monthly(current_user, db)
 
-        # Pre-check: estimate total cost
-        estimated_cost = CreditManager.estimate_workflow_cost(request.nodes)
-        if current_user.credits < estimated_cost:
-            workflow_run.status = WorkflowRunStatus.FAILED
-            workflow_run.error_message = f"Insufficient credits: need {estimated_cost}, have {current_user.credits}"
-            workflow_run.completed_at = datetime.utcnow()
-            db.commit()
-            raise HTTPException(
-                status_code=status.HTTP_402_PAYMENT_REQUIRED,
-                detail={
-                    "error": "Insufficient credits for workflow",
-                    "message": f"This workflow costs ~{estimated_cost} credits, you have {current_user.credits}",
-                    "required": estimated_cost,
-                    "available": current_user.credits,
-                    "upgrade_url": "/pricing"
-                }
-            )
+def _checkpointed(workflow_run: WorkflowRun) -> Dict[int, NodeResult]:
+    """Nodes that succeeded in an earlier attempt of the run"""
+    results = (NodeResult(**r) for r in (workflow_run.results or []))
+    return {r.node_id: r for r in results if r.success}
+
+
+def _fail_run(workflow_run: WorkflowRun, db: Session, error: str, start_time: Optional[float] = None) -> None:
+    workflow_run.status = WorkflowRunStatus.FAILED
+    workflow_run.error_message = error
+    workflow_run.completed_at = datetime.utcnow()
+    if start_time is not None:
+        workflow_run.execution_time_ms = int((time.time() - start_time) * 1000)
+    db.commit()
+
 
-        # Get execution order
+def _check_run(workflow_run: WorkflowRun, request: WorkflowExecuteRequestV2, current_user: User, db: Session) -> List[int]:
+    """
+    Validate a run before executing anything: cycles, then credits.
+    Returns the execution order; marks the run failed and raises HTTPException otherwise.
+    """
+    # Reject cycles before charging anything
+    try:
         execution_order = topological_sort(request.nodes, request.connections)
-        logger.info(f"[WORKFLOW] Execution order: {execution_order}")
+    except WorkflowCycleError as e:
+        _fail_run(workflow_run, db, str(e))
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "Workflow has a cycle", "node_ids": e.node_ids}
+        )
+    logger.info(f"[WORKFLOW] Execution order: {execution_order}")
+
+    # Check monthly credit reset
+    CreditManager.check_and_reset_monthly(current_user, db)
+
+    # Pre-check: estimate total cost
+    estimated_cost = CreditManager.estimate_workflow_cost(request.nodes)
+    if current_user.credits < estimated_cost:
+        _fail_run(workflow_run, db, f"Insufficient credits: need {estimated_cost}, have {current_user.credits}")
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail={
+                "error": "Insufficient credits for workflow",
+                "message": f"This workflow costs ~{estimated_cost} credits, you have {current_user.credits}",
+                "required": estimated_cost,
+                "available": current_user.credits,
+                "upgrade_url": "/pricing"
+            }
+        )
+    return execution_order
+
+
+class InsufficientCreditsError(RuntimeError):
+    """The balance ran out before a node could be charged (it doesn't run)."""
+
+
+def _node_cost(node: WorkflowNode) -> int:
+    node_model = (node.config.model if node.config and node.config.model else "gemini")
+    return CreditManager.get_workflow_node_cost(node.type, node_model)
+
+
+def _node_credits(node: WorkflowNode, outcome: NodeOutcome, refunded: bool = False) -> int:
+    """Credits for a finished node: AI nodes only; failures, fallbacks and cache hits are free"""
+    if not outcome.success or outcome.cached or refunded:
+        return 0
+    return _node_cost(node)
+
+
+def _node_result(node: WorkflowNode, outcome: NodeOutcome, refunded: bool = False) -> NodeResult:
+    if not outcome.success:
+        return NodeResult(
+            node_id=node.id,
+            node_type=node.type,
+            content="",
+            success=False,
+            error=str(outcome.error)
+        )
+    return NodeResult(
+        node_id=node.id,
+        node_type=node.type,
+        content=outcome.output,
+        success=True,
+        cached=outcome.cached,
+        credits=_node_credits(node, outcome, refunded)
+    )
 
-        # Store results
-        node_outputs: Dict[int, str] = {}
+
+async def _execute_run(
+    workflow_run: WorkflowRun,
+    request: WorkflowExecuteRequestV2,
+    current_user: User,
+    db: Session,
+    start_time: float,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    resume_from: Optional[Dict[int, NodeResult]] = None
+) -> WorkflowExecuteResponse:
+    """
+    Execute a checked run and finalize its record.
+
+    Each node's result is committed to workflow_run.results as soon as it
+    finishes, so an interrupted run (or a dropped client) keeps its completed
+    nodes. resume_from holds those results from an earlier attempt: the nodes
+    aren't run again (and were already paid for).
+
+    Each AI node is charged right before it runs, with an exact debit: once
+    the balance is gone the remaining nodes fail instead of running unpaid
+    (the up-front estimate check uses a balance that concurrent runs may
+    have spent since). A node that fails after being charged is refunded,
+    and so is one whose processor caught a provider error and returned an
+    error or fallback text (marked uncacheable).
+    on_event, if given, receives progress events on the event loop:
+    node_started, node_delta (streamed tokens), node_completed, run_completed,
+    run_failed.
+    """
+    emit = on_event or (lambda event: None)
+
+    try:
         results: List[NodeResult] = []
         final_script = None
         storyboard = None
         total_credits_used = 0
 
         nodes_by_id = {n.id: n for n in request.nodes}
+        lang = request.language or "English"
+        # Read once: worker threads must not touch ORM objects the loop commits/expires
+        run_id = workflow_run.id
+        user_id = current_user.id
+        resumed = {nid: r for nid, r in (resume_from or {}).items() if nid in nodes_by_id}
+        checkpoint: List[Dict[str, Any]] = [r.model_dump() for r in resumed.values()]
+        refunded: Set[int] = set()  # Charged nodes whose output was an error/fallback
+
+        def upstream_video_of(node_id: int) -> Optional[VideoData]:
+            """Video data from the first connected video node"""
+            for dep_id in get_node_dependencies(node_id, request.connections):
+                dep_node = nodes_by_id.get(dep_id)
+                if dep_node and dep_node.videoData:
+                    return dep_node.videoData
+            return None
 
-        # Process each node
-        for node_id in execution_order:
-            node = nodes_by_id.get(node_id)
-            if not node:
-                continue
+        def cache_key_of(node_id: int, upstream_outputs: Dict[int, str]) -> Optional[str]:
+            return node_cache_key(
+                nodes_by_id[node_id], upstream_outputs, lang, user_id, upstream_video_of(node_id)
+            )
+
+        def cached_output(node_id: int, upstream_outputs: Dict[int, str]) -> Optional[str]:
+            """Runs in a worker thread before run_node"""
+            if not request.use_cache:
+                return None
+            key = cache_key_of(node_id, upstream_outputs)
+            return node_cache.get(key) if key else None
 
+        def run_node(node_id: int, upstream_outputs: Dict[int, str]) -> str:
+            """Runs in a worker thread -- no request DB session here"""
+            node = nodes_by_id[node_id]
             logger.info(f"[WORKFLOW] Processing node {node_id} type={node.type}")
 
-            dependencies = get_node_dependencies(node_id, request.connections)
-            input_content = "\n\n---\n\n".join(
-                node_outputs.get(dep_id, "")
-                for dep_id in dependencies
-                if dep_id in node_outputs
+            cost = _node_cost(node)
+            if cost and credit_ledger.charge(user_id, cost, "workflow", reference=str(run_id)) is None:
+                raise InsufficientCreditsError(f"Insufficient credits: node needs {cost}")
+
+            begin_node()
+            try:
+                output = process_node(node, upstream_outputs)
+            except BaseException:
+                credit_ledger.refund(user_id, cost, "workflow_refund", reference=str(run_id))
+                raise
+
+            # Processors catch provider errors and return error/fallback text instead
+            if not is_cacheable():
+                if cost:
+                    credit_ledger.refund(user_id, cost, "workflow_refund", reference=str(run_id))
+                    refunded.add(node_id)
+                return output
+
+            key = cache_key_of(node_id, upstream_outputs)
+            if key:
+                node_cache.put(key, user_id, node.type, output)
+            return output
+
+        def process_node(node: WorkflowNode, upstream_outputs: Dict[int, str]) -> str:
+            input_content = "\n\n---\n\n".join(upstream_outputs.values())
+            upstream_video = upstream_video_of(node.id)
+            node_config = node.config
+
+            if node.type == "video":
+                return process_video_node(node, lang, assets)
+            elif node.type == "brand":
+                return process_brand_node(node, request.brand_context or "", node_config)
+            elif node.type == "analyze":
+                return process_analyze_node(input_content, node_config, lang, upstream_video, assets)
+            elif node.type == "extract":
+                return process_extract_node(input_content, node_config, lang, upstream_video, assets)
+            elif node.type == "style":
+                return process_style_node(input_content, node_config, lang, upstream_video, assets)
+            elif node.type == "generate":
+                return process_generate_node(input_content, node_config, lang)
+            elif node.type == "refine":
+                return process_refine_node(input_content, node_config, lang)
+            elif node.type == "script":
+                return process_script_output_node(input_content, node_config, lang)
+            elif node.type == "storyboard":
+                return process_storyboard_node(input_content, node_config, lang)
+            return f"Unknown node type: {node.type}"
+
+        def on_node_event(kind: str, node_id: int, outcome: Optional[NodeOutcome]) -> None:
+            """Event loop thread: checkpoint finished nodes, forward progress"""
+            node = nodes_by_id[node_id]
+            if kind == "node_started":
+                emit({"event": "node_started", "node_id": node_id, "node_type": node.type})
+                return
+            result = _node_result(node, outcome, node_id in refunded)
+            checkpoint.append(result.model_dump())
+            workflow_run.results = list(checkpoint)
+            db.commit()
+            emit({"event": "node_completed", **result.model_dump()})
+
+        def on_delta(node_id: int, delta: str) -> None:
+            emit({"event": "node_delta", "node_id": node_id, "delta": delta})
+
+        # Independent branches run concurrently; each node starts once its inputs are ready.
+        # Videos are downloaded/uploaded once for the whole run and released at the end.
+        with video_assets.run_scope() as assets:
+            outcomes = await dag_executor.run(
+                list(nodes_by_id),
+                [(c.from_node, c.to_node) for c in request.connections],
+                run_node,
+                provider_of=lambda node_id: node_provider(nodes_by_id[node_id], upstream_video_of(node_id)),
+                lookup=cached_output,
+                on_event=on_node_event,
+                on_delta=on_delta if on_event else None,
+                completed={nid: r.content for nid, r in resumed.items()}
             )
 
-            # Find upstream video data (from connected video nodes)
-            upstream_video = None
-            for dep_id in dependencies:
-                dep_node = nodes_by_id.get(dep_id)
-                if dep_node and dep_node.videoData:
-                    upstream_video = dep_node.videoData
-                    break
+        # Results in topological order
+        for node_id, outcome in outcomes.items():
+            node = nodes_by_id[node_id]
+            result = resumed[node_id] if outcome.resumed else _node_result(node, outcome, node_id in refunded)
+            results.append(result)
+            if not outcome.success:
+                continue
 
-            try:
-                node_config = node.config
-                lang = request.language or "English"
-                if node.type == "video":
-                    output = process_video_node(node, lang)
-                elif node.type == "brand":
-                    output = process_brand_node(node, request.brand_context or "", node_config)
-                elif node.type == "analyze":
-                    output = process_analyze_node(input_content, node_config, lang, upstream_video)
-                elif node.type == "extract":
-                    output = process_extract_node(input_content, node_config, lang, upstream_video)
-                elif node.type == "style":
-                    output = process_style_node(input_content, node_config, lang, upstream_video)
-                elif node.type == "generate":
-                    output = process_generate_node(input_content, node_config, lang)
-                elif node.type == "refine":
-                    output = process_refine_node(input_content, node_config, lang)
-                elif node.type == "script":
-                    output = process_script_output_node(input_content, node_config, lang)
-                    final_script = output
-                elif node.type == "storyboard":
-                    output = process_storyboard_node(input_content, node_config, lang)
-                    storyboard = output
-                else:
-                    output = f"Unknown node type: {node.type}"
-
-                node_outputs[node_id] = output
-
-                # Deduct credits for AI nodes
-                node_model = (node_config.model if node_config and node_config.model else "gemini")
-                node_cost = CreditManager.get_workflow_node_cost(node.type, node_model)
-                if node_cost > 0:
-                    current_user.credits = max(0, current_user.credits - node_cost)
-                    total_credits_used += node_cost
-
-                results.append(NodeResult(
-                    node_id=node_id,
-                    node_type=node.type,
-                    content=output,
-                    success=True
-                ))
-
-            except Exception as e:
-                logger.error(f"[WORKFLOW] Error processing node {node_id}: {e}")
-                results.append(NodeResult(
-                    node_id=node_id,
-                    node_type=node.type,
-                    content="",
-                    success=False,
-                    error=str(e)
-                ))
+            if node.type == "script":
+                final_script = outcome.output
+            elif node.type == "storyboard":
+                storyboard = outcome.output
+
+            # Credits for AI nodes (each charged when it ran)
+            total_credits_used += result.credits
 
         # Calculate execution time
         execution_time_ms = int((time.time() - start_time) * 1000)
@@ -1542,9 +1790,20 @@ async def execute_workflow(
                 wf.status = WorkflowStatus.COMPLETED
 
         db.commit()
+        CreditManager.reload_credits(current_user, db)
 
-        logger.info(f"[WORKFLOW] Completed run {workflow_run.id} with {len(results)} results, {total_credits_used} credits used, {execution_time_ms}ms")
+        cached_count = sum(1 for r in results if r.cached)
+        logger.info(f"[WORKFLOW] Completed run {workflow_run.id} with {len(results)} results ({cached_count} cached, {len(resumed)} resumed), {total_credits_used} credits used, {execution_time_ms}ms")
 
+        emit({
+            "event": "run_completed",
+            "run_id": workflow_run.id,
+            "final_script": final_script,
+            "storyboard": storyboard,
+            "credits_used": total_credits_used,
+            "credits_remaining": current_user.credits,
+            "execution_time_ms": execution_time_ms,
+        })
         return WorkflowExecuteResponse(
             success=True,
             results=results,
@@ -1554,16 +1813,255 @@ async def execute_workflow(
             credits_remaining=current_user.credits,
         )
 
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"[WORKFLOW] Execution error: {e}")
-        workflow_run.status = WorkflowRunStatus.FAILED
-        workflow_run.error_message = str(e)
-        workflow_run.completed_at = datetime.utcnow()
-        workflow_run.execution_time_ms = int((time.time() - start_time) * 1000)
-        db.commit()
+        db.rollback()
+        _fail_run(workflow_run, db, str(e), start_time)
+        emit({"event": "run_failed", "run_id": workflow_run.id, "error": str(e)})
         raise HTTPException(
             status_code=500,
             detail=f"Workflow execution failed: {str(e)}"
         )
+
+
+async def execute_queued_run(run_id: int, on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+    """
+    Worker entry point (services.workflow_queue): execute a claimed run,
+    resuming after the nodes that succeeded in an earlier attempt.
+    Returns the run's final status.
+    """
+    db = SessionLocal()
+    try:
+        workflow_run = db.query(WorkflowRun).filter(WorkflowRun.id == run_id).first()
+        if workflow_run is None:
+            return WorkflowRunStatus.FAILED.value
+        start_time = time.time()
+        current_user = db.get(User, workflow_run.user_id)
+        if current_user is None:
+            _fail_run(workflow_run, db, "User no longer exists")
+            return WorkflowRunStatus.FAILED.value
+
+        request = _queued_request(workflow_run)
+        resume_from = _checkpointed(workflow_run)
+        emit = on_event or (lambda event: None)
+        emit({
+            "event": "run_started",
+            "run_id": run_id,
+            "attempt": workflow_run.attempts,
+            "resumed_node_ids": list(resume_from),
+        })
+        try:
+            await _execute_run(workflow_run, request, current_user, db, start_time, on_event, resume_from)
+        except HTTPException:
+            pass  # Already recorded on the run and sent as run_failed
+        return workflow_run.status.value
+    finally:
+        db.close()
+
+
+@router.post("/execute", response_model=WorkflowExecuteResponse)
+async def execute_workflow(
+    request: WorkflowExecuteRequestV2,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Execute a node-based workflow.
+    The run is queued and executed by the worker pool, which runs independent
+    nodes concurrently (DAG executor); this waits for it and returns results
+    for each node in topological order.
+    Saves execution to history for future reference.
+    """
+    workflow_run = _create_run(request, current_user, db)
+    logger.info(f"[WORKFLOW] User {current_user.id} executing workflow (run {workflow_run.id}) with {len(request.nodes)} nodes")
+
+    if not request.nodes:
+        _fail_run(workflow_run, db, "No nodes in workflow")
+        return WorkflowExecuteResponse(
+            success=False,
+            results=[],
+            error="No nodes in workflow"
+        )
+
+    _check_run(workflow_run, request, current_user, db)
+
+    subscription = run_events.subscribe(workflow_run.id)
+    try:
+        _enqueue_run(workflow_run, db)
+        async for _ in follow_run(workflow_run.id, subscription):
+            pass
+    finally:
+        run_events.unsubscribe(workflow_run.id, subscription)
+
+    db.refresh(workflow_run)
+    db.refresh(current_user)
+    if workflow_run.status != WorkflowRunStatus.COMPLETED:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Workflow execution failed: {workflow_run.error_message}"
+        )
+    return WorkflowExecuteResponse(
+        success=True,
+        results=[NodeResult(**r) for r in workflow_run.results or []],
+        final_script=workflow_run.final_script,
+        storyboard=workflow_run.storyboard,
+        credits_used=workflow_run.credits_used,
+        credits_remaining=current_user.credits,
+    )
+
+
+# ============================================================================
+# STREAMING EXECUTION (SSE / NDJSON)
+# ============================================================================
+
+# Comment/blank line sent when idle, so proxies don't drop the connection
+STREAM_KEEPALIVE_SECONDS = 15
+
+_TERMINAL_EVENTS = {"run_completed", "run_failed"}
+
+
+def _run_snapshot(run_id: int) -> Optional[Dict[str, Any]]:
+    """Blocking: current state of a run, read with its own session"""
+    db = SessionLocal()
+    try:
+        run = db.query(WorkflowRun).filter(WorkflowRun.id == run_id).first()
+        return _run_to_detail(run) if run else None
+    finally:
+        db.close()
+
+
+def _terminal_event(run: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if run["status"] == WorkflowRunStatus.COMPLETED.value:
+        return {
+            "event": "run_completed",
+            "run_id": run["id"],
+            "final_script": run["final_script"],
+            "storyboard": run["storyboard"],
+            "credits_used": run["credits_used"],
+            "execution_time_ms": run["execution_time_ms"],
+        }
+    if run["status"] in (WorkflowRunStatus.FAILED.value, WorkflowRunStatus.CANCELLED.value):
+        return {"event": "run_failed", "run_id": run["id"], "error": run["error_message"]}
+    return None
+
+
+async def follow_run(run_id: int, subscription: asyncio.Queue) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Progress events of a run until it completes or fails.
+
+    Events from a worker in this process arrive on subscription (run_events).
+    When nothing arrives for WORKFLOW_POLL_SECONDS the run's record is read
+    instead -- so runs executed by another process are followed through their
+    checkpoint -- and None is yielded as an idle tick.
+    """
+    seen: Dict[int, Dict[str, Any]] = {}  # node_id -> result sent
+
+    def unseen(result: Dict[str, Any]) -> bool:
+        # A resumed node may be sent twice: its failed attempt, then its result
+        if seen.get(result["node_id"]) == result:
+            return False
+        seen[result["node_id"]] = result
+        return True
+
+    poll = True  # Start from the record: a resumed run already has results
+    while True:
+        if poll:
+            run = await asyncio.to_thread(_run_snapshot, run_id)
+            if run is None:
+                yield {"event": "run_failed", "run_id": run_id, "error": "Workflow run not found"}
+                return
+            for result in run["results"]:
+                if unseen(result):
+                    yield {"event": "node_completed", **result}
+            terminal = _terminal_event(run)
+            if terminal is not None:
+                yield terminal
+                return
+            yield None
+
+        try:
+            event = await asyncio.wait_for(subscription.get(), timeout=WORKFLOW_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            poll = True
+            continue
+        poll = False
+        if event["event"] == "node_completed":
+            result = {k: v for k, v in event.items() if k != "event"}
+            if not unseen(result):
+                continue
+        yield event
+        if event["event"] in _TERMINAL_EVENTS:
+            return
+
+
+async def _stream_events(
+    run_id: int,
+    subscription: asyncio.Queue,
+    fmt: str,
+    first_event: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[str]:
+    def encode(event: Dict[str, Any]) -> str:
+        data = json.dumps(event, default=str)
+        if fmt == "sse":
+            return f"event: {event['event']}\ndata: {data}\n\n"
+        return data + "\n"
+
+    try:
+        if first_event is not None:
+            yield encode(first_event)
+        last_sent = time.monotonic()
+        async for event in follow_run(run_id, subscription):
+            if event is None:
+                if time.monotonic() - last_sent < STREAM_KEEPALIVE_SECONDS:
+                    continue
+                yield ": keep-alive\n\n" if fmt == "sse" else "\n"
+            else:
+                yield encode(event)
+            last_sent = time.monotonic()
+    finally:
+        run_events.unsubscribe(run_id, subscription)
+
+
+def _event_stream(run_id: int, subscription: asyncio.Queue, fmt: str, first_event: Optional[Dict[str, Any]] = None) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_events(run_id, subscription, fmt, first_event),
+        media_type="text/event-stream" if fmt == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/execute/stream")
+async def execute_workflow_stream(
+    request: WorkflowExecuteRequestV2,
+    format: str = Query("sse", pattern="^(sse|ndjson)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Execute a workflow and stream progress as it happens.
+
+    format=sse (text/event-stream) or ndjson (application/x-ndjson). Events:
+    run_queued, run_started, node_started, node_delta (token deltas from
+    streaming models), node_completed (content + credits), run_completed /
+    run_failed.
+
+    Validation errors (cycle, credits) are returned as normal HTTP errors
+    before the stream starts. The run continues if the client disconnects;
+    completed nodes are saved to the run history as they finish, and
+    GET /history/{run_id}/events picks the stream up again.
+    """
+    workflow_run = _create_run(request, current_user, db)
+    logger.info(f"[WORKFLOW] User {current_user.id} streaming workflow (run {workflow_run.id}) with {len(request.nodes)} nodes")
+
+    if not request.nodes:
+        _fail_run(workflow_run, db, "No nodes in workflow")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No nodes in workflow")
+
+    execution_order = _check_run(workflow_run, request, current_user, db)
+
+    subscription = run_events.subscribe(workflow_run.id)
+    _enqueue_run(workflow_run, db)
+    return _event_stream(
+        workflow_run.id, subscription, format,
+        {"event": "run_queued", "run_id": workflow_run.id, "execution_order": execution_order}
+    )
@@ -0,0 +1,202 @@
+"""
+Read Replica Routing
+Sends read-only endpoints to a streaming replica (DATABASE_REPLICA_URL) so list
+and history reads don't compete with deep-analyze write bursts on the primary.
+
+A read goes to the primary instead when:
+- no replica is configured, or it can't be reached
+- the replica is more than REPLICA_MAX_LAG_SECONDS behind (checked at most
+  once per REPLICA_LAG_CHECK_SECONDS)
+- the user committed a write in the last READ_YOUR_WRITES_SECONDS
+  (read-your-writes: "save, then reload the list" shows the new row)
+
+Write markers are shared through the Redis store when configured (any worker
+may serve the next read), otherwise kept in-process.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from .config import settings
+from .database import SessionLocal
+from .shared_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+REPLICA_LAG_CHECK_SECONDS = 1.0
+
+# In-process write markers: sweep expired ones every N writes
+_SWEEP_EVERY_WRITES = 1000
+
+
+class ReplicaRouter:
+    """Chooses the replica or the primary for each read-only request session."""
+
+    def __init__(
+        self,
+        replica_url: str = settings.DATABASE_REPLICA_URL,
+        max_lag_seconds: float = settings.REPLICA_MAX_LAG_SECONDS,
+        sticky_seconds: float = settings.READ_YOUR_WRITES_SECONDS
+    ):
+        self.replica_url = replica_url
+        self.max_lag_seconds = max_lag_seconds
+        self.sticky_seconds = sticky_seconds
+        self._lock = threading.RLock()
+        self._lag_lock = threading.Lock()  # One lag probe at a time, never under _lock
+        self._engine = None
+        self._session_factory: Optional[sessionmaker] = None
+        self._lag: Optional[float] = None  # None = replica unavailable
+        self._lag_checked_at = 0.0
+        self._writes: Dict[int, float] = {}  # user_id -> sticky until (monotonic)
+        self._write_count = 0
+        self._counters: Dict[str, int] = {"replica": 0, "primary_sticky": 0, "primary_lag": 0}
+
+    # -------------------------------------------------------------------------
+    # Replica engine + lag
+    # -------------------------------------------------------------------------
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replica_url)
+
+    def _replica_sessions(self) -> sessionmaker:
+        if self._session_factory is None:
+            with self._lock:
+                if self._session_factory is None:
+                    self._engine = create_engine(
+                        self.replica_url,
+                        pool_pre_ping=True,
+                        pool_size=20,
+                        max_overflow=20,
+                        pool_recycle=3600,
+                        pool_timeout=30,
+                        echo=False
+                    )
+                    factory = sessionmaker(autocommit=False, autoflush=False, bind=self._engine)
+                    event.listen(factory, "before_flush", _refuse_flush)
+                    self._session_factory = factory
+        return self._session_factory
+
+    def _measure_lag(self) -> Optional[float]:
+        """Seconds the replica is behind the primary (0 if caught up), None if unreachable."""
+        try:
+            self._replica_sessions()
+            with self._engine.connect() as conn:
+                in_recovery, replay_lsn, replay_age = conn.execute(text("""
+                    SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text,
+                           EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp())
+                """)).one()
+            if not in_recovery:
+                return 0.0  # Not a standby (e.g. a separately maintained read copy)
+            primary = SessionLocal()
+            try:
+                behind_bytes = primary.execute(
+                    text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), CAST(:lsn AS pg_lsn))"),
+                    {"lsn": replay_lsn}
+                ).scalar()
+            finally:
+                primary.close()
+            # Caught up: replay_age only says when the last write happened, not lag
+            if behind_bytes is not None and behind_bytes <= 0:
+                return 0.0
+            return float(replay_age) if replay_age is not None else float("inf")
+        except Exception as e:
+            logger.warning(f"[WARNING] Replica unavailable, reading from primary: {e}")
+            return None
+
+    def replica_lag(self) -> Optional[float]:
+        """Cached replica lag in seconds (None if unavailable or not configured)."""
+        if not self.enabled:
+            return None
+        if time.monotonic() - self._lag_checked_at < REPLICA_LAG_CHECK_SECONDS:
+            return self._lag
+        # The probe is two DB round trips: other requests keep the cached value
+        # (and mark_write keeps _lock) instead of queueing behind it
+        if not self._lag_lock.acquire(blocking=False):
+            return self._lag
+        try:
+            if time.monotonic() - self._lag_checked_at >= REPLICA_LAG_CHECK_SECONDS:
+                self._lag = self._measure_lag()
+                self._lag_checked_at = time.monotonic()
+        finally:
+            self._lag_lock.release()
+        return self._lag
+
+    # -------------------------------------------------------------------------
+    # Read-your-writes
+    # -------------------------------------------------------------------------
+
+    def mark_write(self, user_id: int) -> None:
+        """Pin the user's reads to the primary for sticky_seconds."""
+        if not self.enabled or self.sticky_seconds <= 0:
+            return
+        client = get_redis()
+        if client is not None:
+            try:
+                client.set(f"rw:sticky:{user_id}", 1, px=int(self.sticky_seconds * 1000))
+                return
+            except Exception as e:
+                logger.warning(f"[WARNING] Shared store unavailable for write marker: {e}")
+        now = time.monotonic()
+        with self._lock:
+            self._writes[user_id] = now + self.sticky_seconds
+            self._write_count += 1
+            if self._write_count % _SWEEP_EVERY_WRITES == 0:
+                self._writes = {k: v for k, v in self._writes.items() if v > now}
+
+    def recently_wrote(self, user_id: int) -> bool:
+        client = get_redis()
+        if client is not None:
+            try:
+                return bool(client.exists(f"rw:sticky:{user_id}"))
+            except Exception:
+                return True  # Unknown -> primary is always correct
+        with self._lock:
+            return self._writes.get(user_id, 0.0) > time.monotonic()
+
+    # -------------------------------------------------------------------------
+    # Session selection
+    # -------------------------------------------------------------------------
+
+    def read_session(self, user_id: Optional[int] = None) -> Session:
+        """Session for a read-only request: replica if fresh enough, else primary."""
+        if not self.enabled:
+            return SessionLocal()
+        if user_id is not None and self.recently_wrote(user_id):
+            self._counters["primary_sticky"] += 1
+            return SessionLocal()
+        lag = self.replica_lag()
+        if lag is None or lag > self.max_lag_seconds:
+            self._counters["primary_lag"] += 1
+            return SessionLocal()
+        self._counters["replica"] += 1
+        return self._replica_sessions()()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "lag_seconds": self._lag,
+            "max_lag_seconds": self.max_lag_seconds,
+            **self._counters,
+        }
+
+
+def _refuse_flush(session, flush_context, instances):
+    raise RuntimeError("Replica sessions are read-only -- use get_db for writes")
+
+
+# Global singleton
+replica_router = ReplicaRouter()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _mark_user_write(session):
+    """Request sessions carry the authenticated user id (set by get_current_user)."""
+    user_id = session.info.get("user_id")
+    if user_id is not None:
+        replica_router.mark_write(user_id)
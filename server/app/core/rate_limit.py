@@ -0,0 +1,189 @@
+"""
+Rate Limit Stores
+GCRA (generic cell rate algorithm) state for the per-tier request limits, plus
+fixed-window counters for daily quotas.
+
+GCRA keeps one number per key -- the "theoretical arrival time" (TAT). A request
+costs one emission interval T = period / limit; it is allowed while the TAT stays
+within one period of now. That gives the same "limit per period, bursts allowed"
+behaviour as a sliding window, with O(1) state and O(1) work per check.
+
+Backends:
+- InMemoryRateLimitStore: per process (limits multiply by the number of workers)
+- RedisRateLimitStore: shared by all workers, each check is one atomic Lua script
+"""
+
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# In-memory store: sweep expired keys every N writes
+SWEEP_EVERY_WRITES = 1000
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of one GCRA check."""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # Seconds until the next request would be allowed (0 if allowed)
+    reset_after: float  # Seconds until the full limit is available again
+
+
+def _result(allowed: bool, limit: int, period: float, tat_offset: float, retry_after: float) -> RateLimitResult:
+    """Build a result from the TAT distance (tat - now) after the check."""
+    interval = period / limit
+    remaining = max(0, min(limit, math.floor((period - tat_offset) / interval + 1e-9)))
+    return RateLimitResult(
+        allowed=allowed,
+        limit=limit,
+        remaining=remaining,
+        retry_after=max(0.0, retry_after),
+        reset_after=max(0.0, tat_offset),
+    )
+
+
+class InMemoryRateLimitStore:
+    """Process-local GCRA + counters. Thread-safe; expired keys are swept periodically."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tat: Dict[str, float] = {}
+        self._counters: Dict[str, Tuple[int, float]] = {}  # key -> (count, expires_at)
+        self._writes = 0
+
+    def _sweep(self, now: float) -> None:
+        self._writes += 1
+        if self._writes % SWEEP_EVERY_WRITES:
+            return
+        self._tat = {k: tat for k, tat in self._tat.items() if tat > now}
+        self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+
+    def gcra(self, key: str, limit: int, period: float, cost: int = 1) -> RateLimitResult:
+        """Consume cost units for key (cost=0 only reports the current state)."""
+        interval = period / limit
+        now = time.time()
+        with self._lock:
+            tat = max(self._tat.get(key, now), now)
+            new_tat = tat + interval * cost
+            allow_at = new_tat - period
+            if now < allow_at:
+                return _result(False, limit, period, tat - now, allow_at - now)
+            if cost:
+                self._tat[key] = new_tat
+                self._sweep(now)
+        return _result(True, limit, period, new_tat - now, 0.0)
+
+    def hit_counter(self, key: str, limit: int, ttl_seconds: float) -> Tuple[bool, int]:
+        """Increment a fixed-window counter unless it already reached limit. Returns (allowed, count)."""
+        now = time.time()
+        with self._lock:
+            count, expires_at = self._counters.get(key, (0, now + ttl_seconds))
+            if expires_at <= now:
+                count, expires_at = 0, now + ttl_seconds
+            if count >= limit:
+                return False, count
+            self._counters[key] = (count + 1, expires_at)
+            self._sweep(now)
+            return True, count + 1
+
+    def get_counter(self, key: str) -> int:
+        now = time.time()
+        with self._lock:
+            count, expires_at = self._counters.get(key, (0, now))
+            return count if expires_at > now else 0
+
+
+# KEYS[1] = key; ARGV = interval, period, cost. Uses the server clock so all workers agree.
+# Floats are returned as strings (Lua numbers are truncated to integers on return).
+_GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval * cost
+local allow_at = new_tat - period
+if now < allow_at then
+    return {0, tostring(tat - now), tostring(allow_at - now)}
+end
+if cost > 0 then
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+end
+return {1, tostring(new_tat - now), '0'}
+"""
+
+# KEYS[1] = key; ARGV = limit, ttl_ms
+_COUNTER_SCRIPT = """
+local count = tonumber(redis.call('GET', KEYS[1]) or '0')
+if count >= tonumber(ARGV[1]) then
+    return {0, count}
+end
+count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return {1, count}
+"""
+
+
+class RedisRateLimitStore:
+    """
+    GCRA + counters in a Redis-protocol store, shared by all workers.
+
+    Fails open: if the store is unreachable the request is allowed (and logged),
+    so a Redis outage degrades rate limiting instead of taking the API down.
+    """
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self._client = client
+        self._prefix = prefix
+        self._gcra = client.register_script(_GCRA_SCRIPT)
+        self._counter = client.register_script(_COUNTER_SCRIPT)
+
+    def gcra(self, key: str, limit: int, period: float, cost: int = 1) -> RateLimitResult:
+        try:
+            allowed, tat_offset, retry_after = self._gcra(
+                keys=[self._prefix + key],
+                args=[period / limit, period, cost],
+            )
+        except Exception as e:
+            logger.warning(f"[WARNING] Rate limit store unavailable, allowing request: {e}")
+            return _result(True, limit, period, 0.0, 0.0)
+        return _result(bool(allowed), limit, period, float(tat_offset), float(retry_after))
+
+    def hit_counter(self, key: str, limit: int, ttl_seconds: float) -> Tuple[bool, int]:
+        try:
+            allowed, count = self._counter(
+                keys=[self._prefix + key],
+                args=[limit, max(1, int(ttl_seconds * 1000))],
+            )
+        except Exception as e:
+            logger.warning(f"[WARNING] Rate limit store unavailable, allowing request: {e}")
+            return True, 0
+        return bool(allowed), int(count)
+
+    def get_counter(self, key: str) -> int:
+        try:
+            return int(self._client.get(self._prefix + key) or 0)
+        except Exception as e:
+            logger.warning(f"[WARNING] Rate limit store unavailable: {e}")
+            return 0
+
+
+def create_rate_limit_store():
+    """Redis-backed store when a shared store is configured, otherwise in-process."""
+    from .shared_store import get_redis
+
+    client = get_redis()
+    if client is not None:
+        return RedisRateLimitStore(client)
+    return InMemoryRateLimitStore()
@@ -4,29 +4,46 @@ Production-ready implementation with industry best practices.
 
 Features:
 - JWT tokens with jti (unique ID) for server-side revocation
-- Token blacklist for secure logout
-- bcrypt password hashing
+- Token blacklist for secure logout (shared across workers via Redis)
+- bcrypt password hashing (off the event loop, bounded pool)
 """
+import asyncio
+import hashlib
 import logging
+import math
+import os
+import threading
 import time
 import uuid
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from ..core.config import settings
+from .bloom import BloomFilter
 
 # Logger for security and token operations
 logger = logging.getLogger(__name__)
 
+# bcrypt cost factor -- raising it rehashes existing passwords on their next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 # Password hashing context using bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Threads for bcrypt work (the C extension releases the GIL while hashing)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+# Hash jobs waiting or running before new ones are refused (HTTP 503)
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
 
 # JWT Configuration
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+# Verified tokens remembered by decode_token (one entry per active session)
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "10000"))
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -56,6 +73,74 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full."""
+
+
+class PasswordHasher:
+    """
+    bcrypt off the event loop: a dedicated bounded thread pool with a queue-depth
+    limit, so a login storm costs queued requests a fast 503 instead of stalling
+    every other request on the worker.
+    """
+
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Lazy init -- no threads until the first login."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self._max_pending:
+                raise PasswordHasherBusy()
+            self._pending += 1
+            executor = self._get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Awaitable get_password_hash()."""
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Awaitable verify with rehash support.
+
+        Returns:
+            (valid, new_hash) -- new_hash is set when the stored hash uses outdated
+            parameters (e.g. BCRYPT_ROUNDS was raised) and should replace it
+        """
+        return await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the pool (called on app shutdown)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+
+# Global singleton
+password_hasher = PasswordHasher()
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a JWT access token with unique ID (jti) for revocation support.
@@ -108,23 +193,83 @@ def create_refresh_token(data: dict) -> str:
     return encoded_jwt
 
 
-def decode_token(token: str) -> Optional[dict]:
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already verified tokens: sha256(token) -> (exp, claims).
+
+    The same access token is sent for up to ACCESS_TOKEN_EXPIRE_MINUTES, so
+    polling endpoints skip the HMAC check + JSON parse after the first request.
+    Entries are dropped once the token expires; revocation is still checked on
+    every hit (decode_token).
+    """
+
+    def __init__(self, max_size: int = VERIFIED_TOKEN_CACHE_SIZE):
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Claims of a cached, unexpired token (a copy), or None."""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry[1])
+
+    def put(self, token: str, payload: dict) -> None:
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)) or self._max_size <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (exp, dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Global singleton
+verified_token_cache = VerifiedTokenCache()
+
+
+def decode_token(token: str, check_blacklist: bool = True) -> Optional[dict]:
     """
     Decode and validate a JWT token.
     Checks token blacklist if jti claim is present (backward-compatible).
+    Signature checks are skipped for tokens verified before (VerifiedTokenCache).
+
+    Blocking when the blacklist has to ask the shared store -- async code
+    uses decode_token_async().
 
     Args:
         token: JWT token string to decode
+        check_blacklist: False to skip the revocation check (the caller does it)
 
     Returns:
         Decoded token payload if valid, None otherwise
     """
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        payload = verified_token_cache.get(token)
+        if payload is None:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+            verified_token_cache.put(token, payload)
 
         # Check blacklist (backward-compatible: tokens without jti are allowed)
         jti = payload.get("jti")
-        if jti and token_blacklist.is_blacklisted(jti):
+        if check_blacklist and jti and token_blacklist.is_blacklisted(jti):
             logger.warning(f"Rejected blacklisted token jti={jti[:8]}...")
             return None
 
@@ -141,48 +286,212 @@ def decode_token(token: str) -> Optional[dict]:
         return None
 
 
+async def decode_token_async(token: str) -> Optional[dict]:
+    """
+    decode_token() for async code: answered from the local Bloom filter when
+    possible, shared-store I/O (delta sync, confirming a hit) in a worker thread.
+    """
+    payload = decode_token(token, check_blacklist=False)
+    jti = payload.get("jti") if payload else None
+    if jti and await token_blacklist.is_blacklisted_async(jti):
+        logger.warning(f"Rejected blacklisted token jti={jti[:8]}...")
+        return None
+    return payload
+
+
 # =============================================================================
 # TOKEN BLACKLIST (server-side token revocation)
 # =============================================================================
 
+# Seconds between revocation delta pulls from the shared store (max cross-worker delay)
+TOKEN_BLACKLIST_SYNC_SECONDS = float(os.getenv("TOKEN_BLACKLIST_SYNC_SECONDS", "2"))
+# Local Bloom filter size; rebuilt from the shared log once exceeded
+TOKEN_BLACKLIST_BLOOM_CAPACITY = 100000
+# Longest-lived token -- revocation log entries older than this are trimmed
+MAX_TOKEN_LIFETIME_SECONDS = REFRESH_TOKEN_EXPIRE_DAYS * 86400
+
+# KEYS = revoked key, log key; ARGV = log member ("jti:exp"), ttl seconds, log retention seconds.
+# Scored by the server clock inside one script, so log scores follow commit order.
+_REVOKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('SET', KEYS[1], '1', 'EX', ARGV[2])
+redis.call('ZADD', KEYS[2], now, ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[3]))
+return tostring(now)
+"""
+
+
 class TokenBlacklist:
     """
-    In-memory token blacklist for server-side JWT revocation.
-    Tokens are identified by their unique jti claim.
-
-    For production at scale, consider Redis-based implementation.
+    Server-side JWT revocation, keyed by the token's jti claim.
+
+    With a shared store (REDIS_URL):
+    - revoked:jti:{jti} with TTL = remaining token lifetime (authoritative)
+    - revoked:log sorted set (score = revocation time) for delta sync
+    Each worker keeps a local Bloom filter of revoked jtis, topped up from the log
+    at most every TOKEN_BLACKLIST_SYNC_SECONDS. "Not in the filter" -- the common
+    case -- costs no I/O; a filter hit is confirmed against revoked:jti:{jti}.
+    Async callers use is_blacklisted_async(): the sync and the confirm run in a
+    worker thread, never on the event loop.
+
+    Without a shared store, revocations are kept in-process until the token expires
+    (correct for a single worker only).
     """
 
-    MAX_SIZE = 10000
-    EVICT_BATCH = 1000
-
-    def __init__(self):
-        self._blacklist: OrderedDict = OrderedDict()
-
-    def blacklist(self, jti: str) -> None:
-        """Add a token's jti to the blacklist."""
-        self._blacklist[jti] = time.time()
-        if len(self._blacklist) > self.MAX_SIZE:
-            # Evict oldest entries
-            for _ in range(self.EVICT_BATCH):
-                if self._blacklist:
-                    self._blacklist.popitem(last=False)
+    KEY_PREFIX = "revoked:jti:"
+    LOG_KEY = "revoked:log"
+
+    def __init__(
+        self,
+        redis_client=None,
+        sync_seconds: float = TOKEN_BLACKLIST_SYNC_SECONDS,
+        bloom_capacity: int = TOKEN_BLACKLIST_BLOOM_CAPACITY
+    ):
+        self._lock = threading.Lock()
+        self._client = redis_client
+        self._client_resolved = redis_client is not None
+        self._revoke_script = None
+        self._sync_seconds = sync_seconds
+        self._bloom_capacity = bloom_capacity
+        self._bloom = BloomFilter(bloom_capacity)
+        self._watermark = 0.0  # Highest log score pulled so far
+        self._watermark_members: set = set()  # Members at exactly that score (skip on re-pull)
+        self._next_sync = 0.0
+        self._local: Dict[str, float] = {}  # jti -> exp: in-process store (or shared-store outage)
+
+    def _redis(self):
+        """Shared store client, resolved on first use."""
+        if not self._client_resolved:
+            from .shared_store import get_redis
+            self._client = get_redis()
+            self._client_resolved = True
+        return self._client
+
+    def blacklist(self, jti: str, expires_at: Optional[float] = None) -> None:
+        """
+        Revoke a token until it expires.
+
+        Args:
+            jti: Token's jti claim
+            expires_at: Token's exp claim (unix time); defaults to the longest token lifetime
+        """
+        now = time.time()
+        expires_at = expires_at or now + MAX_TOKEN_LIFETIME_SECONDS
+        ttl = math.ceil(expires_at - now)
+        if ttl <= 0:
+            return  # Already expired -- decode_token rejects it anyway
+
+        client = self._redis()
+        if client is not None:
+            try:
+                if self._revoke_script is None:
+                    self._revoke_script = client.register_script(_REVOKE_SCRIPT)
+                self._revoke_script(
+                    keys=[self.KEY_PREFIX + jti, self.LOG_KEY],
+                    args=[f"{jti}:{int(expires_at)}", ttl, MAX_TOKEN_LIFETIME_SECONDS],
+                )
+                with self._lock:
+                    self._bloom.add(jti)
+                return
+            except Exception as e:
+                logger.error(f"[ERROR] Shared token blacklist unavailable, revoking on this worker only: {e}")
+
+        with self._lock:
+            self._local[jti] = expires_at
+            should_cleanup = len(self._local) % 1000 == 0
+        if should_cleanup:
+            self.cleanup()
 
     def is_blacklisted(self, jti: str) -> bool:
-        """Check if a token's jti has been blacklisted."""
-        return jti in self._blacklist
+        """Check if a token's jti has been revoked."""
+        with self._lock:
+            local_exp = self._local.get(jti)
+        if local_exp is not None and local_exp > time.time():
+            return True
+
+        client = self._redis()
+        if client is None:
+            return False
+
+        self._sync(client)
+        with self._lock:
+            if jti not in self._bloom:
+                return False
+        try:
+            return bool(client.exists(self.KEY_PREFIX + jti))
+        except Exception as e:
+            # Fail closed: a possibly revoked token is rejected while the store is down
+            logger.warning(f"[WARNING] Token blacklist confirm failed, rejecting token: {e}")
+            return True
+
+    def cached_verdict(self, jti: str) -> Optional[bool]:
+        """
+        is_blacklisted() without I/O: True/False when local state decides it,
+        None when the shared store must be asked (client not resolved yet,
+        delta sync due, or a filter hit to confirm).
+        """
+        now = time.time()
+        with self._lock:
+            local_exp = self._local.get(jti)
+            if local_exp is not None and local_exp > now:
+                return True
+            if not self._client_resolved:
+                return None
+            if self._client is None:
+                return False
+            if now >= self._next_sync:
+                return None
+            return False if jti not in self._bloom else None
+
+    async def is_blacklisted_async(self, jti: str) -> bool:
+        """is_blacklisted() that keeps shared-store calls off the event loop."""
+        verdict = self.cached_verdict(jti)
+        if verdict is None:
+            verdict = await asyncio.to_thread(self.is_blacklisted, jti)
+        return verdict
+
+    def _sync(self, client) -> None:
+        """Pull revocations logged since the last sync into the Bloom filter (rate-limited)."""
+        now = time.time()
+        with self._lock:
+            if now < self._next_sync:
+                return
+            self._next_sync = now + self._sync_seconds
+            rebuild = self._bloom.saturated
+            since = "-inf" if rebuild else self._watermark
+
+        try:
+            entries = client.zrangebyscore(self.LOG_KEY, since, "+inf", withscores=True)
+        except Exception as e:
+            logger.warning(f"[WARNING] Token blacklist sync failed: {e}")
+            return
+
+        with self._lock:
+            if rebuild:
+                live = sum(1 for member, _ in entries if float(member.rsplit(b":", 1)[1]) > now)
+                self._bloom_capacity = max(self._bloom_capacity, live * 2)
+                self._bloom = BloomFilter(self._bloom_capacity)
+                self._watermark_members = set()
+            for member, score in entries:
+                if score == self._watermark and member in self._watermark_members:
+                    continue
+                jti, exp = member.decode().rsplit(":", 1)
+                if float(exp) > now:
+                    self._bloom.add(jti)
+                if score > self._watermark:
+                    self._watermark = score
+                    self._watermark_members = set()
+                self._watermark_members.add(member)
 
     def cleanup(self) -> int:
-        """Remove entries older than REFRESH_TOKEN_EXPIRE_DAYS + 1 day."""
-        cutoff = time.time() - ((REFRESH_TOKEN_EXPIRE_DAYS + 1) * 86400)
-        removed = 0
-        keys_to_remove = [
-            k for k, v in self._blacklist.items() if v < cutoff
-        ]
-        for k in keys_to_remove:
-            del self._blacklist[k]
-            removed += 1
-        return removed
+        """Remove in-process entries for tokens that have expired."""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, exp in self._local.items() if exp <= now]
+            for k in expired:
+                del self._local[k]
+        return len(expired)
 
 
 # Global singleton
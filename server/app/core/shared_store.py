@@ -0,0 +1,52 @@
+"""
+Shared Store
+Lazy Redis client for state that must be shared by all uvicorn workers.
+
+Returns None when REDIS_URL is not set or the redis package is not installed;
+callers then fall back to in-process state (correct for a single worker).
+Any Redis-protocol server works (Redis, Valkey, KeyDB, fakeredis in tests).
+"""
+
+import logging
+import threading
+from typing import Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_resolved = False
+_lock = threading.Lock()
+
+
+def get_redis():
+    """Shared redis.Redis client, or None if no shared store is configured."""
+    global _client, _resolved
+    if _resolved:
+        return _client
+    with _lock:
+        if _resolved:
+            return _client
+        if settings.REDIS_URL:
+            try:
+                import redis
+                _client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_timeout=0.5,
+                    socket_connect_timeout=1.0,
+                    health_check_interval=30,
+                )
+                logger.info("[OK] Shared store: Redis")
+            except ImportError:
+                logger.warning("[WARNING] REDIS_URL is set but the redis package is not installed, using in-process state")
+        _resolved = True
+        return _client
+
+
+def set_redis(client: Optional[object]) -> None:
+    """Override the shared client (e.g. a fakeredis instance in tests)."""
+    global _client, _resolved
+    with _lock:
+        _client = client
+        _resolved = True
@@ -0,0 +1,217 @@
+"""
+SQL Instrumentation
+Per-request query count, DB time and repeated-statement detection (N+1).
+
+Engine-level before/after_cursor_execute hooks add every statement to the stats
+of the request being served (a context variable set by the HTTP middleware).
+Statements are fingerprinted -- whitespace collapsed, expanded IN lists folded
+to "(?)" -- so the same query in a loop shows up as one fingerprint with a high
+count.
+
+Surfaced as:
+- X-DB-* response headers in development
+- per-route aggregates in /health ("sql"), and a warning log when a statement
+  repeats N_PLUS_ONE_THRESHOLD+ times in one request
+- query_budget(): context manager for tests, raises QueryBudgetExceeded
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Same fingerprint this many times in one request -> logged as a suspected N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)*\s*\)")
+_NUMBERED_PARAM = re.compile(r"%\((\w+?)_\d+\)s")
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so repeats of the same query compare equal."""
+    statement = _IN_LIST.sub("(?)", statement)
+    statement = _NUMBERED_PARAM.sub(r"%(\1)s", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def route_label(scope: dict) -> str:
+    """Path template for grouping metrics: /api/favorites/42 -> /api/favorites/{favorite_id}."""
+    segments = scope.get("path", "").split("/")
+    # Match params right to left so a value that equals a prefix segment isn't replaced
+    end = len(segments)
+    for name, value in reversed(list((scope.get("path_params") or {}).items())):
+        for i in range(end - 1, 0, -1):
+            if segments[i] == str(value):
+                segments[i] = "{" + name + "}"
+                end = i
+                break
+    return "/".join(segments)
+
+
+class RequestQueryStats:
+    """Statements executed while serving one request (or one query_budget block)."""
+
+    __slots__ = ("count", "total_ms", "fingerprints")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def most_repeated(self) -> Tuple[Optional[str], int]:
+        if not self.fingerprints:
+            return None, 0
+        return self.fingerprints.most_common(1)[0]
+
+    def headers(self) -> Dict[str, str]:
+        _, repeats = self.most_repeated()
+        return {
+            "X-DB-Query-Count": str(self.count),
+            "X-DB-Time": f"{self.total_ms:.2f}ms",
+            "X-DB-Max-Repeats": str(repeats),
+        }
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar("sql_request_stats", default=None)
+
+
+# =============================================================================
+# ENGINE HOOKS (all engines: primary, replica)
+# =============================================================================
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    stats.record(statement, (time.perf_counter() - starts.pop()) * 1000)
+
+
+# =============================================================================
+# PER-ROUTE METRICS
+# =============================================================================
+
+class SQLMetrics:
+    """Thread-safe per-route aggregates of request query stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, float]] = {}
+        self._observers: List[List[Tuple[str, RequestQueryStats]]] = []
+
+    def start_request(self):
+        """Begin collecting for the current request. Returns (stats, token)."""
+        stats = RequestQueryStats()
+        return stats, _current.set(stats)
+
+    def finish_request(self, route: str, stats: RequestQueryStats, token) -> None:
+        _current.reset(token)
+        statement, repeats = stats.most_repeated()
+        n_plus_one = repeats >= N_PLUS_ONE_THRESHOLD
+        if n_plus_one:
+            logger.warning(f"[WARNING] N+1 suspected on {route}: {repeats}x {statement[:200]}")
+
+        with self._lock:
+            entry = self._routes.setdefault(route, {
+                "requests": 0, "queries": 0, "db_ms": 0.0, "max_queries": 0, "n_plus_one": 0
+            })
+            entry["requests"] += 1
+            entry["queries"] += stats.count
+            entry["db_ms"] += stats.total_ms
+            entry["max_queries"] = max(entry["max_queries"], stats.count)
+            entry["n_plus_one"] += int(n_plus_one)
+            for observed in self._observers:
+                observed.append((route, stats))
+
+    def stats(self, top: int = 10) -> dict:
+        """Routes with the most queries per request first."""
+        with self._lock:
+            routes = [
+                {
+                    "route": route,
+                    "requests": int(e["requests"]),
+                    "avg_queries": round(e["queries"] / e["requests"], 1),
+                    "avg_db_ms": round(e["db_ms"] / e["requests"], 2),
+                    "max_queries": int(e["max_queries"]),
+                    "n_plus_one": int(e["n_plus_one"]),
+                }
+                for route, e in self._routes.items()
+            ]
+        routes.sort(key=lambda r: r["avg_queries"], reverse=True)
+        return {"n_plus_one_threshold": N_PLUS_ONE_THRESHOLD, "routes": routes[:top]}
+
+
+# Global singleton
+sql_metrics = SQLMetrics()
+
+
+# =============================================================================
+# QUERY BUDGETS (tests)
+# =============================================================================
+
+class QueryBudgetExceeded(AssertionError):
+    """A request (or block) ran more queries, or repeated one more often, than allowed."""
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: Optional[int] = None):
+    """
+    Fail when code in the block -- or any request served while it is open
+    (e.g. through TestClient) -- exceeds the budget.
+
+        with query_budget(5, max_repeats=2):
+            client.get("/api/favorites/")
+
+    Args:
+        max_queries: Most statements allowed per request
+        max_repeats: Most executions of one fingerprint per request (N+1 guard)
+
+    Raises:
+        QueryBudgetExceeded
+    """
+    own = RequestQueryStats()
+    token = _current.set(own)
+    observed: List[Tuple[str, RequestQueryStats]] = []
+    with sql_metrics._lock:
+        sql_metrics._observers.append(observed)
+    try:
+        yield observed
+    finally:
+        _current.reset(token)
+        with sql_metrics._lock:
+            sql_metrics._observers.remove(observed)
+
+    failures = []
+    for label, stats in [("block", own)] + observed:
+        if stats.count > max_queries:
+            failures.append(f"{label}: {stats.count} queries (budget {max_queries})")
+        statement, repeats = stats.most_repeated()
+        if max_repeats is not None and repeats > max_repeats:
+            failures.append(f"{label}: {repeats}x {statement[:200]} (max {max_repeats})")
+    if failures:
+        raise QueryBudgetExceeded("; ".join(failures))
@@ -0,0 +1,137 @@
+"""
+Authenticated User Cache
+Short-TTL in-process cache of user snapshots, so get_current_user() skips the
+users-table SELECT on every authenticated request.
+
+- Snapshots hold the mapped columns only (id, tier, is_active, credits, flags, ...)
+- A hit is rebuilt into a detached-but-persistent User attached to the request
+  session: attribute reads are free, relationships still lazy-load, and
+  modifications + commit work as before
+- Entries expire after USER_CACHE_TTL_SECONDS; writes through any session
+  invalidate the entry for that user (after_flush hook), and code paths that
+  change users without the ORM (bulk UPDATEs, raw SQL) call invalidate() explicitly
+
+Other workers may serve a snapshot up to the TTL old -- credit deductions
+reload the balance before writing (CreditManager), so only reads are stale.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+
+from ..db.models import User
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_SIZE = 10000
+
+_USER_COLUMNS = tuple(attr.key for attr in sa_inspect(User).mapper.column_attrs)
+
+
+class UserSnapshotCache:
+    """Thread-safe LRU of {user_id: (expires_at, column snapshot)}."""
+
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL_SECONDS, max_size: int = USER_CACHE_MAX_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._counters: Dict[str, int] = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Fresh snapshot for a user, or None."""
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, user: User) -> None:
+        """Remember the current column values of a loaded user."""
+        if self.ttl_seconds <= 0 or user.id is None:
+            return
+        snapshot = {key: getattr(user, key) for key in _USER_COLUMNS}
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[int]) -> None:
+        """Drop a user's snapshot (call after changing tier, credits, is_active, ...)."""
+        if user_id is None:
+            return
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self._counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def load(self, db: Session, user_id: int) -> Optional[User]:
+        """
+        User for user_id, attached to db: from a cached snapshot when fresh,
+        otherwise from the database (and cached).
+        """
+        existing = db.identity_map.get(identity_key(User, user_id))
+        if existing is not None:
+            return existing
+
+        snapshot = self.get(user_id)
+        if snapshot is not None:
+            user = User(**snapshot)
+            make_transient_to_detached(user)
+            db.add(user)
+            return user
+
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is not None:
+            self.put(user)
+        return user
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["entries"] = len(self._entries)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        return counters
+
+
+# Global singleton
+user_cache = UserSnapshotCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_users(session: Session, flush_context) -> None:
+    """Any User row written or deleted through the ORM drops its snapshot."""
+    user_ids = {obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)}
+    if user_ids:
+        session.info.setdefault("flushed_user_ids", set()).update(user_ids)
+        for user_id in user_ids:
+            user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    """Invalidate again once committed -- a concurrent miss may have re-cached the old row."""
+    for user_id in session.info.pop("flushed_user_ids", ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_flushed_users(session: Session) -> None:
+    session.info.pop("flushed_user_ids", None)
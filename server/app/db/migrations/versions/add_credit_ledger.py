@@ -0,0 +1,35 @@
+"""add append-only credit_ledger
+
+Revision ID: add_credit_ledger
+Revises: add_image_variants
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_credit_ledger'
+down_revision = 'add_image_variants'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS credit_ledger (
+            id BIGSERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            delta INTEGER NOT NULL,
+            balance_after INTEGER NOT NULL,
+            reason VARCHAR(50) NOT NULL,
+            reference VARCHAR(100),
+            created_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_credit_ledger_user_created ON credit_ledger (user_id, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_credit_ledger_created ON credit_ledger (created_at)")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS credit_ledger")
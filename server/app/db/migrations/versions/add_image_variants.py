@@ -0,0 +1,25 @@
+"""add responsive image variants (stored_images.variants, videos.cover_srcset)
+
+Revision ID: add_image_variants
+Revises: add_stored_images
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_image_variants'
+down_revision = 'add_stored_images'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE stored_images ADD COLUMN IF NOT EXISTS variants JSONB NOT NULL DEFAULT '{}'")
+    op.execute("ALTER TABLE videos ADD COLUMN IF NOT EXISTS cover_srcset JSONB")
+
+
+def downgrade():
+    op.execute("ALTER TABLE videos DROP COLUMN IF EXISTS cover_srcset")
+    op.execute("ALTER TABLE stored_images DROP COLUMN IF EXISTS variants")
@@ -0,0 +1,124 @@
+"""indexed storage paths of referenced images (videos.cover_path, competitors.image_paths)
+
+The stored-image reference check matches these instead of searching every
+cover URL and competitor JSON for a substring.
+
+Revision ID: add_stored_image_paths
+Revises: user_trend_scan_state
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_stored_image_paths'
+down_revision = 'user_trend_scan_state'
+branch_labels = None
+depends_on = None
+
+# Rows per backfill UPDATE (each batch commits on its own, so locks stay short)
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade():
+    # =========================================================================
+    # 1. Columns
+    # =========================================================================
+    op.execute("ALTER TABLE videos ADD COLUMN IF NOT EXISTS cover_path TEXT")
+    op.execute("ALTER TABLE competitors ADD COLUMN IF NOT EXISTS image_paths TEXT[] NOT NULL DEFAULT '{}'")
+
+    # =========================================================================
+    # 2. Triggers: image URLs -> bucket-relative storage paths
+    # =========================================================================
+    # Same path as SupabaseStorage.extract_path_from_url(); NULL for other hosts
+    op.execute("""
+        CREATE OR REPLACE FUNCTION storage_path(url TEXT) RETURNS TEXT
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT CASE WHEN strpos(url, 'supabase') > 0
+                        THEN substring(url FROM 'rizko-images/([^?#]+)') END
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION competitor_image_paths(avatar_url TEXT, recent_videos JSONB) RETURNS TEXT[]
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT COALESCE(array_agg(DISTINCT p), '{}') FROM (
+                SELECT storage_path(avatar_url) AS p
+                UNION ALL
+                SELECT storage_path(v ->> f)
+                FROM jsonb_array_elements(
+                        CASE WHEN jsonb_typeof(recent_videos) = 'array' THEN recent_videos ELSE '[]' END
+                     ) AS v,
+                     unnest(ARRAY['cover_url', 'thumbnail_url']) AS f
+            ) s
+            WHERE p IS NOT NULL
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION videos_sync_cover_path() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.cover_path := storage_path(NEW.cover_url);
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION competitors_sync_image_paths() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.image_paths := competitor_image_paths(NEW.avatar_url, NEW.recent_videos);
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_videos_sync_cover_path ON videos")
+    op.execute("""
+        CREATE TRIGGER trg_videos_sync_cover_path
+            BEFORE INSERT OR UPDATE OF cover_url ON videos
+            FOR EACH ROW EXECUTE FUNCTION videos_sync_cover_path()
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_competitors_sync_image_paths ON competitors")
+    op.execute("""
+        CREATE TRIGGER trg_competitors_sync_image_paths
+            BEFORE INSERT OR UPDATE OF avatar_url, recent_videos ON competitors
+            FOR EACH ROW EXECUTE FUNCTION competitors_sync_image_paths()
+    """)
+
+    # =========================================================================
+    # 3. Batched backfill + indexes, outside the migration transaction
+    # =========================================================================
+    # "SET col = col" fires the triggers; only Supabase URLs have a path to fill in
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(text("SELECT COALESCE(MAX(id), 0) FROM videos")).scalar()
+        for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+            bind.execute(
+                text("""
+                    UPDATE videos SET cover_url = cover_url
+                    WHERE id > :start AND id <= :end AND cover_url LIKE '%supabase%'
+                """),
+                {"start": start, "end": start + BACKFILL_BATCH_SIZE}
+            )
+        bind.execute(text("UPDATE competitors SET avatar_url = avatar_url"))
+
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_videos_cover_path
+                ON videos (cover_path) WHERE cover_path IS NOT NULL
+        """)
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_competitors_image_paths
+                ON competitors USING GIN (image_paths)
+        """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_competitors_sync_image_paths ON competitors")
+    op.execute("DROP TRIGGER IF EXISTS trg_videos_sync_cover_path ON videos")
+    op.execute("DROP FUNCTION IF EXISTS competitors_sync_image_paths()")
+    op.execute("DROP FUNCTION IF EXISTS videos_sync_cover_path()")
+    op.execute("DROP FUNCTION IF EXISTS competitor_image_paths(TEXT, JSONB)")
+    op.execute("DROP FUNCTION IF EXISTS storage_path(TEXT)")
+    op.execute("ALTER TABLE competitors DROP COLUMN IF EXISTS image_paths")
+    op.execute("ALTER TABLE videos DROP COLUMN IF EXISTS cover_path")
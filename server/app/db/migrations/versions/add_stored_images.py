@@ -0,0 +1,37 @@
+"""add stored_images index for content-addressed uploads
+
+Revision ID: add_stored_images
+Revises: add_videos_catalog
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_stored_images'
+down_revision = 'add_videos_catalog'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS stored_images (
+            id SERIAL PRIMARY KEY,
+            url_key VARCHAR(64) NOT NULL,
+            content_hash VARCHAR(64) NOT NULL,
+            path VARCHAR(255) NOT NULL,
+            public_url TEXT NOT NULL,
+            content_type VARCHAR(50),
+            size_bytes INTEGER,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_stored_images_id ON stored_images (id)")
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_stored_images_url_key ON stored_images (url_key)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_stored_images_content_hash ON stored_images (content_hash)")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS stored_images")
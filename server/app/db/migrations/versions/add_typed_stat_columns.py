@@ -0,0 +1,146 @@
+"""typed, indexed stat columns derived from videos.stats
+
+Revision ID: add_typed_stat_columns
+Revises: widen_trend_url_columns
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_typed_stat_columns'
+down_revision = 'widen_trend_url_columns'
+branch_labels = None
+depends_on = None
+
+# Rows per backfill UPDATE (each batch commits on its own, so locks stay short)
+BACKFILL_BATCH_SIZE = 5000
+
+STAT_COLUMNS = ("play_count", "digg_count", "comment_count", "share_count", "collect_count")
+
+
+def upgrade():
+    # =========================================================================
+    # 1. Columns (constant defaults: metadata-only, no table rewrite)
+    # =========================================================================
+    for col in STAT_COLUMNS:
+        op.execute(f"ALTER TABLE videos ADD COLUMN IF NOT EXISTS {col} BIGINT NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE videos ADD COLUMN IF NOT EXISTS engagement_rate DOUBLE PRECISION NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE user_trends ADD COLUMN IF NOT EXISTS video_play_count BIGINT NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE user_trends ADD COLUMN IF NOT EXISTS video_engagement_rate DOUBLE PRECISION NOT NULL DEFAULT 0")
+
+    # =========================================================================
+    # 2. Triggers: stats JSONB -> typed columns -> user_trends mirrors
+    # =========================================================================
+    # Non-numeric values (missing keys, "", "1.2K") count as 0 instead of failing the write
+    op.execute("""
+        CREATE OR REPLACE FUNCTION stat_bigint(v JSONB) RETURNS BIGINT
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT CASE
+                WHEN jsonb_typeof(v) = 'number' THEN LEAST(GREATEST(v::text::numeric, 0), 9223372036854775807)::bigint
+                WHEN jsonb_typeof(v) = 'string' AND v #>> '{}' ~ '^[0-9]{1,18}(\\.[0-9]+)?$' THEN (v #>> '{}')::numeric::bigint
+                ELSE 0
+            END
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION videos_sync_stat_columns() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.play_count := stat_bigint(NEW.stats -> 'playCount');
+            NEW.digg_count := stat_bigint(NEW.stats -> 'diggCount');
+            NEW.comment_count := stat_bigint(NEW.stats -> 'commentCount');
+            NEW.share_count := stat_bigint(NEW.stats -> 'shareCount');
+            NEW.collect_count := GREATEST(stat_bigint(NEW.stats -> 'collectCount'), stat_bigint(NEW.stats -> 'saveCount'));
+            NEW.engagement_rate := CASE WHEN NEW.play_count > 0
+                THEN round(((NEW.digg_count + NEW.comment_count + NEW.share_count)::numeric / NEW.play_count * 100), 2)::float8
+                ELSE 0 END;
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION videos_mirror_stat_columns() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE user_trends
+            SET video_play_count = NEW.play_count, video_engagement_rate = NEW.engagement_rate
+            WHERE video_id = NEW.id;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION user_trends_copy_stat_columns() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            SELECT play_count, engagement_rate INTO NEW.video_play_count, NEW.video_engagement_rate
+            FROM videos WHERE id = NEW.video_id;
+            NEW.video_play_count := COALESCE(NEW.video_play_count, 0);
+            NEW.video_engagement_rate := COALESCE(NEW.video_engagement_rate, 0);
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_videos_sync_stat_columns ON videos")
+    op.execute("""
+        CREATE TRIGGER trg_videos_sync_stat_columns
+            BEFORE INSERT OR UPDATE OF stats ON videos
+            FOR EACH ROW EXECUTE FUNCTION videos_sync_stat_columns()
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_videos_mirror_stat_columns ON videos")
+    op.execute("""
+        CREATE TRIGGER trg_videos_mirror_stat_columns
+            AFTER UPDATE OF stats ON videos
+            FOR EACH ROW
+            WHEN (OLD.play_count IS DISTINCT FROM NEW.play_count
+                  OR OLD.engagement_rate IS DISTINCT FROM NEW.engagement_rate)
+            EXECUTE FUNCTION videos_mirror_stat_columns()
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_user_trends_copy_stat_columns ON user_trends")
+    op.execute("""
+        CREATE TRIGGER trg_user_trends_copy_stat_columns
+            BEFORE INSERT OR UPDATE OF video_id ON user_trends
+            FOR EACH ROW EXECUTE FUNCTION user_trends_copy_stat_columns()
+    """)
+
+    # =========================================================================
+    # 3. Batched backfill + indexes, outside the migration transaction
+    # =========================================================================
+    # "SET stats = stats" fires both triggers, so user_trends is backfilled too
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(text("SELECT COALESCE(MAX(id), 0) FROM videos")).scalar()
+        for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+            bind.execute(
+                text("UPDATE videos SET stats = stats WHERE id > :start AND id <= :end"),
+                {"start": start, "end": start + BACKFILL_BATCH_SIZE}
+            )
+
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_videos_play_count ON videos (play_count)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_videos_engagement_rate ON videos (engagement_rate)")
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_trends_user_play_count
+                ON user_trends (user_id, video_play_count)
+        """)
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_trends_user_engagement
+                ON user_trends (user_id, video_engagement_rate)
+        """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_user_trends_copy_stat_columns ON user_trends")
+    op.execute("DROP TRIGGER IF EXISTS trg_videos_mirror_stat_columns ON videos")
+    op.execute("DROP TRIGGER IF EXISTS trg_videos_sync_stat_columns ON videos")
+    op.execute("DROP FUNCTION IF EXISTS user_trends_copy_stat_columns()")
+    op.execute("DROP FUNCTION IF EXISTS videos_mirror_stat_columns()")
+    op.execute("DROP FUNCTION IF EXISTS videos_sync_stat_columns()")
+    op.execute("DROP FUNCTION IF EXISTS stat_bigint(JSONB)")
+    op.execute("ALTER TABLE user_trends DROP COLUMN IF EXISTS video_engagement_rate")
+    op.execute("ALTER TABLE user_trends DROP COLUMN IF EXISTS video_play_count")
+    op.execute("ALTER TABLE videos DROP COLUMN IF EXISTS engagement_rate")
+    for col in STAT_COLUMNS:
+        op.execute(f"ALTER TABLE videos DROP COLUMN IF EXISTS {col}")
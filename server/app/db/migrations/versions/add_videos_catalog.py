@@ -0,0 +1,161 @@
+"""split trends into shared videos catalog + per-user user_trends
+
+Revision ID: add_videos_catalog
+Revises: trend_user_platform_uniq
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_videos_catalog'
+down_revision = 'trend_user_platform_uniq'
+branch_labels = None
+depends_on = None
+
+
+def _drop_foreign_keys_to(table: str) -> None:
+    """Drop every FK constraint that references the given table (names vary between environments)."""
+    op.execute(f"""
+        DO $$ DECLARE r record; BEGIN
+            FOR r IN
+                SELECT conrelid::regclass AS tbl, conname
+                FROM pg_constraint
+                WHERE contype = 'f' AND confrelid = '{table}'::regclass
+            LOOP
+                EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', r.tbl, r.conname);
+            END LOOP;
+        END $$;
+    """)
+
+
+def upgrade():
+    # =========================================================================
+    # 1. videos table (one row per platform video)
+    # =========================================================================
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS videos (
+            id SERIAL PRIMARY KEY,
+            platform VARCHAR(20) NOT NULL DEFAULT 'tiktok',
+            platform_id VARCHAR(100) NOT NULL,
+            url TEXT,
+            play_addr TEXT,
+            description TEXT,
+            cover_url TEXT,
+            music_id VARCHAR(100),
+            music_title VARCHAR(255),
+            author_username VARCHAR(100),
+            author_followers INTEGER DEFAULT 0,
+            stats JSONB NOT NULL DEFAULT '{}',
+            initial_stats JSONB NOT NULL DEFAULT '{}',
+            uts_score FLOAT DEFAULT 0.0,
+            cluster_id INTEGER,
+            similarity_score FLOAT DEFAULT 0.0,
+            reach_score FLOAT DEFAULT 0.0,
+            uplift_score FLOAT DEFAULT 0.0,
+            ai_summary TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            last_scanned_at TIMESTAMP
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_videos_id ON videos (id)")
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_videos_platform_id ON videos (platform_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_videos_url ON videos (url)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_videos_music_id ON videos (music_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_videos_author_username ON videos (author_username)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_videos_uts_score ON videos (uts_score)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_videos_cluster_id ON videos (cluster_id)")
+
+    # =========================================================================
+    # 2. user_trends table (per-user association)
+    # =========================================================================
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS user_trends (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+            vertical VARCHAR(100),
+            search_query VARCHAR(255),
+            search_mode searchmode,
+            is_deep_scan BOOLEAN DEFAULT false,
+            is_favorite BOOLEAN NOT NULL DEFAULT false,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            CONSTRAINT uix_user_trend_video UNIQUE (user_id, video_id)
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_trends_id ON user_trends (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_trends_user_id ON user_trends (user_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_trends_video_id ON user_trends (video_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_trends_vertical ON user_trends (vertical)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_trends_user_vertical ON user_trends (user_id, vertical)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_trends_user_created ON user_trends (user_id, created_at)")
+
+    # =========================================================================
+    # 3. Backfill: newest copy of each video wins, trend ids are kept
+    # =========================================================================
+    # Rows without platform_id get a synthetic key so they stay addressable
+    op.execute("""
+        INSERT INTO videos (
+            platform_id, url, play_addr, description, cover_url, music_id, music_title,
+            author_username, author_followers, stats, initial_stats, uts_score, cluster_id,
+            similarity_score, reach_score, uplift_score, ai_summary, created_at, last_scanned_at
+        )
+        SELECT DISTINCT ON (COALESCE(platform_id, 'trend_' || id))
+            COALESCE(platform_id, 'trend_' || id), url, play_addr, description, cover_url,
+            music_id, music_title, author_username, author_followers, stats, initial_stats,
+            uts_score, cluster_id, similarity_score, reach_score, uplift_score, ai_summary,
+            created_at, last_scanned_at
+        FROM trends
+        ORDER BY COALESCE(platform_id, 'trend_' || id), id DESC
+        ON CONFLICT (platform_id) DO NOTHING
+    """)
+    op.execute("""
+        INSERT INTO user_trends (
+            id, user_id, video_id, vertical, search_query, search_mode, is_deep_scan, is_favorite, created_at
+        )
+        SELECT
+            t.id, t.user_id, v.id, t.vertical, t.search_query, t.search_mode, t.is_deep_scan,
+            EXISTS (SELECT 1 FROM user_favorites f WHERE f.trend_id = t.id AND f.user_id = t.user_id),
+            t.created_at
+        FROM trends t
+        JOIN videos v ON v.platform_id = COALESCE(t.platform_id, 'trend_' || t.id)
+        ON CONFLICT DO NOTHING
+    """)
+    op.execute("SELECT setval(pg_get_serial_sequence('user_trends', 'id'), COALESCE((SELECT MAX(id) FROM user_trends), 0) + 1, false)")
+
+    # =========================================================================
+    # 4. Re-point favorites/scripts to user_trends, keep trends as a backup
+    # =========================================================================
+    _drop_foreign_keys_to("trends")
+    op.execute("DELETE FROM user_favorites WHERE trend_id NOT IN (SELECT id FROM user_trends)")
+    op.execute("UPDATE user_scripts SET source_trend_id = NULL WHERE source_trend_id NOT IN (SELECT id FROM user_trends)")
+    op.execute("""
+        ALTER TABLE user_favorites ADD CONSTRAINT fk_user_favorites_user_trend
+            FOREIGN KEY (trend_id) REFERENCES user_trends(id) ON DELETE CASCADE
+    """)
+    op.execute("""
+        ALTER TABLE user_scripts ADD CONSTRAINT fk_user_scripts_source_user_trend
+            FOREIGN KEY (source_trend_id) REFERENCES user_trends(id) ON DELETE SET NULL
+    """)
+    op.execute("ALTER TABLE trends RENAME TO trends_legacy")
+
+
+def downgrade():
+    # Restores the pre-catalog trends table; rows created after the upgrade are dropped
+    op.execute("ALTER TABLE user_favorites DROP CONSTRAINT IF EXISTS fk_user_favorites_user_trend")
+    op.execute("ALTER TABLE user_scripts DROP CONSTRAINT IF EXISTS fk_user_scripts_source_user_trend")
+    op.execute("ALTER TABLE trends_legacy RENAME TO trends")
+    op.execute("DELETE FROM user_favorites WHERE trend_id NOT IN (SELECT id FROM trends)")
+    op.execute("UPDATE user_scripts SET source_trend_id = NULL WHERE source_trend_id NOT IN (SELECT id FROM trends)")
+    op.execute("""
+        ALTER TABLE user_favorites ADD CONSTRAINT user_favorites_trend_id_fkey
+            FOREIGN KEY (trend_id) REFERENCES trends(id) ON DELETE CASCADE
+    """)
+    op.execute("""
+        ALTER TABLE user_scripts ADD CONSTRAINT fk_user_scripts_source_trend
+            FOREIGN KEY (source_trend_id) REFERENCES trends(id) ON DELETE SET NULL
+    """)
+    op.execute("DROP TABLE IF EXISTS user_trends")
+    op.execute("DROP TABLE IF EXISTS videos")
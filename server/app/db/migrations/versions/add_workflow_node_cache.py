@@ -0,0 +1,35 @@
+"""add workflow_node_cache for memoized node outputs
+
+Revision ID: add_workflow_node_cache
+Revises: partition_history_tables
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_workflow_node_cache'
+down_revision = 'partition_history_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS workflow_node_cache (
+            cache_key VARCHAR(64) PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            node_type VARCHAR(50) NOT NULL,
+            output TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL DEFAULT 0,
+            hit_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            last_used_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_workflow_node_cache_last_used ON workflow_node_cache (last_used_at)")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS workflow_node_cache")
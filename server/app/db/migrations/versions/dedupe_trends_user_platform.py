@@ -0,0 +1,75 @@
+"""dedupe trends and enforce (user_id, platform_id) unique key
+
+Revision ID: trend_user_platform_uniq
+Revises: add_wfrun_pinned
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'trend_user_platform_uniq'
+down_revision = 'add_wfrun_pinned'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # =========================================================================
+    # 1. Map every duplicate (user_id, platform_id) row to the newest copy
+    # =========================================================================
+    op.execute("""
+        CREATE TEMP TABLE trend_dupes ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, MAX(id) OVER (PARTITION BY user_id, platform_id) AS keep_id
+            FROM trends
+            WHERE platform_id IS NOT NULL
+        ) ranked
+        WHERE id <> keep_id
+    """)
+
+    # =========================================================================
+    # 2. Re-point favorites and scripts to the surviving row
+    # =========================================================================
+    # Drop favorites that would collide with uix_favorite_user_trend after re-pointing
+    op.execute("""
+        DELETE FROM user_favorites f
+        USING trend_dupes d
+        WHERE f.trend_id = d.id
+          AND (
+            EXISTS (
+                SELECT 1 FROM user_favorites k
+                WHERE k.user_id = f.user_id AND k.trend_id = d.keep_id
+            )
+            OR EXISTS (
+                SELECT 1 FROM user_favorites f2
+                JOIN trend_dupes d2 ON f2.trend_id = d2.id
+                WHERE d2.keep_id = d.keep_id AND f2.user_id = f.user_id AND f2.id < f.id
+            )
+          )
+    """)
+    op.execute("""
+        UPDATE user_favorites f SET trend_id = d.keep_id
+        FROM trend_dupes d WHERE f.trend_id = d.id
+    """)
+    op.execute("""
+        UPDATE user_scripts s SET source_trend_id = d.keep_id
+        FROM trend_dupes d WHERE s.source_trend_id = d.id
+    """)
+
+    # =========================================================================
+    # 3. Delete duplicates and add the unique key (IF NOT EXISTS)
+    # =========================================================================
+    op.execute("DELETE FROM trends t USING trend_dupes d WHERE t.id = d.id")
+    op.execute("""
+        DO $$ BEGIN
+            ALTER TABLE trends ADD CONSTRAINT uix_trend_user_platform UNIQUE (user_id, platform_id);
+        EXCEPTION WHEN duplicate_table OR duplicate_object THEN NULL;
+        END $$;
+    """)
+
+
+def downgrade():
+    # Removed duplicates are not restored
+    op.execute("ALTER TABLE trends DROP CONSTRAINT IF EXISTS uix_trend_user_platform")
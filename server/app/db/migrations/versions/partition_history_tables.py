@@ -0,0 +1,104 @@
+"""monthly range partitioning for user_searches, chat_messages, workflow_runs
+
+Revision ID: partition_history_tables
+Revises: add_typed_stat_columns
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'partition_history_tables'
+down_revision = 'add_typed_stat_columns'
+branch_labels = None
+depends_on = None
+
+# table -> partition key
+PARTITIONED_TABLES = {
+    "user_searches": "created_at",
+    "chat_messages": "created_at",
+    "workflow_runs": "started_at",
+}
+
+# Future months created up front (the scheduler keeps this window rolling)
+PREMAKE_MONTHS = 3
+
+
+def _rebuild(table: str, create_sql: str, primary_key: str, after_create=None) -> None:
+    """
+    Recreate a table under a new definition, keeping rows, the id sequence,
+    secondary indexes and foreign keys (captured from the catalog, so names
+    stay the same across environments).
+    """
+    bind = op.get_bind()
+    indexes = [
+        r[0] for r in bind.execute(
+            text("SELECT indexdef FROM pg_indexes WHERE schemaname = 'public' AND tablename = :t AND indexname <> :pk"),
+            {"t": table, "pk": f"{table}_pkey"}
+        )
+    ]
+    foreign_keys = bind.execute(
+        text("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = CAST(:t AS regclass) AND contype = 'f'"),
+        {"t": table}
+    ).all()
+
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    op.execute(f"ALTER TABLE {table}_old RENAME CONSTRAINT {table}_pkey TO {table}_old_pkey")
+    op.execute(create_sql.format(table=table, source=f"{table}_old"))
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({primary_key})")
+    if after_create:
+        after_create()
+    op.execute(f"INSERT INTO {table} SELECT * FROM {table}_old")
+    op.execute(f"""
+        DO $$ BEGIN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY {table}.id', pg_get_serial_sequence('{table}_old', 'id'));
+        END $$
+    """)
+    op.execute(f"DROP TABLE {table}_old")
+
+    for indexdef in indexes:
+        op.execute(indexdef)
+    for name, definition in foreign_keys:
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+
+def _create_partitions(table: str, key: str) -> None:
+    """Monthly partitions from the oldest row to PREMAKE_MONTHS ahead, plus a default catch-all."""
+    op.execute(f"""
+        DO $$
+        DECLARE
+            m DATE := date_trunc('month', COALESCE((SELECT MIN({key}) FROM {table}_old), NOW()))::date;
+            last DATE := (date_trunc('month', NOW()) + INTERVAL '{PREMAKE_MONTHS} months')::date;
+        BEGIN
+            WHILE m <= last LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                    '{table}_p' || to_char(m, 'YYYYMM'), m, (m + INTERVAL '1 month')::date
+                );
+                m := (m + INTERVAL '1 month')::date;
+            END LOOP;
+        END $$
+    """)
+    op.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+
+def upgrade():
+    # Primary key must include the partition key: (id, key). id stays unique via its sequence.
+    for table, key in PARTITIONED_TABLES.items():
+        _rebuild(
+            table,
+            "CREATE TABLE {table} (LIKE {source} INCLUDING DEFAULTS) PARTITION BY RANGE (" + key + ")",
+            f"id, {key}",
+            after_create=lambda table=table, key=key: _create_partitions(table, key)
+        )
+
+
+def downgrade():
+    for table in PARTITIONED_TABLES:
+        _rebuild(
+            table,
+            "CREATE TABLE {table} (LIKE {source} INCLUDING DEFAULTS)",
+            "id"
+        )
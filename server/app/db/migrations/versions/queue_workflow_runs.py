@@ -0,0 +1,55 @@
+"""queue columns for workflow runs executed by the worker pool
+
+Revision ID: queue_workflow_runs
+Revises: add_workflow_node_cache
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'queue_workflow_runs'
+down_revision = 'add_workflow_node_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # New enum values can't be used in the transaction that adds them
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE workflowrunstatus ADD VALUE IF NOT EXISTS 'queued' BEFORE 'running'")
+
+    # Added on the partitioned parent: propagates to every partition
+    op.execute("ALTER TABLE workflow_runs ADD COLUMN IF NOT EXISTS options JSONB NOT NULL DEFAULT '{}'")
+    op.execute("ALTER TABLE workflow_runs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE workflow_runs ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(100)")
+    op.execute("ALTER TABLE workflow_runs ADD COLUMN IF NOT EXISTS queued_at TIMESTAMP")
+    op.execute("ALTER TABLE workflow_runs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP")
+
+    # Runs left RUNNING by the old in-request executor will never finish
+    op.execute("""
+        UPDATE workflow_runs
+        SET status = 'failed',
+            error_message = COALESCE(error_message, 'Interrupted (server restart)'),
+            completed_at = COALESCE(completed_at, NOW())
+        WHERE status = 'running'
+    """)
+
+    # Claim query: queued runs + running runs with a stale heartbeat
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS ix_workflow_runs_queue
+            ON workflow_runs (queued_at)
+            WHERE status IN ('queued', 'running')
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_workflow_runs_queue")
+    op.execute("UPDATE workflow_runs SET status = 'failed' WHERE status = 'queued'")
+    op.execute("ALTER TABLE workflow_runs DROP COLUMN IF EXISTS heartbeat_at")
+    op.execute("ALTER TABLE workflow_runs DROP COLUMN IF EXISTS queued_at")
+    op.execute("ALTER TABLE workflow_runs DROP COLUMN IF EXISTS claimed_by")
+    op.execute("ALTER TABLE workflow_runs DROP COLUMN IF EXISTS attempts")
+    op.execute("ALTER TABLE workflow_runs DROP COLUMN IF EXISTS options")
+    # Enum values can't be dropped; 'queued' stays in workflowrunstatus
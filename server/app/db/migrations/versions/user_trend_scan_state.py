@@ -0,0 +1,82 @@
+"""move per-user scan state (initial_stats, last_scanned_at) from videos to user_trends
+
+videos keeps only rescanned_at: when the scheduler last refreshed the shared
+stats (dedups rescans across users).
+
+Revision ID: user_trend_scan_state
+Revises: queue_workflow_runs
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'user_trend_scan_state'
+down_revision = 'queue_workflow_runs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE user_trends ADD COLUMN IF NOT EXISTS initial_stats JSONB NOT NULL DEFAULT '{}'")
+    op.execute("ALTER TABLE user_trends ADD COLUMN IF NOT EXISTS last_scanned_at TIMESTAMP")
+
+    # Per-user values survive in the pre-split backup (user_trends kept the trend ids);
+    # rows created since the split fall back to the shared video's values
+    op.execute("""
+        DO $$ BEGIN
+            IF to_regclass('trends_legacy') IS NOT NULL THEN
+                UPDATE user_trends ut
+                SET initial_stats = COALESCE(t.initial_stats, '{}'),
+                    last_scanned_at = t.last_scanned_at
+                FROM trends_legacy t
+                WHERE t.id = ut.id AND t.user_id = ut.user_id;
+            END IF;
+        END $$;
+    """)
+    op.execute("""
+        DO $$ BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'videos' AND column_name = 'initial_stats'
+            ) THEN
+                UPDATE user_trends ut
+                SET initial_stats = v.initial_stats
+                FROM videos v
+                WHERE v.id = ut.video_id AND ut.initial_stats = '{}';
+            END IF;
+        END $$;
+    """)
+
+    op.execute("ALTER TABLE videos DROP COLUMN IF EXISTS initial_stats")
+    op.execute("""
+        DO $$ BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'videos' AND column_name = 'last_scanned_at'
+            ) THEN
+                ALTER TABLE videos RENAME COLUMN last_scanned_at TO rescanned_at;
+            END IF;
+        END $$;
+    """)
+    op.execute("ALTER TABLE videos ADD COLUMN IF NOT EXISTS rescanned_at TIMESTAMP")
+
+
+def downgrade():
+    op.execute("ALTER TABLE videos ADD COLUMN IF NOT EXISTS initial_stats JSONB NOT NULL DEFAULT '{}'")
+    op.execute("ALTER TABLE videos RENAME COLUMN rescanned_at TO last_scanned_at")
+    # Shared again: earliest Point A / latest scan across users
+    op.execute("""
+        UPDATE videos v
+        SET initial_stats = s.initial_stats, last_scanned_at = s.last_scanned_at
+        FROM (
+            SELECT DISTINCT ON (video_id) video_id, initial_stats,
+                MAX(last_scanned_at) OVER (PARTITION BY video_id) AS last_scanned_at
+            FROM user_trends
+            ORDER BY video_id, created_at
+        ) s
+        WHERE s.video_id = v.id
+    """)
+    op.execute("ALTER TABLE user_trends DROP COLUMN IF EXISTS last_scanned_at")
+    op.execute("ALTER TABLE user_trends DROP COLUMN IF EXISTS initial_stats")
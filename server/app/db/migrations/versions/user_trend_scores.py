@@ -0,0 +1,78 @@
+"""move per-user scoring (uts_score, cluster_id) from videos to user_trends
+
+uts_score is computed against the user's own Point A (user_trends.initial_stats)
+and cluster_id labels one user's deep-search batch, so neither is shared.
+
+Revision ID: user_trend_scores
+Revises: add_stored_image_paths
+Create Date: 2026-10-20 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'user_trend_scores'
+down_revision = 'add_stored_image_paths'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE user_trends ADD COLUMN IF NOT EXISTS uts_score FLOAT DEFAULT 0.0")
+    op.execute("ALTER TABLE user_trends ADD COLUMN IF NOT EXISTS cluster_id INTEGER")
+
+    # Per-user values survive in the pre-split backup (user_trends kept the trend ids);
+    # rows created since the split fall back to the shared video's values
+    op.execute("""
+        DO $$ BEGIN
+            IF to_regclass('trends_legacy') IS NOT NULL THEN
+                UPDATE user_trends ut
+                SET uts_score = t.uts_score, cluster_id = t.cluster_id
+                FROM trends_legacy t
+                WHERE t.id = ut.id AND t.user_id = ut.user_id;
+            END IF;
+        END $$;
+    """)
+    op.execute("""
+        DO $$ BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'videos' AND column_name = 'uts_score'
+            ) THEN
+                UPDATE user_trends ut
+                SET uts_score = v.uts_score, cluster_id = COALESCE(ut.cluster_id, v.cluster_id)
+                FROM videos v
+                WHERE v.id = ut.video_id AND COALESCE(ut.uts_score, 0) = 0;
+            END IF;
+        END $$;
+    """)
+
+    # Results are listed per user by score
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_trends_user_score ON user_trends (user_id, uts_score)")
+
+    op.execute("DROP INDEX IF EXISTS ix_videos_uts_score")
+    op.execute("DROP INDEX IF EXISTS ix_videos_cluster_id")
+    op.execute("ALTER TABLE videos DROP COLUMN IF EXISTS uts_score")
+    op.execute("ALTER TABLE videos DROP COLUMN IF EXISTS cluster_id")
+
+
+def downgrade():
+    op.execute("ALTER TABLE videos ADD COLUMN IF NOT EXISTS uts_score FLOAT DEFAULT 0.0")
+    op.execute("ALTER TABLE videos ADD COLUMN IF NOT EXISTS cluster_id INTEGER")
+    # Shared again: the most recent user's score / grouping wins
+    op.execute("""
+        UPDATE videos v
+        SET uts_score = s.uts_score, cluster_id = s.cluster_id
+        FROM (
+            SELECT DISTINCT ON (video_id) video_id, uts_score, cluster_id
+            FROM user_trends
+            ORDER BY video_id, created_at DESC
+        ) s
+        WHERE s.video_id = v.id
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_videos_uts_score ON videos (uts_score)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_videos_cluster_id ON videos (cluster_id)")
+    op.execute("DROP INDEX IF EXISTS ix_user_trends_user_score")
+    op.execute("ALTER TABLE user_trends DROP COLUMN IF EXISTS cluster_id")
+    op.execute("ALTER TABLE user_trends DROP COLUMN IF EXISTS uts_score")
@@ -0,0 +1,37 @@
+"""widen legacy trends URL columns to TEXT (moved from the startup hook)
+
+TikTok CDN URLs can be 700+ characters. main.py used to run these ALTERs on
+every boot; the live catalog (videos) already uses TEXT, so only the legacy
+table -- kept for rollback of add_videos_catalog -- needs them.
+
+Revision ID: widen_trend_url_columns
+Revises: add_credit_ledger
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'widen_trend_url_columns'
+down_revision = 'add_credit_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('trends_legacy') IS NOT NULL THEN
+                ALTER TABLE trends_legacy ALTER COLUMN play_addr TYPE TEXT;
+                ALTER TABLE trends_legacy ALTER COLUMN cover_url TYPE TEXT;
+                ALTER TABLE trends_legacy ALTER COLUMN url TYPE TEXT;
+            END IF;
+        END $$;
+    """)
+
+
+def downgrade():
+    # Narrowing back to VARCHAR(500) could truncate URLs -- keep TEXT
+    pass
@@ -12,11 +12,11 @@ Architecture:
 """
 from datetime import datetime
 from sqlalchemy import (
-    Column, Integer, String, Float, Text, DateTime, Boolean,
-    ForeignKey, UniqueConstraint, Index, Enum as SQLEnum
+    Column, Integer, BigInteger, String, Float, Text, DateTime, Boolean,
+    ForeignKey, UniqueConstraint, Index, Enum as SQLEnum, FetchedValue, join
 )
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship, column_property
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 # from pgvector.sqlalchemy import Vector  # Disabled for local dev
 import enum
 
@@ -52,6 +52,7 @@ class WorkflowStatus(str, enum.Enum):
 
 class WorkflowRunStatus(str, enum.Enum):
     """Workflow run execution status."""
+    QUEUED = "queued"
     RUNNING = "running"
     COMPLETED = "completed"
     FAILED = "failed"
@@ -143,7 +144,7 @@ class User(Base):
         lazy="dynamic"
     )
     trends = relationship(
-        "Trend",
+        "UserTrend",
         back_populates="user",
         cascade="all, delete-orphan",
         lazy="dynamic"
@@ -241,41 +242,39 @@ class UserSettings(Base):
 # TREND MODELS
 # =============================================================================
 
-class Trend(Base):
+class Video(Base):
     """
-    Discovered TikTok trends with full analytics.
+    Global video catalog: one row per platform video, shared by all users.
 
-    User Isolation: Each trend belongs to a specific user via user_id FK.
-    This ensures users only see their own search results.
+    Stats, scores, thumbnails and clustering live here, so rescans and
+    uploads happen once per video instead of once per user who found it.
+    Per-user context (vertical, search query, favorite) lives in UserTrend.
 
     Indexes:
-    - user_id: For filtering user's trends
-    - platform_id: For deduplication within user scope
-    - vertical: For category filtering
-    - uts_score: For sorting by viral potential
-    - created_at: For time-based queries
+    - platform_id: Unique, for deduplication across users
+    - play_count, engagement_rate: For catalog-wide "top" queries and min-views filters
+
+    The typed stat columns (play_count, ..., engagement_rate) are derived from
+    the stats JSONB by a database trigger (see migration add_typed_stat_columns),
+    so every writer -- ORM, bulk upsert, raw SQL -- keeps them in sync.
+    cover_path (the Storage object behind cover_url) is trigger-maintained the
+    same way (see migration add_stored_image_paths).
     """
-    __tablename__ = "trends"
+    __tablename__ = "videos"
 
     id = Column(Integer, primary_key=True, index=True)
 
-    # USER ISOLATION - Critical for multi-tenant security
-    user_id = Column(
-        Integer,
-        ForeignKey("users.id", ondelete="CASCADE"),
-        nullable=False,
-        index=True
-    )
-
-    # TikTok Video Identification
-    platform_id = Column(String(100), index=True)  # TikTok video ID
+    # Video Identification
+    platform = Column(String(20), nullable=False, default="tiktok")  # 'tiktok' or 'instagram'
+    platform_id = Column(String(100), unique=True, index=True, nullable=False)  # TikTok video ID
     url = Column(Text, index=True)  # Video URL
     play_addr = Column(Text, nullable=True)  # Direct CDN video playback URL (can be 700+ chars)
 
     # Content
     description = Column(Text)
     cover_url = Column(Text)  # Supabase or TikTok CDN URL
-    vertical = Column(String(100), index=True)  # Search keyword/category
+    cover_srcset = Column(JSONB, nullable=True)  # Responsive variants {format: {width: url}}
+    cover_path = Column(Text, nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())  # Storage path of cover_url (trigger)
 
     # Music/Sound Data (for sound cascade analysis)
     music_id = Column(String(100), index=True, nullable=True)
@@ -287,12 +286,16 @@ class Trend(Base):
 
     # Statistics (current snapshot)
     stats = Column(JSONB, default={}, nullable=False)
-    # Initial stats (Point A for velocity calculation)
-    initial_stats = Column(JSONB, default={}, nullable=False)
 
-    # Scoring & Analytics
-    uts_score = Column(Float, default=0.0, index=True)  # Main viral score
-    cluster_id = Column(Integer, nullable=True, index=True)  # Visual clustering
+    # Typed copies of stats (set by trigger, read-only from Python)
+    play_count = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    digg_count = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    comment_count = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    share_count = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    collect_count = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    engagement_rate = Column(Float, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())  # (likes+comments+shares) / views * 100
+
+    # Scoring & Analytics (uts_score / cluster_id are per user, see UserTrend)
     similarity_score = Column(Float, default=0.0)
     reach_score = Column(Float, default=0.0)
     uplift_score = Column(Float, default=0.0)
@@ -301,31 +304,135 @@ class Trend(Base):
     ai_summary = Column(Text, nullable=True)
     # embedding = Column(Vector(512), nullable=True)  # CLIP embedding - disabled for local dev
 
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    rescanned_at = Column(DateTime, nullable=True)  # Shared stats last refreshed by the scheduler
+
+    # Relationship
+    user_trends = relationship("UserTrend", back_populates="video", passive_deletes=True)
+
+    __table_args__ = (
+        Index('ix_videos_play_count', 'play_count'),
+        Index('ix_videos_engagement_rate', 'engagement_rate'),
+        Index('ix_videos_cover_path', 'cover_path', postgresql_where=cover_path.isnot(None)),
+    )
+
+    def __repr__(self):
+        return f"<Video(id={self.id}, platform_id='{self.platform_id}')>"
+
+
+class UserTrend(Base):
+    """
+    Per-user association with a catalog Video.
+
+    User Isolation: Each row belongs to a specific user via user_id FK.
+    This ensures users only see their own search results.
+
+    Indexes:
+    - user_id + video_id: Unique, same video once per user
+    - user_id + vertical: For category filtering
+    - user_id + created_at: For time-based queries
+    - user_id + uts_score: For sorting by viral potential
+    - user_id + video_play_count / video_engagement_rate: "Top by views/engagement"
+      and min-views filters as index scans
+
+    video_play_count and video_engagement_rate mirror the Video's typed stats
+    (kept in sync by trigger) because a composite index can't span the join.
+    """
+    __tablename__ = "user_trends"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # USER ISOLATION - Critical for multi-tenant security
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    video_id = Column(
+        Integer,
+        ForeignKey("videos.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+
     # Search Context
+    vertical = Column(String(100), index=True)  # Search keyword/category
     search_query = Column(String(255), nullable=True)  # Original search query
     search_mode = Column(SQLEnum(SearchMode, values_callable=lambda x: [e.value for e in x]), default=SearchMode.KEYWORDS)
     is_deep_scan = Column(Boolean, default=False)
+    is_favorite = Column(Boolean, default=False, nullable=False)
+
+    # Scan state is per user: Point A is when *this* user first saw the video
+    initial_stats = Column(JSONB, default={}, nullable=False)
+    last_scanned_at = Column(DateTime, nullable=True)
+
+    # Scoring is per user too: UTS velocity is measured from this user's Point A,
+    # clusters group this user's deep-search batch
+    uts_score = Column(Float, default=0.0)  # Main viral score
+    cluster_id = Column(Integer, nullable=True)  # Visual clustering
+
+    # Sort keys mirrored from the Video (set by trigger, read-only from Python)
+    video_play_count = Column(BigInteger, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    video_engagement_rate = Column(Float, nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    last_scanned_at = Column(DateTime, nullable=True)
 
-    # Relationship
+    # Relationships
     user = relationship("User", back_populates="trends")
-    favorites = relationship("UserFavorite", back_populates="trend", cascade="all, delete-orphan")
+    video = relationship("Video", back_populates="user_trends")
 
-    # Indexes for common queries
     __table_args__ = (
-        # User + platform_id unique constraint (same video once per user)
-        UniqueConstraint('user_id', 'platform_id', name='uix_trend_user_platform'),
-        # Composite index for user's trends sorted by score
-        Index('ix_trends_user_score', 'user_id', 'uts_score'),
+        # Same video once per user
+        UniqueConstraint('user_id', 'video_id', name='uix_user_trend_video'),
         # Composite index for user's trends by vertical
-        Index('ix_trends_user_vertical', 'user_id', 'vertical'),
+        Index('ix_user_trends_user_vertical', 'user_id', 'vertical'),
         # Composite index for user's recent trends
-        Index('ix_trends_user_created', 'user_id', 'created_at'),
+        Index('ix_user_trends_user_created', 'user_id', 'created_at'),
+        # Composite index for user's trends by score
+        Index('ix_user_trends_user_score', 'user_id', 'uts_score'),
+        # Composite indexes for user's top trends by views / engagement
+        Index('ix_user_trends_user_play_count', 'user_id', 'video_play_count'),
+        Index('ix_user_trends_user_engagement', 'user_id', 'video_engagement_rate'),
     )
 
+    def __repr__(self):
+        return f"<UserTrend(id={self.id}, user_id={self.user_id}, video_id={self.video_id})>"
+
+
+class Trend(Base):
+    """
+    A user's view of a discovered video: UserTrend joined with its catalog Video.
+
+    Mapped against the join so existing queries (Trend.user_id, Trend.stats,
+    Trend.description, ...) keep working. Trend.id is the UserTrend id, which
+    favorites and scripts reference.
+
+    Writes:
+    - Shared fields (stats, cover_url, ...) update the Video row for every user
+    - Per-user scan state (initial_stats, last_scanned_at, is_deep_scan) and
+      scoring (uts_score, cluster_id) stay on UserTrend
+    - New rows go through services.trend_upsert.bulk_upsert_trends
+    - Deletes must target UserTrend (deleting a Trend would delete the shared Video)
+    """
+    __table__ = join(
+        UserTrend.__table__,
+        Video.__table__,
+        UserTrend.__table__.c.video_id == Video.__table__.c.id
+    )
+
+    id = UserTrend.__table__.c.id
+    video_id = column_property(UserTrend.__table__.c.video_id, Video.__table__.c.id)
+    created_at = UserTrend.__table__.c.created_at
+    video_created_at = column_property(Video.__table__.c.created_at)
+
+    # Relationships
+    user = relationship("User", viewonly=True)
+    favorites = relationship("UserFavorite", back_populates="trend", cascade="all, delete-orphan")
+
     def __repr__(self):
         return f"<Trend(id={self.id}, user_id={self.user_id}, platform_id='{self.platform_id}')>"
 
@@ -346,7 +453,7 @@ class UserFavorite(Base):
     )
     trend_id = Column(
         Integer,
-        ForeignKey("trends.id", ondelete="CASCADE"),
+        ForeignKey("user_trends.id", ondelete="CASCADE"),
         nullable=False,
         index=True
     )
@@ -374,6 +481,9 @@ class UserFavorite(Base):
 class UserSearch(Base):
     """
     User's search history for analytics and personalization.
+
+    Partitioned by month on created_at (services.partitions drops expired months);
+    the database primary key is (id, created_at), id alone stays unique.
     """
     __tablename__ = "user_searches"
 
@@ -437,7 +547,7 @@ class UserScript(Base):
     # Reference to source trend (optional)
     source_trend_id = Column(
         Integer,
-        ForeignKey("trends.id", ondelete="SET NULL"),
+        ForeignKey("user_trends.id", ondelete="SET NULL"),
         nullable=True
     )
 
@@ -477,6 +587,9 @@ class ChatMessage(Base):
     """
     AI chat conversation history.
     Enables context-aware conversations with the AI assistant.
+
+    Partitioned by month on created_at (services.partitions drops expired months);
+    the database primary key is (id, created_at), id alone stays unique.
     """
     __tablename__ = "chat_messages"
 
@@ -607,6 +720,8 @@ class Competitor(Base):
     recent_videos = Column(JSONB, default=[], nullable=False)
     top_hashtags = Column(JSONB, default=[], nullable=False)
     content_categories = Column(JSONB, default={}, nullable=False)
+    # Storage paths of avatar_url + recent_videos images (trigger, see migration add_stored_image_paths)
+    image_paths = Column(ARRAY(Text), nullable=False, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     # Tracking Status
     is_active = Column(Boolean, default=True, nullable=False)
@@ -629,6 +744,8 @@ class Competitor(Base):
         UniqueConstraint('user_id', 'username', name='uix_competitor_user_username'),
         # Index for user's active competitors
         Index('ix_competitors_user_active', 'user_id', 'is_active'),
+        # Reference check before deleting shared stored images
+        Index('ix_competitors_image_paths', 'image_paths', postgresql_using='gin'),
     )
 
     def __repr__(self):
@@ -877,6 +994,13 @@ class WorkflowRun(Base):
     """
     Workflow execution history.
     Stores each run of a workflow with inputs, outputs, and metadata.
+
+    Partitioned by month on started_at (services.partitions drops expired months);
+    the database primary key is (id, started_at), id alone stays unique.
+
+    Runs are executed by the worker pool in services.workflow_queue: queued
+    runs are claimed with SKIP LOCKED, heartbeat while running, and resume
+    from the per-node checkpoint in results after a crash or failure.
     """
     __tablename__ = "workflow_runs"
 
@@ -922,8 +1046,15 @@ class WorkflowRun(Base):
     # Pin
     is_pinned = Column(Boolean, default=False, nullable=False)
 
+    # Queue
+    options = Column(JSONB, default={}, nullable=False)  # brand_context, language, use_cache
+    attempts = Column(Integer, default=0, nullable=False)
+    claimed_by = Column(String(100), nullable=True)  # host:pid of the executing worker
+    queued_at = Column(DateTime, nullable=True)  # Last (re)queued; queue wait is measured from here
+    heartbeat_at = Column(DateTime, nullable=True)
+
     # Timestamps
-    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Created / enqueued
     completed_at = Column(DateTime, nullable=True)
 
     # Relationships
@@ -937,3 +1068,91 @@ class WorkflowRun(Base):
 
     def __repr__(self):
         return f"<WorkflowRun(id={self.id}, workflow='{self.workflow_name}', status={self.status})>"
+
+
+class WorkflowNodeCache(Base):
+    """
+    Memoized workflow node outputs (see services/node_cache.py).
+
+    Content-addressed: cache_key is a SHA-256 of everything that determines a
+    node's output (type, config, model, language, upstream output hashes,
+    video identity), so a rerun with unchanged upstream nodes hits the cache.
+    Evicted least-recently-used first (last_used_at).
+    """
+    __tablename__ = "workflow_node_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=False)  # Owner of the run that produced it (no FK: cache)
+    node_type = Column(String(50), nullable=False)
+    output = Column(Text, nullable=False)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('ix_workflow_node_cache_last_used', 'last_used_at'),
+    )
+
+    def __repr__(self):
+        return f"<WorkflowNodeCache(key='{self.cache_key[:12]}', type='{self.node_type}')>"
+
+
+class StoredImage(Base):
+    """
+    Index of images already uploaded to Supabase Storage.
+
+    Objects are content-addressed (path derived from the SHA-256 of the bytes),
+    so one image is stored once no matter how many signed CDN URLs point at it.
+
+    Indexes:
+    - url_key: Unique, hash of folder + normalized source URL (skips the download)
+    - content_hash: Finds an existing object for new URLs with identical bytes
+    """
+    __tablename__ = "stored_images"
+
+    id = Column(Integer, primary_key=True, index=True)
+    url_key = Column(String(64), unique=True, nullable=False, index=True)
+    content_hash = Column(String(64), nullable=False, index=True)
+    path = Column(String(255), nullable=False)  # Object path inside the bucket
+    public_url = Column(Text, nullable=False)
+    content_type = Column(String(50), nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    variants = Column(JSONB, default={}, nullable=False)  # srcset map {format: {width: url}}
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<StoredImage(id={self.id}, path='{self.path}')>"
+
+
+class CreditLedgerEntry(Base):
+    """
+    Append-only record of every credit balance change.
+
+    users.credits stays the authoritative balance and is updated atomically
+    (UPDATE ... WHERE credits >= cost RETURNING credits) in the same statement
+    that appends the entry -- see services/credit_ledger.py.
+
+    Old entries are periodically compacted into one 'compacted' row per user.
+    """
+    __tablename__ = "credit_ledger"
+
+    id = Column(BigInteger, primary_key=True)
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    delta = Column(Integer, nullable=False)  # Negative = spent, positive = granted
+    balance_after = Column(Integer, nullable=False)
+    reason = Column(String(50), nullable=False)  # e.g. "chat:claude", "workflow", "monthly_reset"
+    reference = Column(String(100), nullable=True)  # e.g. workflow run ID
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('ix_credit_ledger_user_created', 'user_id', 'created_at'),
+        Index('ix_credit_ledger_created', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<CreditLedgerEntry(user_id={self.user_id}, delta={self.delta}, reason='{self.reason}')>"
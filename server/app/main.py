@@ -37,7 +37,7 @@ from fastapi.responses import JSONResponse
 import time
 from pathlib import Path
 
-from .core.database import Base, engine
+from .core.database import Base
 from .core.config import settings
 
 # Явный импорт моделей, чтобы SQLAlchemy их увидела!
@@ -51,6 +51,12 @@ from .api import workflows as workflows_router
 
 # Background Scheduler
 from .services.scheduler import start_scheduler
+from .services.image_index import stored_image_index
+from .core.user_cache import user_cache
+from .core.db_router import replica_router
+from .core.sql_instrumentation import route_label, sql_metrics
+from .services.workflow_queue import workflow_queue
+from .services.llm_gateway import llm_gateway
 
 
 # =============================================================================
@@ -103,7 +109,7 @@ async def api_key_middleware(request: Request, call_next):
         return await call_next(request)
 
     # Skip protection if no key is set (development) or for public endpoints
-    public_paths = ["/", "/health", "/docs", "/redoc", "/openapi.json", "/api/auth/login", "/api/auth/register", "/api/auth/oauth/sync", "/api/proxy/image"]
+    public_paths = ["/", "/health", "/docs", "/redoc", "/openapi.json", "/api/auth/login", "/api/auth/register", "/api/auth/oauth/sync", "/api/proxy/image", "/api/proxy/video"]
 
     # Allow access to uploaded files (generated images)
     if request.url.path.startswith("/uploads/"):
@@ -162,21 +168,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["X-Request-ID", "X-RateLimit-Remaining", "X-RateLimit-Reset"],
+    expose_headers=["X-Request-ID", "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset", "X-DB-Query-Count", "X-DB-Time", "X-DB-Max-Repeats"],
 )
 
 
+# Query count / DB time headers (X-DB-*), only when ENVIRONMENT=development
+SQL_DEBUG_HEADERS = os.getenv("ENVIRONMENT") == "development"
+
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Log all incoming requests with timing."""
+    """Log all incoming requests with timing and per-request SQL stats."""
     start_time = time.time()
 
     # Skip logging for health check and docs
     if request.url.path not in ["/", "/health", "/docs", "/redoc", "/openapi.json"]:
         logger.info(f"--> {request.method} {request.url.path}")
 
-    response = await call_next(request)
+    sql_stats, sql_token = sql_metrics.start_request()
+    try:
+        response = await call_next(request)
+    finally:
+        sql_metrics.finish_request(f"{request.method} {route_label(request.scope)}", sql_stats, sql_token)
 
     process_time = (time.time() - start_time) * 1000
 
@@ -189,6 +203,8 @@ async def log_requests(request: Request, call_next):
 
     # Add custom headers
     response.headers["X-Process-Time"] = f"{process_time:.2f}ms"
+    if SQL_DEBUG_HEADERS:
+        response.headers.update(sql_stats.headers())
 
     return response
 
@@ -315,17 +331,7 @@ async def startup_event():
     """Initialize services on startup."""
     logger.info("Starting Rizko.ai Backend...")
 
-    # Fix VARCHAR(500) -> TEXT for columns that store TikTok CDN URLs (can be 700+ chars)
-    try:
-        from sqlalchemy import text
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE trends ALTER COLUMN play_addr TYPE TEXT"))
-            conn.execute(text("ALTER TABLE trends ALTER COLUMN cover_url TYPE TEXT"))
-            conn.execute(text("ALTER TABLE trends ALTER COLUMN url TYPE TEXT"))
-            conn.commit()
-            logger.info("Fixed play_addr, cover_url, url column types to TEXT")
-    except Exception as e:
-        logger.info(f"Column type fix skipped: {e}")
+    # Schema changes live in Alembic (alembic upgrade head), not in the boot path
 
     # Start background scheduler for auto-rescan
     try:
@@ -336,6 +342,9 @@ async def startup_event():
         logger.warning(f"Scheduler initialization failed: {e}")
         logger.warning("Continuing without scheduler - auto-rescan will be disabled")
 
+    # Workers executing queued workflow runs
+    workflow_queue.start()
+
     logger.info("Rizko.ai Backend started successfully!")
 
 
@@ -344,6 +353,24 @@ async def shutdown_event():
     """Cleanup on shutdown."""
     logger.info("Shutting down Rizko.ai Backend...")
 
+    # Stop workflow workers; their unfinished runs go back to the queue
+    await workflow_queue.stop()
+
+    # Stop background thumbnail uploads
+    from .services.thumbnail_pipeline import thumbnail_pipeline
+    thumbnail_pipeline.shutdown()
+
+    # Stop image transcoding worker processes
+    from .services.image_transcoder import image_transcoder
+    image_transcoder.shutdown()
+
+    # Stop password hashing threads
+    from .core.security import password_hasher
+    password_hasher.shutdown()
+
+    # Close pooled image proxy connections
+    await proxy.close_clients()
+
 
 # =============================================================================
 # HEALTH & INFO ENDPOINTS
@@ -370,6 +397,9 @@ def health_check():
         - Version info
         - Feature flags
         - Database status
+        - Image store / proxy cache hit rates
+        - Workflow queue depth and wait / run times
+        - LLM calls per model (latency, tokens, retries, rate limit waits)
     """
     return {
         "status": "healthy",
@@ -384,6 +414,13 @@ def health_check():
             "rate_limiting": True
         },
         "database": "PostgreSQL",
+        "image_store": stored_image_index.stats(),
+        "image_proxy": proxy.proxy_stats(),
+        "user_cache": user_cache.stats(),
+        "read_replica": replica_router.stats(),
+        "sql": sql_metrics.stats(),
+        "workflow_queue": workflow_queue.stats(),
+        "llm": llm_gateway.stats(),
         "environment": os.getenv("ENVIRONMENT", "development")
     }
 
@@ -0,0 +1,90 @@
+"""
+Import-time budget check for the API process.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter, prints
+the slowest modules, and fails if the total exceeds the budget or if a heavy
+SDK that should be imported lazily (at first use) got pulled in at startup.
+
+Usage:
+    python -m app.scripts.import_budget [--budget-ms 2000] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).parent.parent.parent
+
+# Cumulative import time of app.main, milliseconds
+DEFAULT_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "2000"))
+
+# Must not be imported by `import app.main` -- load them inside the code that uses them
+LAZY_MODULES = (
+    "sklearn",
+    "scipy",
+    "numpy",
+    "supabase",
+    "apify_client",
+    "google.genai",
+    "anthropic",
+    "openai",
+    "pillow_heif",
+    "yt_dlp",
+)
+
+
+def measure():
+    """[(cumulative_us, self_us, module)] for `import app.main`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=SERVER_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        sys.exit(f"[ERROR] import app.main failed (exit {result.returncode})")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header row
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=int, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = measure()
+    total_ms = next((cum for cum, _, name in rows if name == "app.main"), 0) / 1000
+
+    print(f"Slowest imports (cumulative ms) for app.main:")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}  {self_us / 1000:7.1f}  {name}")
+
+    imported = {name for _, _, name in rows}
+    eager = [m for m in LAZY_MODULES if m in imported]
+
+    print(f"\nTotal: {total_ms:.0f} ms (budget {args.budget_ms} ms)")
+    failed = False
+    if eager:
+        print(f"[ERROR] Imported at startup, should be lazy: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"[ERROR] Import time over budget by {total_ms - args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("[OK] Import time within budget")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
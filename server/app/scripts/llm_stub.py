@@ -0,0 +1,192 @@
+"""
+Local stub of the Gemini, Anthropic and OpenAI HTTP APIs, for exercising the
+LLM gateway (pooling, rate shaping, retries, streaming) without real keys.
+
+Serves generateContent / streamGenerateContent (Gemini), /v1/messages
+(Anthropic) and /v1/chat/completions (OpenAI), streaming included, with a
+canned reply. It can add latency, fail a share of requests with 429/503, and
+enforce its own requests-per-minute limit like a real provider would.
+
+Usage:
+    python -m app.scripts.llm_stub [--port 8765] [--latency-ms 200] [--error-rate 0.1] [--rpm 60]
+
+    GEMINI_API_KEY=stub GEMINI_BASE_URL=http://127.0.0.1:8765
+    ANTHROPIC_API_KEY=stub ANTHROPIC_BASE_URL=http://127.0.0.1:8765
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_GEMINI_PATH = re.compile(r"/v1\w*/models/([^/:]+):(generateContent|streamGenerateContent)")
+
+
+class StubState:
+    def __init__(self, latency_ms: int, error_rate: float, rpm: int):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.lock = threading.Lock()
+        # Token bucket like the real providers: rpm requests, refilled continuously
+        self.tokens = float(rpm)
+        self.refilled_at = time.monotonic()
+        self.requests = 0
+
+    def admit(self):
+        """None if the request may proceed, else (status, retry_after)."""
+        with self.lock:
+            self.requests += 1
+            if self.rpm:
+                now = time.monotonic()
+                self.tokens = min(self.rpm, self.tokens + (now - self.refilled_at) * self.rpm / 60)
+                self.refilled_at = now
+                if self.tokens < 1:
+                    return 429, max(1, round((1 - self.tokens) * 60 / self.rpm))
+                self.tokens -= 1
+        if random.random() < self.error_rate:
+            return random.choice((429, 503)), 1
+        return None
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_json(self, status: int, body: dict, headers: dict = None) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _start_sse(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+        def _sse(self, data: dict, event: str = None) -> None:
+            chunk = (f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n"
+            self.wfile.write(chunk.encode())
+            self.wfile.flush()
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            payload = json.loads(body or b"{}")
+            prompt_tokens = len(body) // 4 + 1
+
+            rejected = state.admit()
+            if rejected:
+                status, retry_after = rejected
+                error = {"error": {"code": status, "message": "stub: rate limited" if status == 429 else "stub: unavailable", "status": "UNAVAILABLE"}}
+                self._send_json(status, error, {"Retry-After": str(retry_after)})
+                return
+
+            time.sleep(state.latency_ms / 1000)
+            path = self.path.split("?")[0]
+            gemini = _GEMINI_PATH.match(path)
+            model = gemini.group(1) if gemini else payload.get("model", "stub")
+            words = f"Stub reply from {model} ({prompt_tokens} prompt tokens)".split(" ")
+            words = [w if i == 0 else " " + w for i, w in enumerate(words)]
+            text = "".join(words)
+            out_tokens = len(words)
+
+            if gemini:
+                usage = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": out_tokens, "totalTokenCount": prompt_tokens + out_tokens}
+                if gemini.group(2) == "streamGenerateContent":
+                    self._start_sse()
+                    for i, word in enumerate(words):
+                        chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": word}]}, "index": 0}]}
+                        if i == len(words) - 1:
+                            chunk["candidates"][0]["finishReason"] = "STOP"
+                            chunk["usageMetadata"] = usage
+                        self._sse(chunk)
+                    return
+                self._send_json(200, {
+                    "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+                    "usageMetadata": usage,
+                })
+
+            elif path.endswith("/messages"):
+                message = {
+                    "id": "msg_stub", "type": "message", "role": "assistant", "model": model,
+                    "content": [{"type": "text", "text": text}], "stop_reason": "end_turn", "stop_sequence": None,
+                    "usage": {"input_tokens": prompt_tokens, "output_tokens": out_tokens},
+                }
+                if payload.get("stream"):
+                    self._start_sse()
+                    start = dict(message, content=[], stop_reason=None, usage={"input_tokens": prompt_tokens, "output_tokens": 1})
+                    self._sse({"type": "message_start", "message": start}, "message_start")
+                    self._sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}, "content_block_start")
+                    for word in words:
+                        self._sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": word}}, "content_block_delta")
+                    self._sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+                    self._sse({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": out_tokens}}, "message_delta")
+                    self._sse({"type": "message_stop"}, "message_stop")
+                    return
+                self._send_json(200, message)
+
+            elif path.endswith("/chat/completions"):
+                base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": model}
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": out_tokens, "total_tokens": prompt_tokens + out_tokens}
+                if payload.get("stream"):
+                    self._start_sse()
+                    for word in words:
+                        self._sse(dict(base, object="chat.completion.chunk", choices=[{"index": 0, "delta": {"content": word}, "finish_reason": None}]))
+                    self._sse(dict(base, object="chat.completion.chunk", choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+                    if (payload.get("stream_options") or {}).get("include_usage"):
+                        self._sse(dict(base, object="chat.completion.chunk", choices=[], usage=usage))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    return
+                self._send_json(200, dict(
+                    base, object="chat.completion",
+                    choices=[{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    usage=usage,
+                ))
+
+            else:
+                self._send_json(404, {"error": {"message": f"stub: unknown path {path}"}})
+
+    return Handler
+
+
+def create_server(port: int = 8765, latency_ms: int = 200, error_rate: float = 0.0, rpm: int = 0) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer(("127.0.0.1", port), make_handler(StubState(latency_ms, error_rate, rpm)))
+
+
+def serve(**options) -> ThreadingHTTPServer:
+    """Start the stub in a background thread (tests). Stop it with shutdown()."""
+    server = create_server(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the Gemini / Anthropic / OpenAI APIs")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 429/503")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before answering 429 (0 = unlimited)")
+    args = parser.parse_args()
+
+    server = create_server(args.port, args.latency_ms, args.error_rate, args.rpm)
+    print(f"[OK] LLM stub listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -11,17 +11,26 @@ import logging
 import time
 from typing import Optional
 import httpx
-from apify_client import ApifyClient
 
 logger = logging.getLogger(__name__)
 
-# Initialize Apify client
-APIFY_API_TOKEN = os.getenv("APIFY_API_TOKEN")
-if not APIFY_API_TOKEN:
-    logger.warning("[WARNING] APIFY_API_TOKEN not set - Apify Storage disabled")
-    _apify_client = None
-else:
-    _apify_client = ApifyClient(APIFY_API_TOKEN)
+# Apify client (lazy -- apify_client is a heavy import and fix_tiktok_url() doesn't need it)
+_apify_client = None
+_apify_client_resolved = False
+
+
+def _get_apify_client():
+    """Lazy init Apify client, None if APIFY_API_TOKEN is not set."""
+    global _apify_client, _apify_client_resolved
+    if not _apify_client_resolved:
+        token = os.getenv("APIFY_API_TOKEN")
+        if not token:
+            logger.warning("[WARNING] APIFY_API_TOKEN not set - Apify Storage disabled")
+        else:
+            from apify_client import ApifyClient
+            _apify_client = ApifyClient(token)
+        _apify_client_resolved = True
+    return _apify_client
 
 STORE_NAME = "rizko-avatars"
 _store_id_cache = None  # Cache store ID to avoid repeated API calls
@@ -76,7 +85,8 @@ class ApifyStorage:
         """
         global _store_id_cache
 
-        if not _apify_client:
+        client = _get_apify_client()
+        if not client:
             return None
 
         # Return cached store ID
@@ -85,7 +95,7 @@ class ApifyStorage:
 
         try:
             # Check if store already exists
-            stores = list(_apify_client.key_value_stores().list().items)
+            stores = list(client.key_value_stores().list().items)
             existing_store = next((s for s in stores if s.get("name") == STORE_NAME), None)
 
             if existing_store:
@@ -93,7 +103,7 @@ class ApifyStorage:
                 logger.info(f"[OK] Using existing Apify store: {_store_id_cache}")
             else:
                 # Create new store
-                store = _apify_client.key_value_stores().get_or_create(name=STORE_NAME)
+                store = client.key_value_stores().get_or_create(name=STORE_NAME)
                 _store_id_cache = store["id"]
                 logger.info(f"[OK] Created new Apify store: {_store_id_cache}")
 
@@ -120,7 +130,8 @@ class ApifyStorage:
         Returns:
             Public Apify URL if successful, None otherwise
         """
-        if not _apify_client or not image_url:
+        client = _get_apify_client()
+        if not client or not image_url:
             return None
 
         try:
@@ -166,7 +177,7 @@ class ApifyStorage:
             key = f"{platform}_{key_prefix}_{timestamp}"
 
             # Upload to Apify Key-Value Store
-            _apify_client.key_value_store(store_id).set_record(
+            client.key_value_store(store_id).set_record(
                 key=key,
                 value=image_data,
                 content_type=content_type
@@ -1,6 +1,4 @@
 # backend/app/services/clustering.py
-import numpy as np
-from sklearn.cluster import DBSCAN
 from .ml_client import get_ml_client
 
 def cluster_trends_by_visuals(trends_list: list) -> list:
@@ -35,6 +33,10 @@ def cluster_trends_by_visuals(trends_list: list) -> list:
         return trends_list
 
     try:
+        # numpy/sklearn (+scipy) грузятся только при первой кластеризации (~1.5s импорта)
+        import numpy as np
+        from sklearn.cluster import DBSCAN
+
         # 5. Превращаем список векторов в матрицу numpy
         X = np.array([t.embedding for t in valid_trends])
 
@@ -56,4 +58,4 @@ def cluster_trends_by_visuals(trends_list: list) -> list:
     except Exception as e:
         print(f"[WARNING] Clustering error: {e}")
 
-    return trends_list
\ No newline at end of file
+    return trends_list
\ No newline at end of file
@@ -2,7 +2,6 @@
 import os
 import asyncio
 from typing import List
-from apify_client import ApifyClient
 
 class TikTokCollector:
     def __init__(self):
@@ -11,6 +10,7 @@ class TikTokCollector:
             print("[WARNING] APIFY_API_TOKEN not found in .env")
             self.client = None
         else:
+            from apify_client import ApifyClient  # heavy SDK: imported on first use
             self.client = ApifyClient(token)
             
         # Используем именно этот актор
@@ -119,4 +119,4 @@ class TikTokCollector:
 
         Остальные запросы продолжают обрабатываться пока Apify работает.
         """
-        return await asyncio.to_thread(self.collect, targets, limit, mode, is_deep)
\ No newline at end of file
+        return await asyncio.to_thread(self.collect, targets, limit, mode, is_deep)
\ No newline at end of file
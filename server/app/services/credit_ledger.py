@@ -0,0 +1,248 @@
+"""
+Credit Ledger
+Atomic credit balance changes with an append-only audit trail (credit_ledger).
+
+Each change is one statement: the users row is updated conditionally in SQL
+(no read-modify-write in Python, so concurrent requests can't lose updates or
+overdraw) and the ledger entry is appended from its RETURNING row in the same
+CTE.
+
+debit() / reset_monthly() run in the caller's session and transaction (the
+caller commits, so a charge and the work it pays for land together).
+charge() / refund() use their own short transaction -- for worker threads
+without a request session (workflow nodes).
+
+Old ledger entries are compacted into one 'compacted' row per user by a
+scheduled job (compact()).
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..core.database import SessionLocal
+from ..core.user_cache import user_cache
+from ..db.models import User
+
+logger = logging.getLogger(__name__)
+
+# Ledger entries older than this are folded into one row per user
+CREDIT_LEDGER_COMPACT_AFTER_DAYS = int(os.getenv("CREDIT_LEDGER_COMPACT_AFTER_DAYS", "90"))
+
+# Exact debit: fails (no row) if the balance is too low
+_DEBIT_SQL = text("""
+    WITH debited AS (
+        UPDATE users SET credits = credits - :cost
+        WHERE id = :user_id AND credits >= :cost
+        RETURNING id, credits
+    ), entry AS (
+        INSERT INTO credit_ledger (user_id, delta, balance_after, reason, reference, created_at)
+        SELECT id, -:cost, credits, :reason, :reference, :now FROM debited
+    )
+    SELECT credits, :cost AS charged FROM debited
+""")
+
+# Partial debit: charges min(cost, balance), never goes below zero
+_DEBIT_PARTIAL_SQL = text("""
+    WITH prev AS (
+        SELECT id, credits FROM users WHERE id = :user_id FOR UPDATE
+    ), debited AS (
+        UPDATE users u SET credits = u.credits - LEAST(:cost, GREATEST(prev.credits, 0))
+        FROM prev WHERE u.id = prev.id
+        RETURNING u.id, u.credits, LEAST(:cost, GREATEST(prev.credits, 0)) AS charged
+    ), entry AS (
+        INSERT INTO credit_ledger (user_id, delta, balance_after, reason, reference, created_at)
+        SELECT id, -charged, credits, :reason, :reference, :now FROM debited WHERE charged > 0
+    )
+    SELECT credits, charged FROM debited
+""")
+
+# Refund (e.g. a workflow node that failed after being charged)
+_CREDIT_SQL = text("""
+    WITH credited AS (
+        UPDATE users SET credits = credits + :amount
+        WHERE id = :user_id
+        RETURNING id, credits
+    ), entry AS (
+        INSERT INTO credit_ledger (user_id, delta, balance_after, reason, reference, created_at)
+        SELECT id, :amount, credits, :reason, :reference, :now FROM credited
+    )
+    SELECT credits FROM credited
+""")
+
+# Monthly reset: only if still due (another worker may have reset already)
+_RESET_SQL = text("""
+    WITH prev AS (
+        SELECT id, credits FROM users
+        WHERE id = :user_id AND (credits_reset_at IS NULL OR credits_reset_at <= :now)
+        FOR UPDATE
+    ), reset AS (
+        UPDATE users u SET credits = :amount, credits_reset_at = :next_reset_at
+        FROM prev
+        WHERE u.id = prev.id AND (u.credits_reset_at IS NULL OR u.credits_reset_at <= :now)
+        RETURNING u.id, u.credits, u.credits_reset_at, :amount - prev.credits AS delta
+    ), entry AS (
+        INSERT INTO credit_ledger (user_id, delta, balance_after, reason, reference, created_at)
+        SELECT id, delta, credits, 'monthly_reset', NULL, :now FROM reset
+    )
+    SELECT credits, credits_reset_at FROM reset
+""")
+
+# Fold old entries into one row per user (sum of deltas, last balance, entry count
+# in reference). Users whose old entries are already a single compacted row are skipped.
+_COMPACT_SQL = text("""
+    WITH moved AS (
+        DELETE FROM credit_ledger
+        WHERE created_at < :cutoff
+          AND user_id IN (
+              SELECT DISTINCT user_id FROM credit_ledger
+              WHERE created_at < :cutoff AND reason <> 'compacted'
+          )
+        RETURNING id, user_id, delta, balance_after, reason, reference, created_at
+    )
+    INSERT INTO credit_ledger (user_id, delta, balance_after, reason, reference, created_at)
+    SELECT user_id, SUM(delta), (ARRAY_AGG(balance_after ORDER BY id DESC))[1], 'compacted',
+           SUM(CASE WHEN reason = 'compacted' THEN reference::int ELSE 1 END)::text, MAX(created_at)
+    FROM moved GROUP BY user_id
+""")
+
+
+class CreditLedger:
+    """Atomic balance primitives on users.credits + credit_ledger."""
+
+    @staticmethod
+    def _apply(user: User, credits: int) -> None:
+        """Mirror the new balance onto the ORM object without marking it dirty."""
+        set_committed_value(user, "credits", credits)
+        user_cache.invalidate(user.id)
+
+    def debit(
+        self,
+        db: Session,
+        user: User,
+        cost: int,
+        reason: str,
+        reference: Optional[str] = None,
+        allow_partial: bool = False
+    ) -> Optional[int]:
+        """
+        Spend credits in the caller's transaction (the caller commits).
+
+        Args:
+            cost: Credits to spend
+            reason: Ledger reason, e.g. "chat:claude", "workflow", "competitor_add"
+            reference: Optional ID of what was paid for (workflow run, ...)
+            allow_partial: Charge whatever is left (down to 0) instead of failing --
+                for work that already happened (post-paid chat replies, workflows)
+
+        Returns:
+            New balance, or None if the balance was too low (allow_partial=False)
+        """
+        if cost <= 0:
+            return user.credits
+
+        sql = _DEBIT_PARTIAL_SQL if allow_partial else _DEBIT_SQL
+        row = db.execute(sql, {
+            "user_id": user.id,
+            "cost": cost,
+            "reason": reason,
+            "reference": reference,
+            "now": datetime.utcnow(),
+        }).first()
+
+        if row is None:
+            return None
+        self._apply(user, row.credits)
+        return row.credits
+
+    def charge(self, user_id: int, cost: int, reason: str, reference: Optional[str] = None) -> Optional[int]:
+        """
+        Exact debit in its own transaction, committed immediately.
+
+        Returns:
+            New balance, or None if the balance was too low
+        """
+        if cost <= 0:
+            return 0
+        db = SessionLocal()
+        try:
+            row = db.execute(_DEBIT_SQL, {
+                "user_id": user_id,
+                "cost": cost,
+                "reason": reason,
+                "reference": reference,
+                "now": datetime.utcnow(),
+            }).first()
+            db.commit()
+        finally:
+            db.close()
+        user_cache.invalidate(user_id)
+        return row.credits if row is not None else None
+
+    def refund(self, user_id: int, amount: int, reason: str, reference: Optional[str] = None) -> None:
+        """Give credits back in its own transaction (work that was charged but didn't happen)."""
+        if amount <= 0:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(_CREDIT_SQL, {
+                "user_id": user_id,
+                "amount": amount,
+                "reason": reason,
+                "reference": reference,
+                "now": datetime.utcnow(),
+            })
+            db.commit()
+        except Exception as e:
+            logger.error(f"[ERROR] Credit refund of {amount} for user {user_id} failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+        user_cache.invalidate(user_id)
+
+    def reset_monthly(self, db: Session, user: User, amount: int, next_reset_at: datetime) -> bool:
+        """
+        Reset the balance to the plan allocation if the reset is still due,
+        in the caller's transaction (the caller commits).
+
+        Returns:
+            True if this call performed the reset
+        """
+        row = db.execute(_RESET_SQL, {
+            "user_id": user.id,
+            "amount": amount,
+            "next_reset_at": next_reset_at,
+            "now": datetime.utcnow(),
+        }).first()
+
+        if row is None:
+            return False
+        set_committed_value(user, "credits_reset_at", row.credits_reset_at)
+        self._apply(user, row.credits)
+        return True
+
+    def compact(self, older_than_days: int = CREDIT_LEDGER_COMPACT_AFTER_DAYS) -> int:
+        """Fold entries older than the cutoff into one 'compacted' row per user."""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        db = SessionLocal()
+        try:
+            result = db.execute(_COMPACT_SQL, {"cutoff": cutoff})
+            db.commit()
+            if result.rowcount:
+                logger.info(f"[OK] Compacted credit ledger for {result.rowcount} user(s)")
+            return result.rowcount
+        except Exception as e:
+            logger.error(f"[ERROR] Credit ledger compaction failed: {e}")
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+
+# Global singleton
+credit_ledger = CreditLedger()
@@ -2,25 +2,21 @@
 AI Script Generator using Google Gemini Flash
 Fast and cost-effective script generation for TikTok videos
 """
-import os
 from typing import Dict, Any, Optional
 
+from .llm_gateway import llm_gateway
+
 class GeminiScriptGenerator:
     """Генератор вирусных скриптов для TikTok с помощью Google Gemini Flash"""
 
     def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key or api_key == "your_gemini_api_key_here":
+        if not llm_gateway.available("gemini"):
             print("WARNING: GEMINI API KEY not configured!")
-            self.client = None
-        else:
-            try:
-                from google import genai
-                self.client = genai.Client(api_key=api_key)
-                print("Gemini Flash initialized")
-            except Exception as e:
-                print(f"WARNING: Failed to initialize Gemini: {e}")
-                self.client = None
+
+    @property
+    def client(self):
+        """Общий клиент Gemini из LLM gateway (None, если ключ не настроен)"""
+        return llm_gateway.client("gemini")
 
     def generate_script(
         self,
@@ -56,14 +52,11 @@ class GeminiScriptGenerator:
                 duration_seconds
             )
 
-            # Генерируем скрипт с использованием google-genai SDK
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=prompt
-            )
+            # Генерируем скрипт через LLM gateway (лимиты провайдера, повторы при 429/5xx)
+            response_text = llm_gateway.generate("gemini", prompt, model='gemini-2.0-flash')
 
             # Парсим ответ
-            script = self._parse_response(response.text, duration_seconds)
+            script = self._parse_response(response_text, duration_seconds)
 
             return script
 
@@ -0,0 +1,272 @@
+"""
+Image Proxy Cache
+Two-tier cache for proxied CDN images: in-memory LRU bounded by bytes + on-disk store with TTL.
+
+- Memory tier: hot images, evicted least-recently-used once IMAGE_CACHE_MEMORY_MB is reached
+- Disk tier: survives restarts; entries expire after IMAGE_CACHE_TTL_HOURS but are kept
+  (stale) for one more TTL so the proxy can revalidate them upstream with If-None-Match.
+  Capped at IMAGE_CACHE_DISK_MAX_BYTES: least recently used entries (mtime, bumped on
+  disk hits) are evicted first
+- Every entry carries a strong ETag (hash of the body) for client revalidation
+
+Disk I/O is synchronous -- async callers should use asyncio.to_thread().
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_MEMORY_MB = int(os.getenv("IMAGE_CACHE_MEMORY_MB", "64"))
+IMAGE_CACHE_TTL_HOURS = float(os.getenv("IMAGE_CACHE_TTL_HOURS", "72"))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "rizko-image-cache")
+IMAGE_CACHE_DISK_MAX_BYTES = int(os.getenv("IMAGE_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Prune expired disk entries every N writes (or as soon as the disk cap is reached)
+PRUNE_EVERY_WRITES = 500
+# Size-based pruning goes down to this share of the cap, so it doesn't rerun on every write
+PRUNE_TARGET_RATIO = 0.9
+
+
+@dataclass
+class CachedImage:
+    """One cached response body."""
+    content: bytes
+    content_type: str
+    etag: str  # Our strong ETag (hash of content), sent to clients
+    stored_at: float
+    upstream_etag: Optional[str] = None  # CDN ETag, used for upstream revalidation
+
+    def is_fresh(self, ttl_seconds: float) -> bool:
+        return time.time() - self.stored_at < ttl_seconds
+
+
+def make_etag(content: bytes) -> str:
+    """Strong ETag for a body."""
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+class ImageCache:
+    """Thread-safe two-tier (memory + disk) image cache."""
+
+    def __init__(
+        self,
+        memory_bytes: int = IMAGE_CACHE_MEMORY_MB * 1024 * 1024,
+        ttl_seconds: float = IMAGE_CACHE_TTL_HOURS * 3600,
+        cache_dir: str = IMAGE_CACHE_DIR,
+        disk_max_bytes: int = IMAGE_CACHE_DISK_MAX_BYTES
+    ):
+        self.ttl_seconds = ttl_seconds
+        self._memory_bytes = memory_bytes
+        self._disk_max_bytes = disk_max_bytes
+        # Estimate between prunes: None until the first prune has measured the directory
+        self._disk_bytes: Optional[int] = None
+        # Single entries above this never enter memory (disk only)
+        self._max_item_bytes = max(memory_bytes // 8, 1)
+        self._dir = Path(cache_dir)
+        self._lock = threading.Lock()
+        self._memory: OrderedDict = OrderedDict()
+        self._used_bytes = 0
+        self._writes = 0
+        self._counters: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0}
+
+    # -------------------------------------------------------------------------
+    # Memory tier
+    # -------------------------------------------------------------------------
+
+    def _memory_put(self, key: str, entry: CachedImage) -> None:
+        size = len(entry.content)
+        if size > self._max_item_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._used_bytes -= len(old.content)
+            self._memory[key] = entry
+            self._used_bytes += size
+            while self._used_bytes > self._memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._used_bytes -= len(evicted.content)
+
+    # -------------------------------------------------------------------------
+    # Disk tier
+    # -------------------------------------------------------------------------
+
+    def _paths(self, key: str):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        base = self._dir / digest[:2] / digest
+        return base.with_suffix(".bin"), base.with_suffix(".json")
+
+    def _disk_get(self, key: str) -> Optional[CachedImage]:
+        body_path, meta_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text())
+            content = body_path.read_bytes()
+            os.utime(body_path)  # Recently used: evicted last when over the disk cap
+        except (OSError, ValueError):
+            return None
+        return CachedImage(
+            content=content,
+            content_type=meta["content_type"],
+            etag=meta["etag"],
+            stored_at=meta["stored_at"],
+            upstream_etag=meta.get("upstream_etag"),
+        )
+
+    def _disk_put(self, key: str, entry: CachedImage) -> None:
+        body_path, meta_path = self._paths(key)
+        try:
+            body_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write body first, then meta -- a reader never sees meta without its body
+            tmp_body = body_path.with_suffix(f".bin.{os.getpid()}.{threading.get_ident()}")
+            tmp_body.write_bytes(entry.content)
+            os.replace(tmp_body, body_path)
+            tmp_meta = meta_path.with_suffix(f".json.{os.getpid()}.{threading.get_ident()}")
+            tmp_meta.write_text(json.dumps({
+                "content_type": entry.content_type,
+                "etag": entry.etag,
+                "stored_at": entry.stored_at,
+                "upstream_etag": entry.upstream_etag,
+            }))
+            os.replace(tmp_meta, meta_path)
+        except OSError as e:
+            logger.warning(f"[WARNING] Image cache disk write failed: {e}")
+
+    def prune(self) -> int:
+        """
+        Delete disk entries older than twice the TTL (past the revalidation window),
+        then least recently used ones while the tier is over IMAGE_CACHE_DISK_MAX_BYTES.
+        """
+        cutoff = time.time() - 2 * self.ttl_seconds
+        removed = 0
+        if not self._dir.exists():
+            with self._lock:
+                self._disk_bytes = 0
+            return 0
+
+        # Body + meta files of one entry share a name: evict them together
+        entries: Dict[str, list] = {}  # name -> [last used, bytes, paths]
+        for path in self._dir.glob("*/*"):
+            try:
+                stat = path.stat()
+                if stat.st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+                    continue
+            except OSError:
+                continue
+            entry = entries.setdefault(str(path.with_suffix("")), [0.0, 0, []])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+            entry[2].append(path)
+        expired = removed
+
+        total = sum(e[1] for e in entries.values())
+        if total > self._disk_max_bytes:
+            target = self._disk_max_bytes * PRUNE_TARGET_RATIO
+            for _, size, paths in sorted(entries.values(), key=lambda e: e[0]):
+                if total <= target:
+                    break
+                for path in paths:
+                    try:
+                        path.unlink()
+                        removed += 1
+                    except OSError:
+                        continue
+                total -= size
+
+        with self._lock:
+            self._disk_bytes = total
+        if removed:
+            logger.info(f"[DELETE] Pruned {removed} image cache files ({expired} expired), {total / 1024 / 1024:.1f} MB on disk")
+        return removed
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def get_memory(self, key: str) -> Optional[CachedImage]:
+        """Fresh entry from the memory tier, or None. Never touches disk (safe on the event loop)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if not entry.is_fresh(self.ttl_seconds):
+                self._used_bytes -= len(entry.content)
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return entry
+
+    def get_disk(self, key: str) -> Optional[CachedImage]:
+        """Entry from the disk tier (fresh or stale) or None. Callers check is_fresh()."""
+        entry = self._disk_get(key)
+        fresh = entry is not None and entry.is_fresh(self.ttl_seconds)
+        with self._lock:
+            self._counters["disk_hits" if fresh else "stale_hits" if entry else "misses"] += 1
+        if fresh:
+            self._memory_put(key, entry)
+        return entry
+
+    def get(self, key: str) -> Optional[CachedImage]:
+        """Memory tier, then disk tier (blocking)."""
+        return self.get_memory(key) or self.get_disk(key)
+
+    def put(
+        self,
+        key: str,
+        content: bytes,
+        content_type: str,
+        upstream_etag: Optional[str] = None
+    ) -> CachedImage:
+        """Store a body in both tiers and return the entry."""
+        entry = CachedImage(
+            content=content,
+            content_type=content_type,
+            etag=make_etag(content),
+            stored_at=time.time(),
+            upstream_etag=upstream_etag,
+        )
+        self._memory_put(key, entry)
+        self._disk_put(key, entry)
+
+        with self._lock:
+            self._writes += 1
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(content)
+            should_prune = (
+                self._writes % PRUNE_EVERY_WRITES == 0
+                or self._disk_bytes is None
+                or self._disk_bytes > self._disk_max_bytes
+            )
+        if should_prune:
+            self.prune()
+        return entry
+
+    def touch(self, key: str, entry: CachedImage) -> CachedImage:
+        """Mark a revalidated (upstream 304) entry fresh again."""
+        return self.put(key, entry.content, entry.content_type, entry.upstream_etag)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["memory_entries"] = len(self._memory)
+            counters["memory_bytes"] = self._used_bytes
+            counters["disk_bytes"] = self._disk_bytes
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["stale_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        counters["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return counters
+
+
+# Global singleton
+image_cache = ImageCache()
@@ -0,0 +1,292 @@
+"""
+Stored Image Index
+Remembers which images already live in Supabase Storage so repeats skip download + upload.
+
+Lookup order:
+1. In-process LRU (url_key -> public URL + srcset)
+2. stored_images table (survives restarts, shared by all instances)
+3. Content hash of the downloaded bytes within the same folder (same image
+   behind a different URL)
+
+Content-addressed objects are shared by every row that stored the same bytes,
+so deletes go through unreferenced() first, which matches the trigger-maintained
+videos.cover_path / competitors.image_paths columns (indexed) rather than URLs. Forgotten paths are broadcast with
+Postgres NOTIFY so every worker process drops them from its LRU.
+
+Hit/miss counters are exposed via stats() and reported on /health.
+"""
+
+import logging
+import select
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..core.database import SessionLocal, engine
+from ..db.models import StoredImage
+
+logger = logging.getLogger(__name__)
+
+StoredRef = Tuple[str, Dict[str, Dict[str, str]]]  # (public_url, srcset)
+
+# Remembered url_key -> (public URL, srcset) entries
+IMAGE_INDEX_CACHE_SIZE = 10000
+
+# Channel carrying public URLs of forgotten objects to every worker's LRU
+FORGET_CHANNEL = "stored_images_forget"
+
+# Stored paths rows still point at (ix_videos_cover_path, GIN ix_competitors_image_paths).
+# :exclude_competitor is the competitor being deleted.
+_REFERENCED_SQL = text("""
+    SELECT v.cover_path FROM videos v
+    WHERE v.cover_path = ANY(CAST(:paths AS text[]))
+    UNION
+    SELECT unnest(c.image_paths) FROM competitors c
+    WHERE c.image_paths && CAST(:paths AS text[])
+      AND c.id IS DISTINCT FROM :exclude_competitor
+""")
+
+
+class StoredImageIndex:
+    """
+    Two-level (memory LRU + Postgres) existence cache for uploaded images.
+
+    Thread-safe: used from thumbnail workers and FastAPI's threadpool.
+    """
+
+    def __init__(self, max_size: int = IMAGE_INDEX_CACHE_SIZE):
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._by_url: OrderedDict = OrderedDict()
+        self._counters: Dict[str, int] = {
+            "lookups": 0,
+            "memory_hits": 0,
+            "db_hits": 0,
+            "content_hits": 0,
+            "uploads": 0,
+        }
+
+    def _remember(self, url_key: str, stored: StoredRef) -> None:
+        self._ensure_listener()
+        with self._lock:
+            self._by_url[url_key] = stored
+            self._by_url.move_to_end(url_key)
+            while len(self._by_url) > self._max_size:
+                self._by_url.popitem(last=False)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def lookup_url(self, url_key: str) -> Optional[StoredRef]:
+        """(public_url, srcset) of an already stored image for this source URL, or None."""
+        with self._lock:
+            self._counters["lookups"] += 1
+            stored = self._by_url.get(url_key)
+            if stored:
+                self._by_url.move_to_end(url_key)
+                self._counters["memory_hits"] += 1
+                return stored
+
+        db = SessionLocal()
+        try:
+            row = db.query(StoredImage.public_url, StoredImage.variants).filter(
+                StoredImage.url_key == url_key
+            ).first()
+        except Exception as e:
+            logger.warning(f"[WARNING] Stored image lookup failed: {e}")
+            return None
+        finally:
+            db.close()
+
+        if row is None:
+            return None
+        self._count("db_hits")
+        stored = (row.public_url, row.variants or {})
+        self._remember(url_key, stored)
+        return stored
+
+    def lookup_content(self, content_hash: str, folder: str) -> Optional[Tuple[str, str, Dict[str, Dict[str, str]]]]:
+        """(path, public_url, srcset) of an object in folder with identical bytes, or None."""
+        db = SessionLocal()
+        try:
+            row = db.query(StoredImage.path, StoredImage.public_url, StoredImage.variants).filter(
+                StoredImage.content_hash == content_hash,
+                StoredImage.path.startswith(f"{folder}/", autoescape=True)
+            ).first()
+        except Exception as e:
+            logger.warning(f"[WARNING] Stored image content lookup failed: {e}")
+            return None
+        finally:
+            db.close()
+
+        if row is None:
+            return None
+        self._count("content_hits")
+        return row.path, row.public_url, row.variants or {}
+
+    def record(
+        self,
+        url_key: str,
+        content_hash: str,
+        path: str,
+        public_url: str,
+        content_type: Optional[str] = None,
+        size_bytes: Optional[int] = None,
+        variants: Optional[Dict[str, Dict[str, str]]] = None,
+        uploaded: bool = True
+    ) -> None:
+        """Remember that url_key resolves to a stored object (and its responsive variants)."""
+        variants = variants or {}
+        self._remember(url_key, (public_url, variants))
+        if uploaded:
+            self._count("uploads")
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                pg_insert(StoredImage).values(
+                    url_key=url_key,
+                    content_hash=content_hash,
+                    path=path,
+                    public_url=public_url,
+                    content_type=content_type,
+                    size_bytes=size_bytes,
+                    variants=variants,
+                ).on_conflict_do_nothing(index_elements=[StoredImage.url_key])
+            )
+            db.commit()
+        except Exception as e:
+            logger.warning(f"[WARNING] Failed to record stored image {path}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def unreferenced(self, paths: Iterable[str], exclude_competitor_id: Optional[int] = None) -> List[str]:
+        """
+        Paths no video or competitor row points at any more (safe to delete).
+
+        Fails closed: if the check can't run, nothing is considered unreferenced.
+        """
+        paths = list(dict.fromkeys(p for p in paths if p))
+        if not paths:
+            return []
+
+        db = SessionLocal()
+        try:
+            referenced = {p for (p,) in db.execute(
+                _REFERENCED_SQL, {"paths": paths, "exclude_competitor": exclude_competitor_id}
+            )}
+        except Exception as e:
+            logger.warning(f"[WARNING] Stored image reference check failed, keeping objects: {e}")
+            return []
+        finally:
+            db.close()
+        return [p for p in paths if p not in referenced]
+
+    def forget_paths(self, paths: Iterable[str]) -> List[str]:
+        """
+        Drop index entries for deleted objects so they get re-uploaded on demand,
+        in this process and (via NOTIFY) in every other worker.
+
+        Returns:
+            Public URLs of the responsive variants stored alongside them
+        """
+        paths = [p for p in paths if p]
+        if not paths:
+            return []
+
+        db = SessionLocal()
+        try:
+            rows = db.query(StoredImage.public_url, StoredImage.variants).filter(
+                StoredImage.path.in_(paths)
+            ).all()
+            public_urls = {row.public_url for row in rows}
+            variant_urls = {
+                url for row in rows
+                for by_width in (row.variants or {}).values()
+                for url in by_width.values()
+            }
+            db.query(StoredImage).filter(StoredImage.path.in_(paths)).delete(synchronize_session=False)
+            # Delivered on commit; payloads are capped at 8000 bytes, so one per URL
+            for url in public_urls:
+                db.execute(text("SELECT pg_notify(:channel, :url)"), {"channel": FORGET_CHANNEL, "url": url})
+            db.commit()
+        except Exception as e:
+            logger.warning(f"[WARNING] Failed to forget stored images: {e}")
+            db.rollback()
+            return []
+        finally:
+            db.close()
+
+        self._evict(public_urls)
+        return sorted(variant_urls)
+
+    def _evict(self, public_urls: Set[str]) -> None:
+        with self._lock:
+            for key in [k for k, v in self._by_url.items() if v[0] in public_urls]:
+                del self._by_url[key]
+
+    # -------------------------------------------------------------------------
+    # Cross-process invalidation (LISTEN stored_images_forget)
+    # -------------------------------------------------------------------------
+
+    def _ensure_listener(self) -> None:
+        """Start the NOTIFY listener once the LRU holds anything worth invalidating."""
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="image-index-listener", daemon=True)
+                self._listener.start()
+
+    def _listen(self) -> None:
+        while True:
+            conn = None
+            try:
+                # Dedicated connection: LISTEN holds it for the process lifetime
+                cargs, cparams = engine.dialect.create_connect_args(engine.url)
+                conn = engine.dialect.dbapi.connect(*cargs, **cparams)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {FORGET_CHANNEL}")
+                # Entries cached before LISTEN took effect may have missed a forget
+                with self._lock:
+                    self._by_url.clear()
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    urls = {n.payload for n in conn.notifies}
+                    conn.notifies.clear()
+                    if urls:
+                        self._evict(urls)
+            except Exception as e:
+                logger.warning(f"[WARNING] Stored image index listener disconnected: {e} -- retrying in 5s")
+                with self._lock:
+                    self._by_url.clear()
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def stats(self) -> dict:
+        """Counters plus overall hit rate (requests that skipped an upload)."""
+        with self._lock:
+            counters = dict(self._counters)
+            cached = len(self._by_url)
+        hits = counters["memory_hits"] + counters["db_hits"] + counters["content_hits"]
+        counters["hit_rate"] = round(hits / counters["lookups"], 4) if counters["lookups"] else 0.0
+        counters["cached_entries"] = cached
+        return counters
+
+
+# Global singleton
+stored_image_index = StoredImageIndex()
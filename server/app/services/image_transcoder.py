@@ -0,0 +1,240 @@
+"""
+Image Transcoder
+Pillow decode/encode work off the request path, in a worker process pool.
+
+- Responsive thumbnail variants (several widths, WebP + AVIF where supported)
+- JPEG conversion for formats browsers can't display (HEIC, TIFF, ...)
+- On-the-fly resize + format negotiation for the image proxy
+
+JPEG sources are decoded with draft() (libjpeg DCT scaling to 1/2, 1/4, 1/8)
+and shrunk with reduce() before the final resample, so a 1080px cover
+becomes a 200px WebP without ever decoding the full-size bitmap.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, Optional, Sequence, Tuple
+
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+# Worker processes (CPU-bound -- default to core count, capped)
+IMAGE_TRANSCODE_WORKERS = int(os.getenv("IMAGE_TRANSCODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Workers start from a clean server process: forking this one (DB pools, HTTP
+# clients, background threads holding locks) can deadlock the child.
+# No forkserver on Windows, which only spawns anyway.
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# Seconds to wait for one transcode before giving up
+IMAGE_TRANSCODE_TIMEOUT = 30
+
+# Responsive widths for grid / card / detail views
+THUMBNAIL_WIDTHS = (200, 400, 720)
+
+CONTENT_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+PIL_FORMATS = {"avif": "AVIF", "webp": "WEBP", "jpeg": "JPEG"}
+
+
+def _register_plugins() -> None:
+    """Enable HEIF/AVIF decoders in this process (runs in every worker)."""
+    try:
+        from pillow_heif import register_heif_opener
+        register_heif_opener()
+    except ImportError:
+        pass
+    if not features.check("avif"):
+        try:
+            import pillow_avif  # noqa: F401  (registers the AVIF plugin)
+        except ImportError:
+            pass
+
+
+@lru_cache(maxsize=None)
+def avif_supported() -> bool:
+    """True if this Pillow build can encode AVIF."""
+    _register_plugins()
+    return features.check("avif") or "AVIF" in Image.SAVE
+
+
+def _open_scaled(image_bytes: bytes, target: Tuple[int, int]) -> Image.Image:
+    """Open an image, letting JPEG decode directly at the smallest DCT scale >= target."""
+    img = Image.open(BytesIO(image_bytes))
+    if img.format == "JPEG":
+        img.draft("RGB", target)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+    return img
+
+
+def _downscale(img: Image.Image, width: int) -> Image.Image:
+    """Shrink to width: cheap integer reduce() first, then one LANCZOS resample."""
+    if img.width <= width:
+        return img
+    factor = img.width // width
+    if factor >= 2:
+        img = img.reduce(factor)
+    if img.width != width:
+        height = max(1, round(img.height * width / img.width))
+        img = img.resize((width, height), Image.LANCZOS)
+    return img
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    output = BytesIO()
+    if fmt == "jpeg" and img.mode != "RGB":
+        img = img.convert("RGB")
+    params = {"quality": quality}
+    if fmt == "webp":
+        params["method"] = 4
+    elif fmt == "avif":
+        params["speed"] = 8
+    elif fmt == "jpeg":
+        params["optimize"] = True
+    img.save(output, format=PIL_FORMATS[fmt], **params)
+    return output.getvalue()
+
+
+def render_variants(
+    image_bytes: bytes,
+    widths: Sequence[int],
+    formats: Sequence[str],
+    quality: int = 75
+) -> Dict[str, Dict[int, bytes]]:
+    """
+    Worker: encode one image at several widths and formats.
+
+    Widths larger than the source are skipped (no upscaling); if the source is
+    smaller than every width, a single variant at its native width is produced.
+
+    Returns:
+        {format: {width: encoded_bytes}}
+    """
+    with Image.open(BytesIO(image_bytes)) as probe:
+        src_width, src_height = probe.size
+
+    largest = min(max(widths), src_width)
+    img = _open_scaled(image_bytes, (largest, max(1, src_height * largest // src_width)))
+
+    targets = sorted({w for w in widths if w <= src_width} or {src_width})
+    variants: Dict[str, Dict[int, bytes]] = {fmt: {} for fmt in formats}
+    for width in targets:
+        resized = _downscale(img, width)
+        for fmt in formats:
+            variants[fmt][resized.width] = _encode(resized, fmt, quality)
+    return variants
+
+
+def resize_image(
+    image_bytes: bytes,
+    width: Optional[int],
+    height: Optional[int],
+    fmt: str,
+    quality: int = 75
+) -> bytes:
+    """
+    Worker: fit an image inside width x height (either may be None), keep aspect
+    ratio, never upscale, and encode it as fmt.
+    """
+    with Image.open(BytesIO(image_bytes)) as probe:
+        src_width, src_height = probe.size
+
+    scale = min(
+        (width / src_width) if width else 1.0,
+        (height / src_height) if height else 1.0,
+        1.0
+    )
+    target_width = max(1, round(src_width * scale))
+    target_height = max(1, round(src_height * scale))
+
+    img = _open_scaled(image_bytes, (target_width, target_height))
+    return _encode(_downscale(img, target_width), fmt, quality)
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Best output format for an Accept header: AVIF, then WebP, then JPEG."""
+    accept = (accept or "").lower()
+    if "image/avif" in accept and avif_supported():
+        return "avif"
+    if "image/webp" in accept:
+        return "webp"
+    return "jpeg"
+
+
+def convert_to_jpeg(image_bytes: bytes, quality: int = 85) -> bytes:
+    """Worker: re-encode any decodable image as JPEG."""
+    img = Image.open(BytesIO(image_bytes))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return _encode(img, "jpeg", quality)
+
+
+class ImageTranscoder:
+    """Lazy process pool for Pillow work; thread-safe submit from any thread."""
+
+    def __init__(self, max_workers: int = IMAGE_TRANSCODE_WORKERS):
+        self._max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._formats: Optional[Tuple[str, ...]] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Lazy init -- no worker processes until the first image."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._max_workers,
+                    mp_context=multiprocessing.get_context(_START_METHOD),
+                    initializer=_register_plugins
+                )
+            return self._executor
+
+    def variant_formats(self) -> Tuple[str, ...]:
+        """Formats produced for thumbnail variants (AVIF only when the build supports it)."""
+        if self._formats is None:
+            self._formats = ("webp", "avif") if avif_supported() else ("webp",)
+        return self._formats
+
+    def run(self, fn, *args, timeout: float = IMAGE_TRANSCODE_TIMEOUT):
+        """Run a module-level worker function in the pool and wait for its result."""
+        return self._get_executor().submit(fn, *args).result(timeout=timeout)
+
+    async def run_async(self, fn, *args, timeout: float = IMAGE_TRANSCODE_TIMEOUT):
+        """Awaitable run() for the event loop -- never blocks it."""
+        future = self._get_executor().submit(fn, *args)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+
+    def variants(self, image_bytes: bytes, widths: Sequence[int] = THUMBNAIL_WIDTHS) -> Dict[str, Dict[int, bytes]]:
+        """Responsive variants of one image: {format: {width: bytes}}."""
+        return self.run(render_variants, image_bytes, tuple(widths), self.variant_formats())
+
+    def to_jpeg(self, image_bytes: bytes) -> bytes:
+        """JPEG re-encode for browser-unsupported formats."""
+        return self.run(convert_to_jpeg, image_bytes)
+
+    async def resize(
+        self,
+        image_bytes: bytes,
+        width: Optional[int],
+        height: Optional[int],
+        fmt: str,
+        quality: int = 75
+    ) -> bytes:
+        """Resized + re-encoded image (awaitable, runs in the pool)."""
+        return await self.run_async(resize_image, image_bytes, width, height, fmt, quality)
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop worker processes (called on app shutdown)."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
+
+
+# Global singleton
+image_transcoder = ImageTranscoder()
@@ -1,7 +1,6 @@
 # backend/app/services/instagram_collector.py
 import os
 from typing import List
-from apify_client import ApifyClient
 
 class InstagramCollector:
     """
@@ -19,6 +18,7 @@ class InstagramCollector:
             print("[WARNING] APIFY_API_TOKEN not found in .env")
             self.client = None
         else:
+            from apify_client import ApifyClient  # heavy SDK: imported on first use
             self.client = ApifyClient(token)
 
         # Using apify/instagram-profile-scraper actor (WORKING - 57M+ runs)
@@ -0,0 +1,493 @@
+"""
+LLM Gateway
+Every Gemini / Claude / OpenAI call of the backend goes through here.
+
+- Pooled clients: one long-lived client per provider (SDK imported on first
+  use), shared by all callers and threads, so HTTP connections are reused
+  instead of building a client per request. SDK-internal retries are off;
+  the gateway retries itself so every attempt is shaped and counted.
+- Rate shaping: per-provider requests/min and tokens/min budgets, GCRA (a
+  token bucket) in the rate limit store -- shared by all workers when Redis
+  is configured. A call over budget waits for its slot instead of being sent
+  and bounced with a 429; only after LLM_MAX_QUEUE_SECONDS in line does it
+  fail with LLMRateLimitError. Tokens are estimated up front: prompt length
+  / 4 plus the model's average completion size so far.
+- Retries: 408/409/429/5xx, timeouts and connection errors are retried with
+  exponential backoff and full jitter (Retry-After wins when sent), up to
+  LLM_MAX_RETRIES times. A stream is only retried before its first delta.
+- Metrics per model (stats(), in /health): calls, errors, retries, time
+  queued for budget, latency, input/output tokens.
+
+Blocking API: async code awaits llm_gateway.run(fn, ...). It runs fn on the
+gateway's own thread pool (LLM_GATEWAY_WORKERS), not through asyncio.to_thread().
+Budget waits and backoff can sleep for minutes in a burst, and in the default
+executor they would hold the threads that DB and queue work also need.
+
+Local testing: run scripts/llm_stub.py and point the SDKs at it with
+GEMINI_BASE_URL, ANTHROPIC_BASE_URL and OPENAI_BASE_URL (any API keys), or
+inject a client with set_client().
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+LLM_MAX_QUEUE_SECONDS = float(os.getenv("LLM_MAX_QUEUE_SECONDS", "120"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+# Threads for run(): gateway calls from async code in flight at once (more wait for a thread)
+LLM_GATEWAY_WORKERS = int(os.getenv("LLM_GATEWAY_WORKERS", "32"))
+
+# Completion size assumed for a model's TPM estimate until calls have been seen
+_DEFAULT_COMPLETION_TOKENS = 500
+_LATENCY_WINDOW = 500
+
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """Default model and per-minute budgets of a provider (0 = unlimited)."""
+    name: str
+    label: str
+    api_key_env: str
+    default_model: str
+    rpm: int
+    tpm: int
+
+
+# Budgets default to entry account tiers; raise them to match yours
+PROVIDERS: Dict[str, ProviderSpec] = {
+    "gemini": ProviderSpec(
+        "gemini", "Gemini", "GEMINI_API_KEY", "gemini-2.0-flash",
+        int(os.getenv("LLM_GEMINI_RPM", "1000")), int(os.getenv("LLM_GEMINI_TPM", "1000000")),
+    ),
+    "claude": ProviderSpec(
+        "claude", "Claude", "ANTHROPIC_API_KEY", "claude-3-5-sonnet-20241022",
+        int(os.getenv("LLM_CLAUDE_RPM", "50")), int(os.getenv("LLM_CLAUDE_TPM", "40000")),
+    ),
+    "gpt4": ProviderSpec(
+        "gpt4", "OpenAI", "OPENAI_API_KEY", "gpt-4o",
+        int(os.getenv("LLM_GPT4_RPM", "500")), int(os.getenv("LLM_GPT4_TPM", "30000")),
+    ),
+}
+
+
+class LLMUnavailableError(RuntimeError):
+    """The provider has no (valid) API key configured."""
+
+
+class LLMRateLimitError(RuntimeError):
+    """Waited LLM_MAX_QUEUE_SECONDS for the provider's budget, or still 429 after all retries."""
+
+
+def _api_key(spec: ProviderSpec) -> Optional[str]:
+    api_key = os.getenv(spec.api_key_env)
+    if spec.name == "gemini":
+        api_key = api_key or os.getenv("GOOGLE_API_KEY")
+    # Placeholders from .env.example ("your-...", "your_gemini_api_key_here")
+    if not api_key or api_key.startswith("your"):
+        return None
+    return api_key
+
+
+def _create_client(spec: ProviderSpec) -> Optional[Any]:
+    api_key = _api_key(spec)
+    if api_key is None:
+        return None
+    if spec.name == "gemini":
+        from google import genai
+        from google.genai import types
+        return genai.Client(api_key=api_key, http_options=types.HttpOptions(
+            base_url=os.getenv("GEMINI_BASE_URL"),
+            timeout=int(LLM_TIMEOUT_SECONDS * 1000),
+        ))
+    if spec.name == "claude":
+        import anthropic
+        return anthropic.Anthropic(api_key=api_key, max_retries=0, timeout=LLM_TIMEOUT_SECONDS)
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, max_retries=0, timeout=LLM_TIMEOUT_SECONDS)
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    """HTTP status of an SDK error (status_code: anthropic, openai; code: genai)."""
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _retryable(exc: BaseException) -> Tuple[bool, Optional[float]]:
+    """(retry?, server-requested delay) for an SDK exception."""
+    status = _status(exc)
+    retry_after = None
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is not None:
+        try:
+            retry_after = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+
+    if status is not None:
+        return status in _RETRYABLE_STATUS or status >= 500, retry_after
+    # APIConnectionError / APITimeoutError (anthropic, openai), httpx transport errors (genai)
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    transient = any(marker in name for name in names for marker in ("Timeout", "Connection", "TransportError"))
+    return transient, retry_after
+
+
+def _usage(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    """(input, output) tokens reported by any of the three SDKs, None if absent."""
+    meta = getattr(response, "usage_metadata", None)  # Gemini
+    if meta is not None:
+        return getattr(meta, "prompt_token_count", None), getattr(meta, "candidates_token_count", None)
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None, None
+    if hasattr(usage, "input_tokens"):  # Anthropic
+        return usage.input_tokens, usage.output_tokens
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)  # OpenAI
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+@dataclass
+class _Streamed:
+    """Result of a streamed completion (text + the usage sent at the end)."""
+    text: str
+    usage_metadata: Any = None
+    usage: Any = None
+
+
+class _ModelStats:
+    __slots__ = ("calls", "errors", "retries", "queued", "queue_ms", "latencies", "input_tokens", "output_tokens", "completions")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.queued = 0  # Calls that waited for rate budget
+        self.queue_ms = 0.0
+        self.latencies: deque = deque(maxlen=_LATENCY_WINDOW)
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.completions = 0  # Successful calls with a reported output size
+
+    def as_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "queued": self.queued,
+            "queue_ms_avg": round(self.queue_ms / self.queued, 1) if self.queued else 0,
+            "latency_ms_avg": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "latency_ms_p95": round(latencies[int(len(latencies) * 0.95)], 1) if latencies else None,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+class LLMGateway:
+    """Pooled provider clients with rate shaping, retries and metrics."""
+
+    def __init__(self, providers: Dict[str, ProviderSpec] = PROVIDERS, max_workers: int = LLM_GATEWAY_WORKERS):
+        self.providers = providers
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Optional[Any]] = {}
+        self._store = None
+        self._stats: Dict[str, _ModelStats] = {}
+
+    # -------------------------------------------------------------------------
+    # Clients
+    # -------------------------------------------------------------------------
+
+    def client(self, provider: str) -> Optional[Any]:
+        """Shared client of a provider, None if it isn't configured."""
+        with self._lock:
+            if provider not in self._clients:
+                spec = self.providers[provider]
+                try:
+                    self._clients[provider] = _create_client(spec)
+                    if self._clients[provider] is not None:
+                        logger.info(f"[OK] LLM client initialized: {spec.label}")
+                except Exception as e:
+                    logger.error(f"[ERROR] Failed to initialize {spec.label} client: {e}")
+                    self._clients[provider] = None
+            return self._clients[provider]
+
+    def available(self, provider: str) -> bool:
+        return self.client(provider) is not None
+
+    def set_client(self, provider: str, client: Optional[Any]) -> None:
+        """Replace a provider's client (stub providers in tests)."""
+        with self._lock:
+            self._clients[provider] = client
+
+    # -------------------------------------------------------------------------
+    # Rate shaping
+    # -------------------------------------------------------------------------
+
+    def _rate_store(self):
+        with self._lock:
+            if self._store is None:
+                from ..core.rate_limit import create_rate_limit_store
+                self._store = create_rate_limit_store()
+            return self._store
+
+    def _model_stats(self, model: str) -> _ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(model, _ModelStats())
+        return stats
+
+    def _expected_completion(self, model: str, max_tokens: Optional[int]) -> int:
+        stats = self._stats.get(model)
+        expected = stats.output_tokens // stats.completions if stats and stats.completions else _DEFAULT_COMPLETION_TOKENS
+        return min(expected, max_tokens) if max_tokens else expected
+
+    def _wait_for_budget(self, spec: ProviderSpec, tokens: int) -> float:
+        """Block until the call fits the provider's RPM and TPM budgets. Returns seconds waited."""
+        store = self._rate_store()
+        started = time.monotonic()
+        deadline = started + LLM_MAX_QUEUE_SECONDS
+        for bucket, limit, cost in (("rpm", spec.rpm, 1), ("tpm", spec.tpm, tokens)):
+            if limit <= 0:
+                continue
+            # A call larger than the whole budget still gets through, alone
+            cost = max(1, min(cost, limit))
+            while True:
+                result = store.gcra(f"llm:{spec.name}:{bucket}", limit, 60.0, cost)
+                if result.allowed:
+                    break
+                delay = result.retry_after + random.uniform(0, 0.05)
+                if time.monotonic() + delay > deadline:
+                    raise LLMRateLimitError(
+                        f"Rate limit exceeded for {spec.name}: no {bucket.upper()} budget within {LLM_MAX_QUEUE_SECONDS:.0f}s"
+                    )
+                time.sleep(delay)
+        return time.monotonic() - started
+
+    # -------------------------------------------------------------------------
+    # Calls
+    # -------------------------------------------------------------------------
+
+    def call(
+        self,
+        provider: str,
+        fn: Callable[[Any], Any],
+        model: Optional[str] = None,
+        prompt: str = "",
+        max_tokens: Optional[int] = None,
+        can_retry: Callable[[], bool] = lambda: True
+    ) -> Any:
+        """
+        Run fn(client) -- one SDK request -- shaped, retried and measured.
+
+        Args:
+            provider: "gemini", "claude" or "gpt4"
+            fn: Blocking fn(client) -> SDK response
+            model: Model fn requests (metrics key; default: the provider's)
+            prompt: Prompt text, for the token estimate
+            max_tokens: Completion cap, for the token estimate
+            can_retry: Checked before a retry (False once a stream has emitted)
+
+        Raises:
+            LLMUnavailableError, LLMRateLimitError, or the SDK's error
+        """
+        spec = self.providers[provider]
+        client = self.client(provider)
+        if client is None:
+            raise LLMUnavailableError(f"{spec.label} API not configured - add {spec.api_key_env} to .env")
+
+        model = model or spec.default_model
+        stats = self._model_stats(model)
+        tokens = _estimate_tokens(prompt) + self._expected_completion(model, max_tokens)
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            waited = self._wait_for_budget(spec, tokens)
+            started = time.perf_counter()
+            try:
+                response = fn(client)
+            except Exception as e:
+                retryable, retry_after = _retryable(e)
+                with self._lock:
+                    stats.calls += 1
+                    stats.errors += 1
+                    stats.queued += int(waited > 0.001)
+                    stats.queue_ms += waited * 1000
+                if not retryable or attempt == LLM_MAX_RETRIES or not can_retry():
+                    if _status(e) == 429:
+                        raise LLMRateLimitError(f"Rate limit exceeded for {provider} after {attempt + 1} attempts: {e}") from e
+                    raise
+                backoff = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+                delay = max(retry_after or 0, backoff)
+                with self._lock:
+                    stats.retries += 1
+                logger.warning(f"[WARNING] {model} attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            input_tokens, output_tokens = _usage(response)
+            with self._lock:
+                stats.calls += 1
+                stats.queued += int(waited > 0.001)
+                stats.queue_ms += waited * 1000
+                stats.latencies.append((time.perf_counter() - started) * 1000)
+                stats.input_tokens += input_tokens or _estimate_tokens(prompt)
+                if output_tokens is not None:
+                    stats.output_tokens += output_tokens
+                    stats.completions += 1
+            return response
+
+    def generate(
+        self,
+        provider: str,
+        prompt: str,
+        model: Optional[str] = None,
+        system: Optional[str] = None,
+        max_tokens: int = 4096,
+        sink: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        Text completion of prompt (stripped; "" if the model returned nothing).
+        With a sink, the response is streamed and each delta passed to it.
+        """
+        spec = self.providers[provider]
+        model = model or spec.default_model
+        emitted = []
+
+        def forward(deltas) -> str:
+            for delta in deltas:
+                if delta:
+                    emitted.append(delta)
+                    sink(delta)
+            return "".join(emitted)
+
+        def gemini(client):
+            config = None
+            if system:
+                from google.genai import types
+                config = types.GenerateContentConfig(system_instruction=system)
+            if not sink:
+                return client.models.generate_content(model=model, contents=prompt, config=config)
+            last = []
+
+            def chunks():
+                for chunk in client.models.generate_content_stream(model=model, contents=prompt, config=config):
+                    last[:] = [chunk]
+                    yield chunk.text
+            text = forward(chunks())
+            return _Streamed(text, usage_metadata=getattr(last[0], "usage_metadata", None) if last else None)
+
+        def claude(client):
+            kwargs = {"model": model, "max_tokens": max_tokens, "messages": [{"role": "user", "content": prompt}]}
+            if system:
+                kwargs["system"] = system
+            if not sink:
+                return client.messages.create(**kwargs)
+            with client.messages.stream(**kwargs) as stream:
+                text = forward(stream.text_stream)
+                return _Streamed(text, usage=stream.get_final_message().usage)
+
+        def openai(client):
+            messages = [{"role": "system", "content": system}] if system else []
+            messages.append({"role": "user", "content": prompt})
+            if not sink:
+                return client.chat.completions.create(model=model, messages=messages, max_tokens=max_tokens)
+            usage = []
+
+            def chunks():
+                stream = client.chat.completions.create(
+                    model=model, messages=messages, max_tokens=max_tokens,
+                    stream=True, stream_options={"include_usage": True},
+                )
+                for chunk in stream:
+                    if chunk.usage:
+                        usage[:] = [chunk.usage]
+                    if chunk.choices:
+                        yield chunk.choices[0].delta.content
+            text = forward(chunks())
+            return _Streamed(text, usage=usage[0] if usage else None)
+
+        request = {"gemini": gemini, "claude": claude, "gpt4": openai}[provider]
+        response = self.call(
+            provider, request, model,
+            prompt=(system or "") + prompt, max_tokens=max_tokens,
+            can_retry=lambda: not emitted
+        )
+        return (_text(response) or "").strip()
+
+    # -------------------------------------------------------------------------
+    # Async callers
+    # -------------------------------------------------------------------------
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Lazy init -- no threads until the first run()."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="llm-gateway"
+                )
+            return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Awaitable fn(*args, **kwargs) for blocking code that makes gateway calls
+        (generate(), call(), or a service function wrapping them). Works like
+        asyncio.to_thread(), context variables included, but on the gateway's own pool.
+        """
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._get_executor(), functools.partial(context.run, fn, *args, **kwargs)
+        )
+
+    # -------------------------------------------------------------------------
+    # Metrics
+    # -------------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = {model: s.as_dict() for model, s in self._stats.items()}
+            configured = [p for p, c in self._clients.items() if c is not None]
+        return {
+            "clients": configured,
+            "limits": {p: {"rpm": s.rpm, "tpm": s.tpm} for p, s in self.providers.items()},
+            "models": models,
+        }
+
+
+def _text(response: Any) -> Optional[str]:
+    """Text of a completion from any of the three SDKs."""
+    if isinstance(response, _Streamed):
+        return response.text
+    if hasattr(response, "choices"):  # OpenAI
+        return response.choices[0].message.content if response.choices else None
+    content = getattr(response, "content", None)
+    if isinstance(content, list):  # Anthropic
+        return "".join(getattr(block, "text", "") for block in content)
+    return getattr(response, "text", None)  # Gemini
+
+
+# Global singleton
+llm_gateway = LLMGateway()
@@ -0,0 +1,152 @@
+"""
+Workflow Node Output Cache
+Memoizes workflow node outputs in Postgres (workflow_node_cache), so rerunning
+a workflow after tweaking one node only pays for that node and the nodes
+downstream of it.
+
+Keys are content-addressed: a SHA-256 of everything that determines a node's
+output -- node type, config, model, language, the hashes of its upstream
+outputs, the attached video -- plus NODE_CACHE_VERSION (bump it when prompts
+change so old outputs stop matching). Because upstream outputs are part of
+the key, a changed node invalidates exactly its downstream subgraph.
+
+Lookups and stores use their own short sessions (they run in executor worker
+threads) and never fail a run: any error is logged and treated as a miss.
+Eviction is LRU by last_used_at, plus a maximum age (scheduled evict()).
+
+Fallback outputs (API errors, metadata-only video analysis) are not stored:
+code producing one calls mark_uncacheable() in the node's worker thread.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import text
+
+from ..core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+NODE_CACHE_VERSION = 1
+NODE_CACHE_MAX_ENTRIES = int(os.getenv("NODE_CACHE_MAX_ENTRIES", "50000"))
+NODE_CACHE_MAX_AGE_DAYS = int(os.getenv("NODE_CACHE_MAX_AGE_DAYS", "30"))
+
+# Hit: return the output and bump recency in one statement
+_GET_SQL = text("""
+    UPDATE workflow_node_cache
+    SET last_used_at = :now, hit_count = hit_count + 1
+    WHERE cache_key = :key
+    RETURNING output
+""")
+
+_PUT_SQL = text("""
+    INSERT INTO workflow_node_cache (cache_key, user_id, node_type, output, size_bytes, hit_count, created_at, last_used_at)
+    VALUES (:key, :user_id, :node_type, :output, :size_bytes, 0, :now, :now)
+    ON CONFLICT (cache_key) DO UPDATE
+    SET output = EXCLUDED.output, size_bytes = EXCLUDED.size_bytes, last_used_at = EXCLUDED.last_used_at
+""")
+
+# Keep the NODE_CACHE_MAX_ENTRIES most recently used rows
+_EVICT_LRU_SQL = text("""
+    DELETE FROM workflow_node_cache
+    WHERE last_used_at < (
+        SELECT last_used_at FROM workflow_node_cache
+        ORDER BY last_used_at DESC
+        OFFSET :max_entries LIMIT 1
+    )
+""")
+
+
+# Per worker thread: did the node being run fall back to a degraded output?
+_node_state = threading.local()
+
+
+def begin_node() -> None:
+    """Reset the fallback marker before running a node in this thread."""
+    _node_state.uncacheable = False
+
+
+def mark_uncacheable() -> None:
+    """The current node's output is an error/fallback -- don't memoize it."""
+    _node_state.uncacheable = True
+
+
+def is_cacheable() -> bool:
+    return not getattr(_node_state, "uncacheable", False)
+
+
+def content_hash(value: str) -> str:
+    """SHA-256 of a node output (what downstream keys are built from)."""
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+class NodeOutputCache:
+    """Content-addressed cache of workflow node outputs."""
+
+    def key(self, **parts: Any) -> str:
+        """Cache key for a node: SHA-256 of its canonical JSON-encoded inputs."""
+        payload = json.dumps(
+            {"v": NODE_CACHE_VERSION, **parts},
+            sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            output = db.execute(_GET_SQL, {"key": key, "now": datetime.utcnow()}).scalar()
+            db.commit()
+            return output
+        except Exception as e:
+            logger.warning(f"[WARNING] Node cache lookup failed: {e}")
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def put(self, key: str, user_id: int, node_type: str, output: str) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(_PUT_SQL, {
+                "key": key,
+                "user_id": user_id,
+                "node_type": node_type,
+                "output": output,
+                "size_bytes": len(output.encode("utf-8")),
+                "now": datetime.utcnow(),
+            })
+            db.commit()
+        except Exception as e:
+            logger.warning(f"[WARNING] Node cache store failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def evict(self) -> int:
+        """Scheduled: drop entries past NODE_CACHE_MAX_AGE_DAYS, then the least recently used."""
+        db = SessionLocal()
+        try:
+            expired = db.execute(
+                text("DELETE FROM workflow_node_cache WHERE last_used_at < :cutoff"),
+                {"cutoff": datetime.utcnow() - timedelta(days=NODE_CACHE_MAX_AGE_DAYS)}
+            ).rowcount
+            overflow = db.execute(_EVICT_LRU_SQL, {"max_entries": NODE_CACHE_MAX_ENTRIES}).rowcount
+            db.commit()
+            if expired or overflow:
+                logger.info(f"[OK] Node cache: evicted {expired} expired, {overflow} least recently used")
+            return expired + overflow
+        except Exception as e:
+            logger.error(f"[ERROR] Node cache eviction failed: {e}")
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+
+# Global singleton
+node_cache = NodeOutputCache()
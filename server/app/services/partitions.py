@@ -0,0 +1,149 @@
+"""
+Partition Maintenance
+Monthly range partitions for the append-heavy history tables
+(user_searches, chat_messages, workflow_runs -- see migration partition_history_tables).
+
+- Partitions are created PARTITION_PREMAKE_MONTHS ahead, so inserts never land
+  in the default partition.
+- Retention is per tier (RETENTION_MONTHS). Reads are limited to the user's
+  window (retention_cutoff); months past the longest window are removed by
+  dropping whole partitions -- no DELETE, no bloat, no vacuum debt.
+- workflow_runs partitions that still hold pinned runs are kept.
+"""
+
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..core.database import SessionLocal
+from ..db.models import SubscriptionTier
+
+logger = logging.getLogger(__name__)
+
+# table -> partition key column
+PARTITIONED_TABLES: Dict[str, str] = {
+    "user_searches": "created_at",
+    "chat_messages": "created_at",
+    "workflow_runs": "started_at",
+}
+
+# History visible per tier (months, including the current one)
+RETENTION_MONTHS: Dict[SubscriptionTier, int] = {
+    SubscriptionTier.FREE: 3,
+    SubscriptionTier.CREATOR: 6,
+    SubscriptionTier.PRO: 12,
+    SubscriptionTier.AGENCY: 24,
+}
+
+PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))
+
+# Serializes maintenance across workers (pg_advisory_xact_lock key)
+_ADVISORY_LOCK_KEY = 0x7061727473  # "parts"
+
+_PARTITION_NAME = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def _add_months(month_start: datetime, months: int) -> datetime:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _month_start(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+
+class PartitionManager:
+    """Creates upcoming monthly partitions and drops expired ones."""
+
+    def retention_cutoff(self, tier: Optional[SubscriptionTier], now: Optional[datetime] = None) -> datetime:
+        """Oldest timestamp visible to a tier (start of its first retained month)."""
+        months = RETENTION_MONTHS.get(tier, RETENTION_MONTHS[SubscriptionTier.FREE])
+        return _add_months(_month_start(now or datetime.utcnow()), 1 - months)
+
+    def storage_cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """Partitions ending at or before this are past every tier's window."""
+        return _add_months(_month_start(now or datetime.utcnow()), 1 - max(RETENTION_MONTHS.values()))
+
+    @staticmethod
+    def _partitions(db: Session, table: str) -> Dict[str, datetime]:
+        """Existing monthly partitions of table: {name: month start}."""
+        rows = db.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:table AS regclass)
+        """), {"table": table}).scalars()
+        partitions = {}
+        for name in rows:
+            match = _PARTITION_NAME.search(name)
+            if match:
+                partitions[name] = datetime(int(match.group(1)), int(match.group(2)), 1)
+        return partitions
+
+    def ensure_partitions(self, db: Session, now: Optional[datetime] = None) -> List[str]:
+        """Create this month's and the next PARTITION_PREMAKE_MONTHS partitions where missing."""
+        current = _month_start(now or datetime.utcnow())
+        created = []
+        for table in PARTITIONED_TABLES:
+            existing = set(self._partitions(db, table).values())
+            for offset in range(PARTITION_PREMAKE_MONTHS + 1):
+                month = _add_months(current, offset)
+                if month in existing:
+                    continue
+                name = f"{table}_p{month:%Y%m}"
+                db.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+                ))
+                created.append(name)
+        return created
+
+    def drop_expired(self, db: Session, now: Optional[datetime] = None) -> List[str]:
+        """Drop partitions that end before the longest retention window."""
+        cutoff = self.storage_cutoff(now)
+        dropped = []
+        for table in PARTITIONED_TABLES:
+            for name, month in sorted(self._partitions(db, table).items(), key=lambda p: p[1]):
+                if _add_months(month, 1) > cutoff:
+                    continue
+                if table == "workflow_runs" and db.execute(
+                    text(f"SELECT 1 FROM {name} WHERE is_pinned LIMIT 1")
+                ).first():
+                    logger.info(f"[PARTITIONS] Keeping {name}: holds pinned runs")
+                    continue
+                db.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+        return dropped
+
+    def maintain(self) -> Dict[str, List[str]]:
+        """Scheduled entry point: create upcoming partitions, drop expired ones."""
+        db = SessionLocal()
+        try:
+            if not db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}).scalar():
+                return {"created": [], "dropped": []}
+            created = self.ensure_partitions(db)
+            dropped = self.drop_expired(db)
+            db.commit()
+
+            for table in PARTITIONED_TABLES:
+                stray = db.execute(text(f"SELECT COUNT(*) FROM {table}_default")).scalar()
+                if stray:
+                    logger.warning(f"[WARNING] {stray} row(s) in {table}_default -- partitions were missing")
+
+            if created or dropped:
+                logger.info(f"[OK] Partitions: created {created or 'none'}, dropped {dropped or 'none'}")
+            return {"created": created, "dropped": dropped}
+        except Exception as e:
+            logger.error(f"[ERROR] Partition maintenance failed: {e}")
+            db.rollback()
+            return {"created": [], "dropped": []}
+        finally:
+            db.close()
+
+
+# Global singleton
+partition_manager = PartitionManager()
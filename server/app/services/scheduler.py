@@ -1,34 +1,87 @@
 # backend/app/services/scheduler.py
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from sqlalchemy import bindparam, update
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
 
 from ..core.database import SessionLocal
-from ..db.models import Trend
+from ..db.models import UserTrend, Video
 from ..services.collector import TikTokCollector
 from ..services.scorer import TrendScorer 
 
 scheduler = AsyncIOScheduler()
 
-async def rescan_videos_task(video_urls: list, batch_id: str):
+# Videos are shared across users: skip ones another user's batch rescanned recently
+RESCAN_DEDUP_WINDOW = timedelta(hours=1)
+
+def _mark_scanned(db: Session, user_id: int, video_ids: list) -> None:
+    """Point B reached for this user's copies only (other users' scans are independent)."""
+    if user_id is None or not video_ids:
+        return
+    db.query(UserTrend).filter(
+        UserTrend.user_id == user_id,
+        UserTrend.video_id.in_(video_ids)
+    ).update({UserTrend.last_scanned_at: datetime.utcnow()}, synchronize_session=False)
+
+def _set_scores(db: Session, user_id: int, scores: dict) -> None:
+    """UTS against this user's Point A goes on their own rows (one executemany)."""
+    if user_id is None or not scores:
+        return
+    user_trends = UserTrend.__table__
+    db.execute(
+        update(user_trends)
+        .where(user_trends.c.user_id == user_id, user_trends.c.video_id == bindparam("b_video_id"))
+        .values(uts_score=bindparam("b_uts_score")),
+        [{"b_video_id": video_id, "b_uts_score": score} for video_id, score in scores.items()]
+    )
+
+async def rescan_videos_task(video_urls: list, batch_id: str, user_id: int = None):
     print(f"[AUTO-RESCAN] Starting rescan task (Batch: {batch_id})")
     
     db = SessionLocal()
     scorer = TrendScorer() 
     
     try:
+        cutoff = datetime.utcnow() - RESCAN_DEDUP_WINDOW
+        fresh = db.query(Video.url, Video.id).filter(
+            Video.url.in_(video_urls),
+            Video.rescanned_at > cutoff
+        ).all()
+        # Shared stats are already fresh: only this user's scan state moves
+        _mark_scanned(db, user_id, [video_id for _, video_id in fresh])
+        fresh_urls = {url for url, _ in fresh}
+        video_urls = [u for u in video_urls if u not in fresh_urls]
+        if not video_urls:
+            db.commit()
+            print("Rescan: All videos were rescanned recently, skipping.")
+            return
+
+        videos_by_url = {
+            v.url: v for v in db.query(Video).filter(Video.url.in_(video_urls)).all()
+        }
+        # This user's Point A (when they first saw each video)
+        initial_stats = dict(
+            db.query(UserTrend.video_id, UserTrend.initial_stats).filter(
+                UserTrend.user_id == user_id,
+                UserTrend.video_id.in_([v.id for v in videos_by_url.values()])
+            ).all()
+        ) if user_id is not None else {}
+
         collector = TikTokCollector()
         # Собираем самые свежие данные (Точка Б)
         raw_items = collector.collect(video_urls, limit=len(video_urls), mode="urls")
         
         if not raw_items:
+            db.commit()
             print("Rescan: No new data for comparison.")
             return
 
+        scanned_ids = []
+        scores = {}
         for item in raw_items:
             url = item.get("postPage") or item.get("webVideoUrl") or item.get("url")
-            video = db.query(Trend).filter(Trend.url == url).first()
+            video = videos_by_url.get(url)
             
             if video:
                 stats = item.get("stats") or {}
@@ -43,12 +96,13 @@ async def rescan_videos_task(video_urls: list, batch_id: str):
                 }
 
                 # --- ✅ СВЕРКА: Новые данные vs Временные старые данные (Point A) ---
+                point_a = initial_stats.get(video.id)
                 history_data = {
-                    "play_count": video.initial_stats.get("playCount", 0) if video.initial_stats else fresh_views
+                    "play_count": point_a.get("playCount", 0) if point_a else fresh_views
                 }
 
                 # Пересчитываем балл UTS на базе динамики роста между Точкой А и Точкой Б
-                video.uts_score = scorer.calculate_uts(
+                scores[video.id] = scorer.calculate_uts(
                     video_data={
                         "views": fresh_views,
                         "author_followers": video.author_followers,
@@ -60,8 +114,11 @@ async def rescan_videos_task(video_urls: list, batch_id: str):
                 )
                 
                 video.stats = new_stats
-                video.last_scanned_at = datetime.utcnow()
-                
+                video.rescanned_at = datetime.utcnow()
+                scanned_ids.append(video.id)
+
+        _mark_scanned(db, user_id, scanned_ids)
+        _set_scores(db, user_id, scores)
         db.commit()
         print("[AUTO-RESCAN] Rescan complete. Stats and UTS scores updated.")
         
@@ -71,7 +128,56 @@ async def rescan_videos_task(video_urls: list, batch_id: str):
     finally:
         db.close()
 
+async def compact_credit_ledger_task():
+    """Daily: fold old credit ledger entries into one row per user (off the event loop)."""
+    from .credit_ledger import credit_ledger
+    await asyncio.to_thread(credit_ledger.compact)
+
+async def maintain_partitions_task():
+    """Daily (and at startup): create upcoming history partitions, drop expired ones."""
+    from .partitions import partition_manager
+    await asyncio.to_thread(partition_manager.maintain)
+
+async def evict_node_cache_task():
+    """Hourly: trim memoized workflow node outputs (age + LRU)."""
+    from .node_cache import node_cache
+    await asyncio.to_thread(node_cache.evict)
+
+async def sweep_video_assets_task():
+    """Every 10 min: delete cached workflow videos past VIDEO_ASSET_TTL_SECONDS."""
+    from .video_assets import video_assets
+    await asyncio.to_thread(video_assets.sweep)
+
 def start_scheduler():
     if not scheduler.running:
+        scheduler.add_job(
+            compact_credit_ledger_task,
+            'interval',
+            hours=24,
+            id='credit_ledger_compaction',
+            replace_existing=True
+        )
+        scheduler.add_job(
+            maintain_partitions_task,
+            'interval',
+            hours=24,
+            next_run_time=datetime.now(),
+            id='partition_maintenance',
+            replace_existing=True
+        )
+        scheduler.add_job(
+            evict_node_cache_task,
+            'interval',
+            hours=1,
+            id='node_cache_eviction',
+            replace_existing=True
+        )
+        scheduler.add_job(
+            sweep_video_assets_task,
+            'interval',
+            minutes=10,
+            id='video_asset_sweep',
+            replace_existing=True
+        )
         scheduler.start()
-        print("Background Scheduler started successfully.")
\ No newline at end of file
+        print("Background Scheduler started successfully.")
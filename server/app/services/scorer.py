@@ -1,5 +1,4 @@
 import math
-import numpy as np
 from datetime import datetime
 
 class TrendScorer:
@@ -105,4 +104,4 @@ class TrendScorer:
             "avg_viral_lift": round(avg_lift, 2),
             "efficiency_score": round(min(avg_lift * 2, 10), 1),
             "status": status
-        }
\ No newline at end of file
+        }
\ No newline at end of file
@@ -2,53 +2,72 @@
 Supabase Storage Service
 Handles image uploads (avatars, thumbnails) to Supabase Storage.
 Videos use direct URLs from TikTok/Instagram CDN (no storage needed).
+
+Objects are content-addressed ({folder}/{sha256 of bytes}.{ext}) and indexed by
+normalized source URL, so a cover is downloaded and uploaded once, not once per
+day or per signed URL variant. Thumbnails also get responsive WebP/AVIF variants
+({folder}/{sha256}_{width}.{ext}), returned to clients as a srcset map.
+
+Because one object can back many rows (users, trends, competitors), deletes
+only remove objects nothing else references (stored_image_index.unreferenced).
 """
 
 import os
 import logging
 import requests
-from typing import Optional, Tuple
-from io import BytesIO
-from supabase import create_client, Client
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from typing import TYPE_CHECKING, Dict, Optional, Sequence, Tuple
 import hashlib
-from dotenv import load_dotenv
-from PIL import Image
 
-# Load environment variables
-load_dotenv()
+from .apify_storage import ApifyStorage
+from .image_index import stored_image_index
+from .image_transcoder import image_transcoder, CONTENT_TYPES, THUMBNAIL_WIDTHS
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
-# Register HEIC/HEIF support for Pillow (TikTok CDN sometimes returns HEIC)
-try:
-    from pillow_heif import register_heif_opener
-    register_heif_opener()
-    logger.info("[OK] HEIC/HEIF support registered via pillow-heif")
-except ImportError:
-    logger.warning("[WARNING] pillow-heif not installed -- HEIC images won't be converted")
+# HEIC/HEIF decoding is registered in the transcoder worker processes (image_transcoder)
 
 # Initialize Supabase client lazily (don't crash at import if env vars missing)
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+_supabase_client: Optional["Client"] = None
 
-_supabase_client: Optional[Client] = None
-
-def _get_supabase() -> Optional[Client]:
-    """Lazy init Supabase client -- only connect when actually needed."""
+def _get_supabase() -> Optional["Client"]:
+    """Lazy init Supabase client -- only import the SDK and connect when actually needed."""
     global _supabase_client
     if _supabase_client is None:
-        url = SUPABASE_URL or os.getenv("SUPABASE_URL")
-        key = SUPABASE_KEY or os.getenv("SUPABASE_KEY")
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_KEY")
+        if not url or not key:
+            # Standalone scripts don't go through main.py's load_dotenv()
+            from dotenv import load_dotenv
+            load_dotenv()
+            url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
         if not url or not key:
             logger.warning("[WARNING] SUPABASE_URL or SUPABASE_KEY not set -- storage disabled")
             return None
+        from supabase import create_client
         _supabase_client = create_client(url, key)
     return _supabase_client
 
 # Storage bucket name
 IMAGES_BUCKET = "rizko-images"
 
+# Shared HTTP connection pool for CDN downloads (keep-alive across uploads)
+_http_session: Optional[requests.Session] = None
+
+def _get_http_session() -> requests.Session:
+    """Lazy init a pooled requests.Session shared by all download workers."""
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=32)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _http_session = session
+    return _http_session
+
 
 class SupabaseStorage:
     """Helper for uploading images to Supabase Storage"""
@@ -58,14 +77,23 @@ class SupabaseStorage:
     # Formats browsers support natively -- keep as-is
     SUPPORTED_FORMATS = {'image/jpeg', 'image/png', 'image/webp', 'image/gif', 'image/avif', 'image/svg+xml'}
 
+    # Object extension per stored content type
+    EXTENSIONS = {
+        'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp',
+        'image/gif': 'gif', 'image/avif': 'avif', 'image/svg+xml': 'svg'
+    }
+
     @staticmethod
-    def _generate_filename(url: str, prefix: str = "image") -> str:
-        """Generate unique filename from URL hash"""
-        url_hash = hashlib.md5(url.encode()).hexdigest()[:12]
-        timestamp = datetime.now().strftime("%Y%m%d")
-        extension = "jpg"  # Default to jpg, we'll convert images
+    def _url_key(url: str, prefix: str = "image") -> str:
+        """Index key for a source URL: hash of folder + URL without CDN signatures"""
+        normalized = ApifyStorage.fix_tiktok_url(url)
+        return hashlib.sha256(f"{prefix}:{normalized}".encode()).hexdigest()
 
-        return f"{prefix}/{timestamp}_{url_hash}.{extension}"
+    @staticmethod
+    def _generate_filename(content_hash: str, prefix: str = "image", content_type: str = "image/jpeg") -> str:
+        """Content-addressed object path: identical bytes always map to the same file"""
+        extension = SupabaseStorage.EXTENSIONS.get(content_type, "jpg")
+        return f"{prefix}/{content_hash}.{extension}"
 
     @staticmethod
     def _convert_to_jpeg(image_data: bytes, content_type: str) -> Tuple[bytes, str]:
@@ -79,18 +107,9 @@ class SupabaseStorage:
         if ct in SupabaseStorage.SUPPORTED_FORMATS:
             return image_data, ct
 
-        # Convert unsupported formats to JPEG via Pillow
+        # Convert unsupported formats to JPEG via Pillow (worker process pool)
         try:
-            img = Image.open(BytesIO(image_data))
-            # Convert RGBA/P modes to RGB (JPEG doesn't support alpha)
-            if img.mode in ('RGBA', 'P', 'LA'):
-                img = img.convert('RGB')
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-
-            output = BytesIO()
-            img.save(output, format='JPEG', quality=85, optimize=True)
-            converted = output.getvalue()
+            converted = image_transcoder.to_jpeg(image_data)
             logger.info(f"[REFRESH] Converted {ct} --> image/jpeg ({len(image_data)} --> {len(converted)} bytes)")
             return converted, 'image/jpeg'
         except Exception as e:
@@ -98,23 +117,82 @@ class SupabaseStorage:
             return image_data, ct
 
     @staticmethod
-    def upload_from_url(
+    def _upload_object(client: "Client", path: str, data: bytes, content_type: str) -> str:
+        """Upload one content-addressed object and return its public URL."""
+        client.storage.from_(IMAGES_BUCKET).upload(
+            path=path,
+            file=data,
+            file_options={
+                "content-type": content_type,
+                "cache-control": "31536000",  # Content-addressed -> immutable
+                "upsert": "true"  # Concurrent uploads of the same bytes write the same file
+            }
+        )
+        return client.storage.from_(IMAGES_BUCKET).get_public_url(path)
+
+    @staticmethod
+    def _upload_variants(
+        client: "Client",
+        image_bytes: bytes,
+        content_hash: str,
+        folder: str,
+        widths: Sequence[int]
+    ) -> Dict[str, Dict[str, str]]:
+        """
+        Transcode responsive sizes in the worker pool and upload them next to the original.
+
+        Returns:
+            srcset map {format: {width: public_url}}, empty if transcoding failed
+        """
+        try:
+            rendered = image_transcoder.variants(image_bytes, widths)
+        except Exception as e:
+            logger.warning(f"[WARNING] Thumbnail transcoding failed: {e} -- original only")
+            return {}
+
+        srcset: Dict[str, Dict[str, str]] = {}
+        for fmt, by_width in rendered.items():
+            content_type = CONTENT_TYPES[fmt]
+            extension = SupabaseStorage.EXTENSIONS[content_type]
+            for width, data in by_width.items():
+                path = f"{folder}/{content_hash}_{width}.{extension}"
+                try:
+                    public_url = SupabaseStorage._upload_object(client, path, data, content_type)
+                except Exception as e:
+                    logger.warning(f"[WARNING] Failed to upload variant {path}: {e}")
+                    continue
+                srcset.setdefault(fmt, {})[str(width)] = public_url
+        return srcset
+
+    @staticmethod
+    def upload_image(
         image_url: str,
         folder: str = "avatars",
-        max_size_mb: int = 5
-    ) -> Optional[str]:
+        max_size_mb: int = 5,
+        variant_widths: Sequence[int] = ()
+    ) -> Optional[Tuple[str, Dict[str, Dict[str, str]]]]:
         """
         Download image from URL and upload to Supabase Storage.
         Automatically converts HEIC/HEIF/TIFF to JPEG for browser compatibility.
 
+        Skips work for images that are already stored:
+        - Same normalized URL: returned from the index without downloading
+        - Same bytes under a new URL: existing object reused without uploading
+
         Args:
             image_url: URL of the image to download
             folder: Folder in bucket (avatars, thumbnails, etc)
             max_size_mb: Maximum file size in MB
+            variant_widths: Also store resized WebP/AVIF variants at these widths
 
         Returns:
-            Public URL of uploaded image, or None if failed
+            (public_url, srcset) of the stored image, or None if failed
         """
+        url_key = SupabaseStorage._url_key(image_url, folder)
+        stored = stored_image_index.lookup_url(url_key)
+        if stored:
+            return stored
+
         try:
             # Download image with proper headers to avoid 403
             headers = {
@@ -122,7 +200,7 @@ class SupabaseStorage:
                 'Referer': 'https://www.tiktok.com/',
                 'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8'
             }
-            response = requests.get(image_url, timeout=10, stream=True, headers=headers)
+            response = _get_http_session().get(image_url, timeout=10, stream=True, headers=headers)
             response.raise_for_status()
 
             # Check content length
@@ -137,8 +215,19 @@ class SupabaseStorage:
                 response.content, raw_content_type
             )
 
+            # Same bytes already stored under another URL -- just index it
+            content_hash = hashlib.sha256(image_bytes).hexdigest()
+            existing = stored_image_index.lookup_content(content_hash, folder)
+            if existing:
+                path, public_url, srcset = existing
+                stored_image_index.record(
+                    url_key, content_hash, path, public_url,
+                    final_content_type, len(image_bytes), srcset, uploaded=False
+                )
+                return public_url, srcset
+
             # Generate filename
-            filename = SupabaseStorage._generate_filename(image_url, folder)
+            filename = SupabaseStorage._generate_filename(content_hash, folder, final_content_type)
 
             client = _get_supabase()
             if not client:
@@ -146,21 +235,21 @@ class SupabaseStorage:
                 return None
 
             # Upload to Supabase Storage
-            result = client.storage.from_(IMAGES_BUCKET).upload(
-                path=filename,
-                file=image_bytes,
-                file_options={
-                    "content-type": final_content_type,
-                    "cache-control": "3600",
-                    "upsert": "true"  # Overwrite if exists
-                }
-            )
+            public_url = SupabaseStorage._upload_object(client, filename, image_bytes, final_content_type)
 
-            # Get public URL
-            public_url = client.storage.from_(IMAGES_BUCKET).get_public_url(filename)
+            srcset = {}
+            if variant_widths:
+                srcset = SupabaseStorage._upload_variants(
+                    client, image_bytes, content_hash, folder, variant_widths
+                )
 
-            logger.info(f"[OK] Uploaded image to Supabase: {filename} ({final_content_type})")
-            return public_url
+            stored_image_index.record(
+                url_key, content_hash, filename, public_url,
+                final_content_type, len(image_bytes), srcset
+            )
+
+            logger.info(f"[OK] Uploaded image to Supabase: {filename} ({final_content_type}, {sum(len(v) for v in srcset.values())} variants)")
+            return public_url, srcset
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to download image from {image_url}: {e}")
@@ -169,24 +258,48 @@ class SupabaseStorage:
             logger.error(f"Failed to upload image to Supabase: {e}")
             return None
 
+    @staticmethod
+    def upload_from_url(
+        image_url: str,
+        folder: str = "avatars",
+        max_size_mb: int = 5
+    ) -> Optional[str]:
+        """Download image from URL and upload to Supabase Storage. Returns public URL or None."""
+        stored = SupabaseStorage.upload_image(image_url, folder, max_size_mb)
+        return stored[0] if stored else None
+
     @staticmethod
     def upload_avatar(avatar_url: str) -> Optional[str]:
         """Upload user/competitor avatar to Supabase"""
         return SupabaseStorage.upload_from_url(avatar_url, folder="avatars")
 
     @staticmethod
-    def upload_thumbnail(thumbnail_url: str) -> Optional[str]:
-        """Upload video thumbnail to Supabase"""
-        return SupabaseStorage.upload_from_url(thumbnail_url, folder="thumbnails")
+    def upload_thumbnail(thumbnail_url: str) -> Optional[Tuple[str, Dict[str, Dict[str, str]]]]:
+        """Upload video thumbnail + responsive variants to Supabase. Returns (public_url, srcset) or None."""
+        return SupabaseStorage.upload_image(
+            thumbnail_url, folder="thumbnails", variant_widths=THUMBNAIL_WIDTHS
+        )
+
+    @staticmethod
+    def _remove_variants(client: "Client", paths: Sequence[str]) -> None:
+        """Forget deleted objects in the index and remove their responsive variants."""
+        variant_urls = stored_image_index.forget_paths(paths)
+        variant_paths = [p for p in map(SupabaseStorage.extract_path_from_url, variant_urls) if p]
+        if variant_paths:
+            client.storage.from_(IMAGES_BUCKET).remove(variant_paths)
 
     @staticmethod
     def delete_image(file_path: str) -> bool:
-        """Delete image from Supabase Storage"""
+        """Delete image from Supabase Storage (kept if another row still references it)"""
         try:
             client = _get_supabase()
             if not client:
                 return False
+            if not stored_image_index.unreferenced([file_path]):
+                logger.info(f"[DELETE] Kept shared image still in use: {file_path}")
+                return False
             client.storage.from_(IMAGES_BUCKET).remove([file_path])
+            SupabaseStorage._remove_variants(client, [file_path])
             logger.info(f"[DELETE] Deleted image from Supabase: {file_path}")
             return True
         except Exception as e:
@@ -197,22 +310,25 @@ class SupabaseStorage:
     def extract_path_from_url(public_url: str) -> Optional[str]:
         """
         Extract storage path from Supabase public URL.
-        Example: https://xxx.supabase.co/storage/v1/object/public/rizko-images/thumbnails/20260210_abc123.jpg
-        Returns: thumbnails/20260210_abc123.jpg
+        Example: https://xxx.supabase.co/storage/v1/object/public/rizko-images/thumbnails/3f2a...9c.jpg
+        Returns: thumbnails/3f2a...9c.jpg
         """
         if not public_url or "supabase" not in public_url:
             return None
         try:
             marker = f"{IMAGES_BUCKET}/"
             idx = public_url.index(marker)
-            return public_url[idx + len(marker):]
+            # Signed/transformed variants carry a query string; the object path doesn't
+            return public_url[idx + len(marker):].split("?", 1)[0].split("#", 1)[0] or None
         except (ValueError, IndexError):
             return None
 
     @staticmethod
-    def cleanup_competitor(avatar_url: str, recent_videos: list) -> int:
+    def cleanup_competitor(avatar_url: str, recent_videos: list, competitor_id: Optional[int] = None) -> int:
         """
-        Delete all Supabase images for a competitor (avatar + video thumbnails).
+        Delete Supabase images for a competitor (avatar + video thumbnails).
+        Objects other rows still reference (same image stored for another user,
+        trend or competitor) are kept.
         Returns count of deleted files.
         """
         deleted = 0
@@ -238,7 +354,15 @@ class SupabaseStorage:
             client = _get_supabase()
             if not client:
                 return 0
+            shared = len(paths_to_delete)
+            paths_to_delete = stored_image_index.unreferenced(paths_to_delete, exclude_competitor_id=competitor_id)
+            shared -= len(paths_to_delete)
+            if shared:
+                logger.info(f"[DELETE] Kept {shared} shared images still in use")
+            if not paths_to_delete:
+                return 0
             client.storage.from_(IMAGES_BUCKET).remove(paths_to_delete)
+            SupabaseStorage._remove_variants(client, paths_to_delete)
             deleted = len(paths_to_delete)
             logger.info(f"[DELETE] Cleaned up {deleted} images from Supabase Storage")
         except Exception as e:
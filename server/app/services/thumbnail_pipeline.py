@@ -0,0 +1,208 @@
+"""
+Thumbnail Ingestion Pipeline
+Uploads video covers to Supabase Storage in the background instead of on the request path.
+
+Flow:
+1. Search endpoints call submit() and immediately get a fix_tiktok_url() URL back
+2. A bounded worker pool downloads the signed CDN cover and uploads it to Supabase
+3. When the upload finishes, catalog videos still pointing at the temporary URL are
+   swapped to the permanent Supabase URL and its responsive srcset
+
+Jobs are deduplicated by a hash of the normalized (unsigned) URL, so the same cover
+requested by several searches at once is only downloaded and uploaded once.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from ..core.database import SessionLocal
+from ..db.models import Trend, Video
+from .apify_storage import ApifyStorage
+from .storage import SupabaseStorage
+
+logger = logging.getLogger(__name__)
+
+# Concurrent uploads (each worker holds one pooled HTTP connection)
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "8"))
+# Jobs waiting or running before new covers are skipped (fallback URL is kept)
+THUMBNAIL_MAX_PENDING = int(os.getenv("THUMBNAIL_MAX_PENDING", "500"))
+# Remembered permanent URLs (normalized URL hash -> (Supabase URL, srcset))
+RESOLVED_CACHE_SIZE = 5000
+
+
+def _url_key(normalized_url: str) -> str:
+    """Dedup key for a cover: hash of the URL without TikTok signatures."""
+    return hashlib.sha1(normalized_url.encode()).hexdigest()
+
+
+class ThumbnailPipeline:
+    """
+    Background thumbnail uploader with bounded concurrency and URL-hash dedup.
+
+    Thread-safe: submit() is called from FastAPI's threadpool (sync endpoints).
+    """
+
+    def __init__(self, max_workers: int = THUMBNAIL_WORKERS, max_pending: int = THUMBNAIL_MAX_PENDING):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._resolved: OrderedDict = OrderedDict()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Lazy init worker pool -- no threads until the first thumbnail."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="thumbnail"
+            )
+        return self._executor
+
+    def _lookup(self, url: str) -> Optional[Tuple[str, dict]]:
+        """(permanent URL, srcset) for a cover whose upload has finished."""
+        key = _url_key(ApifyStorage.fix_tiktok_url(url))
+        with self._lock:
+            stored = self._resolved.get(key)
+            if stored:
+                self._resolved.move_to_end(key)
+        return stored
+
+    def resolve(self, url: str) -> str:
+        """
+        Return the permanent Supabase URL for a cover if its upload has finished,
+        otherwise the URL unchanged.
+        """
+        if not url:
+            return url
+        stored = self._lookup(url)
+        return stored[0] if stored else url
+
+    def srcset(self, url: str) -> Optional[dict]:
+        """Responsive variants {format: {width: url}} for a finished cover, else None."""
+        if not url:
+            return None
+        stored = self._lookup(url)
+        return (stored[1] or None) if stored else None
+
+    def submit(self, cover_url: str, platform_id: Optional[str] = None) -> str:
+        """
+        Schedule a cover upload and return a URL usable right now.
+
+        Args:
+            cover_url: Original (signed) CDN URL -- the signature is needed to download
+            platform_id: Video ID, narrows the DB swap to that video's rows
+
+        Returns:
+            Permanent URL if already uploaded, otherwise fix_tiktok_url(cover_url)
+        """
+        if not cover_url:
+            return cover_url
+
+        temp_url = ApifyStorage.fix_tiktok_url(cover_url)
+        key = _url_key(temp_url)
+
+        with self._lock:
+            stored = self._resolved.get(key)
+            if stored:
+                self._resolved.move_to_end(key)
+                return stored[0]
+
+            if key in self._in_flight:
+                return temp_url
+
+            if len(self._in_flight) >= self._max_pending:
+                logger.warning(f"[WARNING] Thumbnail queue full ({self._max_pending}), keeping fallback URL")
+                return temp_url
+
+            future = self._get_executor().submit(self._ingest, key, cover_url, temp_url, platform_id)
+            self._in_flight[key] = future
+
+        return temp_url
+
+    def apply_resolved(self, db: Session, trends: Iterable[Trend]) -> int:
+        """
+        Swap finished uploads into trends that were persisted after the upload completed.
+        Call after committing new trends -- covers the window before the rows existed.
+        """
+        swapped = 0
+        for trend in trends:
+            if not trend.cover_url:
+                continue
+            stored = self._lookup(trend.cover_url)
+            if stored and stored[0] != trend.cover_url:
+                trend.cover_url = stored[0]
+                trend.cover_srcset = stored[1] or None
+                swapped += 1
+        if swapped:
+            try:
+                db.commit()
+            except Exception as e:
+                logger.warning(f"[WARNING] Failed to apply resolved thumbnails: {e}")
+                db.rollback()
+        return swapped
+
+    def _ingest(self, key: str, cover_url: str, temp_url: str, platform_id: Optional[str]) -> Optional[str]:
+        """Worker: upload one cover and swap it into the DB."""
+        try:
+            stored = SupabaseStorage.upload_thumbnail(cover_url)
+            if not stored:
+                return None
+            permanent, srcset = stored
+
+            # Remember before touching the DB so apply_resolved() never misses it
+            with self._lock:
+                self._resolved[key] = (permanent, srcset)
+                self._resolved.move_to_end(key)
+                while len(self._resolved) > RESOLVED_CACHE_SIZE:
+                    self._resolved.popitem(last=False)
+
+            self._swap_in_db(temp_url, permanent, srcset, platform_id)
+            return permanent
+        except Exception as e:
+            logger.error(f"[ERROR] Thumbnail ingestion failed for {temp_url[:80]}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    @staticmethod
+    def _swap_in_db(temp_url: str, permanent_url: str, srcset: dict, platform_id: Optional[str]) -> None:
+        """Replace the temporary cover URL with the permanent one (+ srcset) in the video catalog."""
+        db = SessionLocal()
+        try:
+            stmt = update(Video).where(Video.cover_url == temp_url)
+            if platform_id:
+                stmt = stmt.where(Video.platform_id == platform_id)
+            result = db.execute(stmt.values(cover_url=permanent_url, cover_srcset=srcset or None))
+            db.commit()
+            if result.rowcount:
+                logger.info(f"[OK] Swapped permanent thumbnail into {result.rowcount} video(s)")
+        except Exception as e:
+            logger.warning(f"[WARNING] Thumbnail DB swap failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def pending_count(self) -> int:
+        """Number of uploads waiting or running."""
+        with self._lock:
+            return len(self._in_flight)
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the worker pool (called on app shutdown)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+
+# Global singleton
+thumbnail_pipeline = ThumbnailPipeline()
@@ -0,0 +1,119 @@
+"""
+Bulk Trend persistence.
+
+Writes whole batches of trends with one INSERT ... ON CONFLICT ... RETURNING
+per table instead of one SELECT + ORM flush per video:
+1. videos (shared catalog) on platform_id
+2. user_trends (per-user association) on (user_id, video_id)
+
+Trend is mapped over the join of both tables (see models.Trend). Update
+columns are routed to the table that owns them: stats refresh the shared
+video, scan state (initial_stats, last_scanned_at, is_deep_scan) and uts_score
+only the user's own row.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from ..db.models import Trend, UserTrend, Video
+
+logger = logging.getLogger(__name__)
+
+# Columns refreshed on rescan when the video/user row already exists
+DEFAULT_UPDATE_COLUMNS = ("stats", "initial_stats", "uts_score", "last_scanned_at", "is_deep_scan")
+
+# Trigger-maintained columns (typed stats from videos.stats, cover_path from cover_url; never written directly)
+DERIVED_COLUMNS = {
+    "play_count", "digg_count", "comment_count", "share_count", "collect_count", "engagement_rate",
+    "video_play_count", "video_engagement_rate", "cover_path",
+}
+
+VIDEO_COLUMNS = {c.name for c in Video.__table__.columns} - {"id", "created_at", "updated_at"} - DERIVED_COLUMNS
+USER_TREND_COLUMNS = {c.name for c in UserTrend.__table__.columns} - {"id", "video_id", "created_at"} - DERIVED_COLUMNS
+
+
+def get_initial_stats(db: Session, user_id: int, platform_ids: Iterable[str]) -> Dict[str, dict]:
+    """
+    Fetch Point A stats for videos the user already has, in one query.
+
+    Returns:
+        {platform_id: initial_stats}
+    """
+    ids = list({p for p in platform_ids if p})
+    if not ids:
+        return {}
+    rows = db.execute(
+        select(Trend.platform_id, Trend.initial_stats).where(
+            Trend.user_id == user_id,
+            Trend.platform_id.in_(ids)
+        )
+    ).all()
+    return {platform_id: initial_stats or {} for platform_id, initial_stats in rows}
+
+
+def bulk_upsert_trends(
+    db: Session,
+    rows: Sequence[dict],
+    update_columns: Sequence[str] = DEFAULT_UPDATE_COLUMNS
+) -> List[Trend]:
+    """
+    Insert or update a batch of trends: one statement per table.
+
+    Args:
+        db: Database session (caller commits)
+        rows: Flat Trend column dicts, each with user_id and platform_id
+        update_columns: Columns overwritten when the video / user row already exists
+
+    Returns:
+        Persisted Trend objects (with ids), in input order
+    """
+    if not rows:
+        return []
+
+    # ON CONFLICT DO UPDATE can't touch the same row twice in one statement
+    unique_rows: Dict[tuple, dict] = {}
+    for row in rows:
+        unique_rows[(row["user_id"], row["platform_id"])] = row
+
+    # 1. Shared catalog rows
+    video_values: Dict[str, dict] = {}
+    for row in unique_rows.values():
+        video_values[row["platform_id"]] = {k: v for k, v in row.items() if k in VIDEO_COLUMNS}
+
+    video_stmt = pg_insert(Video).values(list(video_values.values()))
+    video_updates = {col: video_stmt.excluded[col] for col in update_columns if col in VIDEO_COLUMNS}
+    # DO UPDATE (not DO NOTHING) so RETURNING includes already-existing videos
+    video_updates["updated_at"] = video_stmt.excluded.updated_at
+    video_stmt = video_stmt.on_conflict_do_update(
+        index_elements=[Video.platform_id],
+        set_=video_updates
+    ).returning(Video.id, Video.platform_id)
+    video_ids = {platform_id: video_id for video_id, platform_id in db.execute(video_stmt)}
+
+    # 2. Per-user association rows
+    user_values = []
+    for row in unique_rows.values():
+        values = {k: v for k, v in row.items() if k in USER_TREND_COLUMNS}
+        values["video_id"] = video_ids[row["platform_id"]]
+        user_values.append(values)
+
+    user_stmt = pg_insert(UserTrend).values(user_values)
+    user_updates = {col: user_stmt.excluded[col] for col in update_columns if col in USER_TREND_COLUMNS}
+    user_updates["user_id"] = user_stmt.excluded.user_id
+    user_stmt = user_stmt.on_conflict_do_update(
+        index_elements=[UserTrend.user_id, UserTrend.video_id],
+        set_=user_updates
+    ).returning(UserTrend.id)
+    trend_ids = [trend_id for (trend_id,) in db.execute(user_stmt)]
+
+    trends = db.query(Trend).filter(Trend.id.in_(trend_ids)).populate_existing().all()
+
+    order = {key: i for i, key in enumerate(unique_rows)}
+    trends.sort(key=lambda t: order.get((t.user_id, t.platform_id), 0))
+
+    logger.info(f"[DB] Upserted {len(trends)} trends ({len(video_ids)} catalog videos)")
+    return trends
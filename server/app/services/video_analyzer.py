@@ -8,7 +8,13 @@ import tempfile
 import logging
 import time
 from pathlib import Path
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
+
+from .node_cache import mark_uncacheable
+from .llm_gateway import llm_gateway
+
+if TYPE_CHECKING:
+    from .video_assets import VideoAssetScope
 
 logger = logging.getLogger(__name__)
 
@@ -84,14 +90,10 @@ def upload_to_gemini(file_path: str) -> Optional[object]:
     Upload a video file to Gemini Files API.
     Returns the file object for use in generate_content.
     """
-    from google import genai
-
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    client = llm_gateway.client("gemini")
+    if client is None:
         raise Exception("GEMINI_API_KEY not set")
 
-    client = genai.Client(api_key=api_key)
-
     try:
         file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
         logger.info(f"[VIDEO] Uploading to Gemini: {file_path} ({file_size_mb:.1f}MB)")
@@ -127,17 +129,18 @@ def analyze_video_with_gemini(
     video_metadata: dict = None,
     custom_prompt: str = None,
     local_path: str = None,
+    assets: Optional["VideoAssetScope"] = None,
 ) -> str:
     """
     Full pipeline: download video -> upload to Gemini -> analyze.
     If local_path is provided, skip download and use the local file directly.
+    If assets (a workflow run's VideoAssetScope) is provided, the video is
+    downloaded/uploaded once per run and cleaned up when the run ends.
 
     Returns detailed AI analysis of the actual video content.
     """
-    from google import genai
-
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    if not llm_gateway.available("gemini"):
+        mark_uncacheable()
         return "GEMINI_API_KEY not configured"
 
     file_path = None
@@ -145,8 +148,14 @@ def analyze_video_with_gemini(
     uploaded_file = None
 
     try:
+        # Steps 1-2 shared with the other nodes of the run
+        if assets is not None:
+            uploaded_file = assets.gemini_file(video_url, local_path)
+            if not uploaded_file:
+                return _fallback_text_analysis(video_metadata, custom_prompt)
+
         # Step 1: Use local file or download from URL
-        if local_path and os.path.exists(local_path):
+        elif local_path and os.path.exists(local_path):
             file_path = local_path
             is_local_upload = True
             logger.info(f"[VIDEO] Using local file: {file_path}")
@@ -156,9 +165,10 @@ def analyze_video_with_gemini(
                 return _fallback_text_analysis(video_metadata, custom_prompt)
 
         # Step 2: Upload to Gemini
-        uploaded_file = upload_to_gemini(file_path)
-        if not uploaded_file:
-            return _fallback_text_analysis(video_metadata, custom_prompt)
+        if assets is None:
+            uploaded_file = upload_to_gemini(file_path)
+            if not uploaded_file:
+                return _fallback_text_analysis(video_metadata, custom_prompt)
 
         # Step 3: Build analysis prompt
         meta_context = ""
@@ -217,12 +227,16 @@ Analyze this video in detail and provide:
 Be specific about what you ACTUALLY SEE and HEAR in the video. Reference exact moments and timestamps when possible."""
 
         # Step 4: Generate analysis with Gemini
-        client = genai.Client(api_key=api_key)
         logger.info("[VIDEO] Analyzing with Gemini...")
 
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[uploaded_file, analysis_prompt],
+        response = llm_gateway.call(
+            "gemini",
+            lambda client: client.models.generate_content(
+                model="gemini-2.0-flash",
+                contents=[uploaded_file, analysis_prompt],
+            ),
+            "gemini-2.0-flash",
+            analysis_prompt
         )
 
         result = response.text.strip() if response.text else "No analysis generated"
@@ -242,18 +256,23 @@ Be specific about what you ACTUALLY SEE and HEAR in the video. Reference exact m
             except Exception:
                 pass
 
-        # Cleanup: delete from Gemini Files
-        if uploaded_file:
-            try:
-                client = genai.Client(api_key=api_key)
-                client.files.delete(name=uploaded_file.name)
-                logger.info(f"[VIDEO] Deleted from Gemini: {uploaded_file.name}")
-            except Exception:
-                pass
+        # Cleanup: delete from Gemini Files (run assets are released by their scope)
+        if uploaded_file and assets is None:
+            delete_from_gemini(uploaded_file)
+
+
+def delete_from_gemini(uploaded_file: object) -> None:
+    """Delete an uploaded file from Gemini Files (best effort)."""
+    try:
+        llm_gateway.client("gemini").files.delete(name=uploaded_file.name)
+        logger.info(f"[VIDEO] Deleted from Gemini: {uploaded_file.name}")
+    except Exception:
+        pass
 
 
 def _fallback_text_analysis(metadata: dict = None, custom_prompt: str = None) -> str:
     """Fallback when video download/upload fails -- analyze from metadata only."""
+    mark_uncacheable()  # Metadata-only result: retry the real analysis next run
     if not metadata:
         return "Could not download video and no metadata available."
 
@@ -0,0 +1,205 @@
+"""
+Video Asset Manager
+Downloads a video and uploads it to Gemini Files once per workflow run, then
+hands the same file handle to every node that analyzes it (video input node
+and the analyze/extract/style nodes downstream of it).
+
+- A run opens a VideoAssetScope (context manager). The first node that needs a
+  video downloads + uploads it; concurrent nodes wait for that upload instead
+  of starting their own (single-flight per video). A failed download is
+  remembered for the rest of the run, so it isn't retried by every node.
+- Assets are shared between overlapping runs and released when the last
+  run using them closes its scope: the downloaded file is deleted (user
+  uploads are kept) and the Gemini file is deleted.
+- VIDEO_ASSET_TTL_SECONDS > 0 keeps released assets for reuse by later runs
+  (e.g. reruns of the same workflow) until the TTL expires. Gemini deletes
+  uploaded files after 48h, so the TTL is capped below that. sweep() runs on
+  every release and from the scheduler.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .video_analyzer import download_video, upload_to_gemini, delete_from_gemini
+
+logger = logging.getLogger(__name__)
+
+# Gemini Files expire after 48h; stay well inside that
+_MAX_TTL_SECONDS = 40 * 3600
+VIDEO_ASSET_TTL_SECONDS = min(int(os.getenv("VIDEO_ASSET_TTL_SECONDS", "0")), _MAX_TTL_SECONDS)
+
+
+class VideoAsset:
+    """A video on local disk and in Gemini Files."""
+
+    __slots__ = ("key", "file_path", "is_local_upload", "gemini_file", "users", "expires_at")
+
+    def __init__(self, key: str, file_path: str, is_local_upload: bool, gemini_file: object):
+        self.key = key
+        self.file_path = file_path
+        self.is_local_upload = is_local_upload
+        self.gemini_file = gemini_file
+        self.users = 0  # Open scopes holding this asset
+        self.expires_at = 0.0  # Monotonic; only meaningful once users == 0
+
+
+class _KeyLock:
+    """Single-flight lock for one video, counted so it's dropped only when unused."""
+
+    __slots__ = ("lock", "holders")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.holders = 0  # acquire() calls holding or waiting for the lock
+
+
+class VideoAssetManager:
+    """Process-wide registry of uploaded videos, shared by workflow runs."""
+
+    def __init__(self, ttl_seconds: int = VIDEO_ASSET_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._assets: Dict[str, VideoAsset] = {}
+        self._key_locks: Dict[str, _KeyLock] = {}
+
+    def run_scope(self) -> "VideoAssetScope":
+        return VideoAssetScope(self)
+
+    @contextmanager
+    def _key_lock(self, key: str) -> Iterator[None]:
+        """
+        Hold the video's single-flight lock. The entry lives as long as anyone
+        holds or waits for it: dropping it earlier would hand a later caller a
+        fresh lock and a second, parallel download of the same video.
+        """
+        with self._lock:
+            entry = self._key_locks.get(key)
+            if entry is None:
+                entry = self._key_locks[key] = _KeyLock()
+            entry.holders += 1
+        try:
+            with entry.lock:
+                yield
+        finally:
+            with self._lock:
+                entry.holders -= 1
+                if entry.holders == 0:
+                    del self._key_locks[key]
+
+    def acquire(self, video_url: str = "", local_path: Optional[str] = None) -> Optional[VideoAsset]:
+        """Asset for a video (downloading/uploading it if needed), None on failure. Caller must release()."""
+        key = local_path or video_url
+        if not key:
+            return None
+
+        with self._key_lock(key):
+            with self._lock:
+                asset = self._assets.get(key)
+                if asset is not None:
+                    asset.users += 1
+                    logger.info(f"[VIDEO] Reusing uploaded asset: {asset.gemini_file.name}")
+                    return asset
+
+            if local_path and os.path.exists(local_path):
+                file_path, is_local_upload = local_path, True
+            else:
+                file_path, is_local_upload = download_video(video_url), False
+                if not file_path:
+                    return None
+
+            try:
+                gemini_file = upload_to_gemini(file_path)
+            except Exception as e:
+                logger.error(f"[VIDEO] Upload to Gemini failed: {e}")
+                gemini_file = None
+            if not gemini_file:
+                _remove_download(file_path, is_local_upload)
+                return None
+
+            asset = VideoAsset(key, file_path, is_local_upload, gemini_file)
+            asset.users = 1
+            with self._lock:
+                self._assets[key] = asset
+            return asset
+
+    def release(self, asset: VideoAsset) -> None:
+        with self._lock:
+            asset.users -= 1
+            if asset.users <= 0:
+                asset.expires_at = time.monotonic() + self.ttl_seconds
+        self.sweep()
+
+    def sweep(self) -> int:
+        """Delete unused assets whose TTL has passed (immediately when TTL is 0)."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                a for a in self._assets.values()
+                if a.users <= 0 and a.expires_at <= now
+            ]
+            for asset in expired:
+                del self._assets[asset.key]
+        for asset in expired:
+            _remove_download(asset.file_path, asset.is_local_upload)
+            delete_from_gemini(asset.gemini_file)
+        return len(expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "assets": len(self._assets),
+                "in_use": sum(1 for a in self._assets.values() if a.users > 0),
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+class VideoAssetScope:
+    """Videos used by one workflow run; released when the run ends."""
+
+    def __init__(self, manager: VideoAssetManager):
+        self._manager = manager
+        self._lock = threading.Lock()
+        self._held: Dict[str, Optional[VideoAsset]] = {}  # None = failed this run
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def gemini_file(self, video_url: str = "", local_path: Optional[str] = None) -> Optional[object]:
+        """Gemini file handle for a video, uploaded at most once per run."""
+        key = local_path or video_url
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._held:
+                self._held[key] = self._manager.acquire(video_url, local_path)
+            asset = self._held[key]
+        return asset.gemini_file if asset else None
+
+    def close(self) -> None:
+        with self._lock:
+            held, self._held = self._held, {}
+        for asset in held.values():
+            if asset is not None:
+                self._manager.release(asset)
+
+    def __enter__(self) -> "VideoAssetScope":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _remove_download(file_path: Optional[str], is_local_upload: bool) -> None:
+    """Remove a downloaded file (never user uploads)."""
+    if file_path and not is_local_upload and os.path.exists(file_path):
+        try:
+            os.remove(file_path)
+            logger.info(f"[VIDEO] Cleaned up: {file_path}")
+        except Exception:
+            pass
+
+
+# Global singleton
+video_assets = VideoAssetManager()
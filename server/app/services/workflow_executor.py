@@ -0,0 +1,254 @@
+"""
+Workflow DAG Executor
+Runs workflow nodes concurrently as soon as all of their upstream nodes are done,
+so independent branches (e.g. analyze + extract off one video) overlap and a
+run takes about as long as its critical path instead of the sum of all nodes.
+
+- Node work is blocking (sync LLM SDKs, video download/upload), so each node
+  runs in a worker thread of a shared pool (WORKFLOW_MAX_PARALLEL_NODES).
+- Calls per provider are capped process-wide (PROVIDER_CONCURRENCY), so one
+  wide graph can't take every thread or hit a provider's rate limit at once.
+- Cycles are rejected up front with WorkflowCycleError naming the nodes
+  involved, instead of silently skipping them.
+- A failed node doesn't stop the run: downstream nodes still run with the
+  outputs that are available (same as the old sequential loop).
+- Progress (node started/finished, streamed token deltas) is reported on the
+  event loop thread through optional callbacks; node code publishes deltas
+  via current_delta_sink().
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Worker threads shared by all runs in this process
+WORKFLOW_MAX_PARALLEL_NODES = int(os.getenv("WORKFLOW_MAX_PARALLEL_NODES", "16"))
+
+# Concurrent calls per provider across all runs in this process
+PROVIDER_CONCURRENCY: Dict[str, int] = {
+    "gemini": int(os.getenv("WORKFLOW_GEMINI_CONCURRENCY", "8")),
+    "claude": int(os.getenv("WORKFLOW_CLAUDE_CONCURRENCY", "4")),
+    "gpt4": int(os.getenv("WORKFLOW_GPT4_CONCURRENCY", "4")),
+}
+
+
+# Per worker thread: where the running node's token deltas go (None = not streaming)
+_node_context = threading.local()
+
+
+def current_delta_sink() -> Optional[Callable[[str], None]]:
+    """Callback for streamed output of the node running in this thread, None if nobody listens."""
+    return getattr(_node_context, "sink", None)
+
+
+class WorkflowCycleError(ValueError):
+    """The workflow graph has a cycle; node_ids are the nodes that can never run."""
+
+    def __init__(self, node_ids: List[int]):
+        self.node_ids = node_ids
+        super().__init__(f"Workflow has a cycle through nodes {node_ids}")
+
+
+@dataclass
+class NodeOutcome:
+    """Output (or error) of one node."""
+    node_id: int
+    output: Any = None
+    error: Optional[BaseException] = None
+    elapsed_ms: int = 0
+    cached: bool = False  # Output came from lookup(), run_node wasn't called
+    resumed: bool = False  # Finished in an earlier attempt (passed in as completed)
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+def execution_levels(node_ids: Iterable[int], edges: Iterable[Tuple[int, int]]) -> List[List[int]]:
+    """
+    Group nodes into levels: every node's upstream nodes are in earlier levels.
+    Edges to or from unknown nodes are ignored.
+
+    Raises:
+        WorkflowCycleError
+    """
+    node_ids = list(dict.fromkeys(node_ids))
+    known = set(node_ids)
+    in_degree = {nid: 0 for nid in node_ids}
+    adj: Dict[int, List[int]] = {nid: [] for nid in node_ids}
+    for src, dst in edges:
+        if src in known and dst in known:
+            adj[src].append(dst)
+            in_degree[dst] += 1
+
+    levels = []
+    ready = deque(nid for nid in node_ids if in_degree[nid] == 0)
+    while ready:
+        level = list(ready)
+        ready.clear()
+        levels.append(level)
+        for nid in level:
+            for neighbor in adj[nid]:
+                in_degree[neighbor] -= 1
+                if in_degree[neighbor] == 0:
+                    ready.append(neighbor)
+
+    placed = sum(len(level) for level in levels)
+    if placed < len(node_ids):
+        raise WorkflowCycleError([nid for nid in node_ids if in_degree[nid] > 0])
+    return levels
+
+
+class DAGExecutor:
+    """Runs a DAG of blocking node functions with bounded, per-provider concurrency."""
+
+    def __init__(
+        self,
+        max_workers: int = WORKFLOW_MAX_PARALLEL_NODES,
+        provider_limits: Optional[Dict[str, int]] = None
+    ):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="workflow-node")
+        # Thread semaphores (not asyncio ones): held inside the worker thread,
+        # shared by every event loop in the process
+        self._limits = {
+            provider: threading.BoundedSemaphore(max(1, limit))
+            for provider, limit in (provider_limits or PROVIDER_CONCURRENCY).items()
+        }
+
+    def _call(
+        self,
+        provider: Optional[str],
+        fn: Callable[[], Any],
+        lookup: Optional[Callable[[], Any]] = None,
+        on_start: Optional[Callable[[], None]] = None,
+        sink: Optional[Callable[[str], None]] = None
+    ) -> Tuple[Any, int, bool]:
+        started = time.perf_counter()
+        if on_start is not None:
+            on_start()
+        # Cache hits don't wait for a provider slot
+        if lookup is not None:
+            hit = lookup()
+            if hit is not None:
+                return hit, int((time.perf_counter() - started) * 1000), True
+        limit = self._limits.get(provider) if provider else None
+        _node_context.sink = sink
+        try:
+            if limit is None:
+                output = fn()
+            else:
+                with limit:
+                    output = fn()
+        finally:
+            _node_context.sink = None
+        return output, int((time.perf_counter() - started) * 1000), False
+
+    async def run(
+        self,
+        node_ids: List[int],
+        edges: List[Tuple[int, int]],
+        run_node: Callable[[int, Dict[int, Any]], Any],
+        provider_of: Callable[[int], Optional[str]] = lambda node_id: None,
+        lookup: Optional[Callable[[int, Dict[int, Any]], Any]] = None,
+        on_event: Optional[Callable[[str, int, Optional[NodeOutcome]], None]] = None,
+        on_delta: Optional[Callable[[int, str], None]] = None,
+        completed: Optional[Dict[int, Any]] = None
+    ) -> Dict[int, NodeOutcome]:
+        """
+        Execute every node once its upstream nodes have finished.
+
+        Args:
+            node_ids: Nodes of the graph
+            edges: (from, to) pairs
+            run_node: Blocking fn(node_id, {upstream_id: output}) -> output.
+                Upstream outputs are given in edge order; failed upstream
+                nodes are left out.
+            provider_of: Provider whose concurrency cap applies to a node
+                (None = uncapped, e.g. nodes that make no API call)
+            lookup: Optional blocking fn(node_id, upstream outputs) -> cached
+                output or None; called before run_node, outside the provider cap
+            on_event: fn(kind, node_id, outcome) with kind "node_started"
+                (outcome None) or "node_finished"; called on the event loop
+            on_delta: fn(node_id, text) for streamed output; called on the
+                event loop. Without it current_delta_sink() is None in nodes.
+            completed: {node_id: output} finished by an earlier attempt of the
+                run; they aren't run again (resume from checkpoint)
+
+        Returns:
+            {node_id: NodeOutcome}, in topological order
+
+        Raises:
+            WorkflowCycleError: before any node runs
+        """
+        order = [nid for level in execution_levels(node_ids, edges) for nid in level]
+        known = set(order)
+        upstream: Dict[int, List[int]] = {nid: [] for nid in order}
+        downstream: Dict[int, List[int]] = {nid: [] for nid in order}
+        for src, dst in edges:
+            if src in known and dst in known:
+                upstream[dst].append(src)
+                downstream[src].append(dst)
+
+        outcomes: Dict[int, NodeOutcome] = {
+            nid: NodeOutcome(nid, output=output, resumed=True)
+            for nid, output in (completed or {}).items()
+            if nid in known
+        }
+        remaining = {
+            nid: sum(1 for dep in upstream[nid] if dep not in outcomes)
+            for nid in order
+        }
+        loop = asyncio.get_running_loop()
+        running: Dict[asyncio.Future, int] = {}
+
+        def start(nid: int) -> None:
+            inputs = {
+                dep: outcomes[dep].output
+                for dep in upstream[nid]
+                if outcomes[dep].success
+            }
+            future = loop.run_in_executor(
+                self._pool,
+                self._call,
+                provider_of(nid),
+                lambda: run_node(nid, inputs),
+                (lambda: lookup(nid, inputs)) if lookup else None,
+                (lambda: loop.call_soon_threadsafe(on_event, "node_started", nid, None)) if on_event else None,
+                (lambda text: loop.call_soon_threadsafe(on_delta, nid, text)) if on_delta else None
+            )
+            running[future] = nid
+
+        for nid in order:
+            if remaining[nid] == 0 and nid not in outcomes:
+                start(nid)
+
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                nid = running.pop(future)
+                try:
+                    output, elapsed_ms, cached = future.result()
+                    outcomes[nid] = NodeOutcome(nid, output=output, elapsed_ms=elapsed_ms, cached=cached)
+                except Exception as e:
+                    logger.error(f"[WORKFLOW] Node {nid} failed: {e}")
+                    outcomes[nid] = NodeOutcome(nid, error=e)
+                if on_event is not None:
+                    on_event("node_finished", nid, outcomes[nid])
+                for neighbor in downstream[nid]:
+                    remaining[neighbor] -= 1
+                    if remaining[neighbor] == 0 and neighbor not in outcomes:
+                        start(neighbor)
+
+        return {nid: outcomes[nid] for nid in order}
+
+
+# Global singleton
+dag_executor = DAGExecutor()
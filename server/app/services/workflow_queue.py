@@ -0,0 +1,278 @@
+"""
+Workflow Run Queue
+Workflow runs are executed by a pool of background workers, not inside the
+HTTP request: endpoints enqueue a run (status queued) and follow its events.
+
+- Claiming: UPDATE ... FROM (SELECT ... FOR UPDATE SKIP LOCKED), so any
+  number of workers in any number of processes take distinct runs.
+- Heartbeat: a running run's heartbeat_at is refreshed every
+  WORKFLOW_HEARTBEAT_SECONDS. A run whose heartbeat is older than
+  WORKFLOW_STALE_SECONDS (worker crashed, process killed) is claimed again
+  and resumes from its checkpoint; after WORKFLOW_MAX_ATTEMPTS it fails.
+  Runs still being validated by the API have no heartbeat and are never
+  taken over.
+- Shutdown hands this process's running runs back to the queue.
+- Events (node_started, node_completed, ...) are published in-process to
+  subscribers (run_events); a follower in another process sees node results
+  by polling the run's checkpoint instead.
+
+Metrics (stats()): queue depth, oldest queued run, and queue wait (from
+queued_at) / run times of recently finished runs.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import text
+
+from ..core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW_WORKERS = int(os.getenv("WORKFLOW_WORKERS", "2"))
+WORKFLOW_POLL_SECONDS = float(os.getenv("WORKFLOW_POLL_SECONDS", "2"))
+WORKFLOW_HEARTBEAT_SECONDS = 15
+WORKFLOW_STALE_SECONDS = int(os.getenv("WORKFLOW_STALE_SECONDS", "120"))
+WORKFLOW_MAX_ATTEMPTS = int(os.getenv("WORKFLOW_MAX_ATTEMPTS", "3"))
+
+# Recently finished runs kept for wait/run time metrics
+_TIMINGS_WINDOW = 200
+
+_CLAIM_SQL = text("""
+    UPDATE workflow_runs r
+    SET status = 'running',
+        claimed_by = :worker,
+        heartbeat_at = :now,
+        attempts = r.attempts + 1
+    FROM (
+        SELECT id, started_at, status FROM workflow_runs
+        WHERE status = 'queued'
+           OR (status = 'running' AND heartbeat_at < :stale_before AND attempts < :max_attempts)
+        ORDER BY queued_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ) next
+    WHERE r.id = next.id AND r.started_at = next.started_at
+    RETURNING r.id,
+        CASE WHEN next.status = 'queued' THEN EXTRACT(EPOCH FROM :now - r.queued_at) END AS waited
+""")
+
+# Interrupted too often: give up instead of retrying forever
+_EXHAUSTED_SQL = text("""
+    UPDATE workflow_runs
+    SET status = 'failed',
+        error_message = 'Interrupted ' || attempts || ' times, giving up',
+        completed_at = :now
+    WHERE status = 'running' AND heartbeat_at < :stale_before AND attempts >= :max_attempts
+""")
+
+_HEARTBEAT_SQL = text("""
+    UPDATE workflow_runs SET heartbeat_at = :now
+    WHERE id = :run_id AND claimed_by = :worker AND status = 'running'
+""")
+
+_RELEASE_SQL = text("""
+    UPDATE workflow_runs SET status = 'queued', claimed_by = NULL, queued_at = :now
+    WHERE claimed_by = :worker AND status = 'running'
+""")
+
+_DEPTH_SQL = text("""
+    SELECT COUNT(*) FILTER (WHERE status = 'queued'),
+           COUNT(*) FILTER (WHERE status = 'running'),
+           EXTRACT(EPOCH FROM :now - MIN(queued_at) FILTER (WHERE status = 'queued'))
+    FROM workflow_runs
+    WHERE status IN ('queued', 'running')
+""")
+
+
+class RunEvents:
+    """In-process pub/sub of run progress events (event loop thread only)."""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, run_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(run_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, run_id: int, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(run_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[run_id]
+
+    def publish(self, run_id: int, event: Dict[str, Any]) -> None:
+        for queue in self._subscribers.get(run_id, ()):
+            queue.put_nowait(event)
+
+
+class WorkflowRunQueue:
+    """Postgres-backed queue of workflow runs and the worker pool executing them."""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._timings: deque = deque(maxlen=_TIMINGS_WINDOW)  # (wait_s or None, run_s)
+        self._counters = {"completed": 0, "failed": 0}
+
+    # -------------------------------------------------------------------------
+    # Pool lifecycle
+    # -------------------------------------------------------------------------
+
+    def start(self, workers: int = WORKFLOW_WORKERS) -> None:
+        if self._tasks or workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(workers)]
+        logger.info(f"[OK] Workflow workers started: {workers} ({self.worker_id})")
+
+    async def stop(self) -> None:
+        """Cancel workers and hand their runs back to the queue (they resume elsewhere)."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        released = await asyncio.to_thread(
+            self._execute, _RELEASE_SQL, {"worker": self.worker_id, "now": datetime.utcnow()}
+        )
+        if released:
+            logger.info(f"[OK] Returned {released} running workflow run(s) to the queue")
+
+    def notify(self) -> None:
+        """A run was enqueued: wake an idle local worker now instead of at the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # -------------------------------------------------------------------------
+    # Queue operations (blocking; called via asyncio.to_thread)
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _execute(statement, params: dict) -> int:
+        db = SessionLocal()
+        try:
+            rowcount = db.execute(statement, params).rowcount
+            db.commit()
+            return rowcount
+        finally:
+            db.close()
+
+    def _claim(self) -> Optional[tuple]:
+        now = datetime.utcnow()
+        params = {
+            "worker": self.worker_id,
+            "now": now,
+            "stale_before": now - timedelta(seconds=WORKFLOW_STALE_SECONDS),
+            "max_attempts": WORKFLOW_MAX_ATTEMPTS,
+        }
+        db = SessionLocal()
+        try:
+            failed = db.execute(_EXHAUSTED_SQL, params).rowcount
+            if failed:
+                logger.warning(f"[WARNING] {failed} workflow run(s) failed after {WORKFLOW_MAX_ATTEMPTS} interrupted attempts")
+            row = db.execute(_CLAIM_SQL, params).first()
+            db.commit()
+            if row is None:
+                return None
+            # Stale runs taken over from a dead worker didn't wait in the queue
+            return row.id, float(row.waited) if row.waited is not None else None
+        finally:
+            db.close()
+
+    def _heartbeat(self, run_id: int) -> None:
+        self._execute(_HEARTBEAT_SQL, {"now": datetime.utcnow(), "run_id": run_id, "worker": self.worker_id})
+
+    # -------------------------------------------------------------------------
+    # Workers
+    # -------------------------------------------------------------------------
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            try:
+                claimed = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.error(f"[ERROR] Workflow worker {n}: claim failed: {e}")
+                claimed = None
+
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=WORKFLOW_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            run_id, waited = claimed
+            await self._run(run_id, waited)
+
+    async def _run(self, run_id: int, waited: Optional[float]) -> None:
+        # Executor lives with the node processors in the API module
+        from ..api.workflows import execute_queued_run
+
+        heartbeat = asyncio.create_task(self._heartbeats(run_id))
+        started = time.perf_counter()
+        try:
+            status = await execute_queued_run(run_id, lambda event: run_events.publish(run_id, event))
+            self._counters["completed" if status == "completed" else "failed"] += 1
+        except Exception as e:
+            logger.error(f"[ERROR] Workflow run {run_id} crashed: {e}")
+            self._counters["failed"] += 1
+        finally:
+            heartbeat.cancel()
+            self._timings.append((waited, time.perf_counter() - started))
+
+    async def _heartbeats(self, run_id: int) -> None:
+        while True:
+            await asyncio.sleep(WORKFLOW_HEARTBEAT_SECONDS)
+            try:
+                await asyncio.to_thread(self._heartbeat, run_id)
+            except Exception as e:
+                logger.warning(f"[WARNING] Heartbeat for workflow run {run_id} failed: {e}")
+
+    # -------------------------------------------------------------------------
+    # Metrics
+    # -------------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        queued = running = oldest = None
+        db = SessionLocal()
+        try:
+            queued, running, oldest = db.execute(_DEPTH_SQL, {"now": datetime.utcnow()}).one()
+        except Exception as e:
+            logger.warning(f"[WARNING] Workflow queue stats unavailable: {e}")
+        finally:
+            db.close()
+
+        timings = list(self._timings)
+        waits = sorted(t[0] for t in timings if t[0] is not None)
+        runs = sorted(t[1] for t in timings)
+
+        def p95(values):
+            return round(values[int(len(values) * 0.95)], 2) if values else None
+
+        return {
+            "workers": len(self._tasks),
+            "worker_id": self.worker_id,
+            "queued": queued,
+            "running": running,
+            "oldest_queued_seconds": round(float(oldest), 1) if oldest is not None else None,
+            "wait_seconds_avg": round(sum(waits) / len(waits), 2) if waits else None,
+            "wait_seconds_p95": p95(waits),
+            "run_seconds_avg": round(sum(runs) / len(runs), 2) if runs else None,
+            "run_seconds_p95": p95(runs),
+            **self._counters,
+        }
+
+
+# Global singletons
+run_events = RunEvents()
+workflow_queue = WorkflowRunQueue()
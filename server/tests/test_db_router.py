@@ -0,0 +1,139 @@
+"""
+Read replica routing against real databases: reads go to the replica, a user's
+own commit pins their reads to the primary, and a lagging or unreachable
+replica falls back to the primary.
+
+Needs DATABASE_URL (primary) and DATABASE_REPLICA_URL; skipped otherwise. The
+replica URL may point at the primary itself (not in recovery -> lag 0).
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+if not (os.getenv("DATABASE_URL") and os.getenv("DATABASE_REPLICA_URL")):
+    pytest.skip("DATABASE_URL and DATABASE_REPLICA_URL are not set", allow_module_level=True)
+
+from sqlalchemy import text
+
+from app.core import db_router
+from app.core.database import SessionLocal, engine as primary_engine
+from app.core.db_router import ReplicaRouter
+from app.db.models import UserSettings
+
+
+@pytest.fixture
+def router(monkeypatch):
+    # In-process write markers, and the after_commit hook feeds this router
+    monkeypatch.setattr(db_router, "get_redis", lambda: None)
+    r = ReplicaRouter(replica_url=os.environ["DATABASE_REPLICA_URL"], max_lag_seconds=5, sticky_seconds=5)
+    monkeypatch.setattr(db_router, "replica_router", r)
+    yield r
+    if r._engine is not None:
+        r._engine.dispose()
+
+
+def _routed_to_replica(router, session) -> bool:
+    try:
+        session.execute(text("SELECT 1"))
+        return session.get_bind() is router._engine
+    finally:
+        session.close()
+
+
+def test_reads_go_to_replica(router):
+    assert _routed_to_replica(router, router.read_session(user_id=2))
+    assert router.replica_lag() is not None
+    assert router.stats()["replica"] == 1
+
+
+def test_replica_sessions_refuse_writes(router):
+    session = router.read_session()
+    try:
+        assert session.get_bind() is router._engine
+        session.add(UserSettings(user_id=2))
+        with pytest.raises(RuntimeError):
+            session.flush()
+    finally:
+        session.rollback()
+        session.close()
+
+
+def test_commit_pins_user_to_primary(router):
+    db = SessionLocal()
+    db.info["user_id"] = 2
+    try:
+        db.execute(text("SELECT 1"))
+        db.commit()
+    finally:
+        db.close()
+
+    session = router.read_session(user_id=2)
+    try:
+        assert session.get_bind() is primary_engine
+    finally:
+        session.close()
+    # Other users keep reading from the replica
+    assert _routed_to_replica(router, router.read_session(user_id=3))
+    assert router.stats()["primary_sticky"] == 1
+
+
+def test_sticky_window_expires(router):
+    router.sticky_seconds = 0.05
+    router.mark_write(2)
+    assert router.recently_wrote(2)
+
+    time.sleep(0.1)
+    assert not router.recently_wrote(2)
+    assert _routed_to_replica(router, router.read_session(user_id=2))
+
+
+def test_lagging_replica_falls_back_to_primary(router, monkeypatch):
+    monkeypatch.setattr(router, "_measure_lag", lambda: router.max_lag_seconds + 1)
+
+    assert not _routed_to_replica(router, router.read_session(user_id=2))
+    assert router.stats()["primary_lag"] == 1
+
+
+def test_unreachable_replica_falls_back_to_primary(monkeypatch):
+    monkeypatch.setattr(db_router, "get_redis", lambda: None)
+    r = ReplicaRouter(
+        replica_url="postgresql+psycopg2://nobody@127.0.0.1:1/none?connect_timeout=1",
+        max_lag_seconds=5,
+        sticky_seconds=5
+    )
+    session = r.read_session(user_id=2)
+    try:
+        assert session.get_bind() is primary_engine
+    finally:
+        session.close()
+        r._engine.dispose()
+    assert r.replica_lag() is None
+    assert r.stats()["primary_lag"] == 1
+
+
+def test_lag_probe_does_not_block_writes_or_reads(router, monkeypatch):
+    probing, release = threading.Event(), threading.Event()
+
+    def slow_probe():
+        probing.set()
+        release.wait(5)
+        return 0.0
+
+    monkeypatch.setattr(router, "_measure_lag", slow_probe)
+    prober = threading.Thread(target=router.replica_lag)
+    prober.start()
+    try:
+        assert probing.wait(5)
+        started = time.monotonic()
+        router.mark_write(2)
+        assert router.recently_wrote(2)
+        # Concurrent readers get the cached value (none yet -> primary)
+        assert router.replica_lag() is None
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+        prober.join()
+    assert router.replica_lag() == 0.0
@@ -0,0 +1,77 @@
+"""
+Stored image reference check: shared Storage objects are kept while any video
+or other competitor still points at them, matched on the trigger-maintained
+storage paths rather than URL text.
+
+Needs DATABASE_URL pointing at a migrated database; skipped otherwise.
+"""
+
+import os
+import uuid
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from app.core.database import SessionLocal
+from app.db.models import Competitor, User, Video
+from app.services.image_index import stored_image_index
+
+STORAGE = "https://project.supabase.co/storage/v1/object/public/rizko-images/"
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    user = User(email=f"image-index-{uuid.uuid4().hex}@example.com")
+    session.add(user)
+    session.commit()
+    session.info["user_id"] = user.id
+    yield session
+    session.rollback()
+    # Competitors cascade in the database
+    session.query(Video).filter(Video.platform_id.startswith(f"ii-{user.id}-")).delete(synchronize_session=False)
+    session.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+    session.commit()
+    session.close()
+
+
+def test_paths_follow_image_urls(db):
+    user_id = db.info["user_id"]
+    video = Video(platform_id=f"ii-{user_id}-1", cover_url=STORAGE + "thumbnails/v.jpg?width=200", stats={})
+    competitor = Competitor(
+        user_id=user_id, username="ii", avatar_url=STORAGE + "avatars/a.jpg",
+        recent_videos=[{"cover_url": STORAGE + "thumbnails/r.jpg", "thumbnail_url": None}, "not a video"],
+    )
+    db.add_all([video, competitor])
+    db.commit()
+
+    assert video.cover_path == "thumbnails/v.jpg"
+    assert sorted(competitor.image_paths) == ["avatars/a.jpg", "thumbnails/r.jpg"]
+
+    video.cover_url = "https://p16-sign.tiktokcdn.com/cover.jpg"
+    competitor.recent_videos = []
+    db.commit()
+
+    assert video.cover_path is None
+    assert competitor.image_paths == ["avatars/a.jpg"]
+
+
+def test_unreferenced_skips_shared_objects(db):
+    user_id = db.info["user_id"]
+    tag = uuid.uuid4().hex
+    shared, own, cover = f"avatars/{tag}.jpg", f"thumbnails/own-{tag}.jpg", f"thumbnails/cover-{tag}.jpg"
+    deleted = Competitor(
+        user_id=user_id, username="deleted", avatar_url=STORAGE + shared,
+        recent_videos=[{"cover_url": STORAGE + own}, {"thumbnail_url": STORAGE + cover}],
+    )
+    db.add_all([
+        deleted,
+        Competitor(user_id=user_id, username="other", avatar_url=STORAGE + shared, recent_videos=[]),
+        Video(platform_id=f"ii-{user_id}-2", cover_url=STORAGE + cover, stats={}),
+    ])
+    db.commit()
+
+    assert stored_image_index.unreferenced([shared, own, cover], exclude_competitor_id=deleted.id) == [own]
+    assert stored_image_index.unreferenced([own]) == []  # Still on the competitor itself
@@ -0,0 +1,46 @@
+"""
+LLM gateway thread pool: calls awaited through run() wait on the gateway's own
+threads, so a burst of budget waits can't starve asyncio.to_thread() users.
+"""
+
+import asyncio
+import contextvars
+import threading
+
+from app.services.llm_gateway import LLMGateway
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_run_keeps_default_executor_free():
+    gateway = LLMGateway(providers={}, max_workers=2)
+    release = threading.Event()
+
+    def waiting_for_budget():
+        release.wait(5)
+        return threading.current_thread().name
+
+    async def scenario():
+        # Twice as many waiting calls as the gateway has threads
+        calls = [asyncio.ensure_future(gateway.run(waiting_for_budget)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        # Other blocking work still gets a default executor thread right away
+        other = await asyncio.wait_for(asyncio.to_thread(lambda: "done"), timeout=1)
+        release.set()
+        return other, await asyncio.gather(*calls)
+
+    other, threads = asyncio.run(scenario())
+
+    assert other == "done"
+    assert all(name.startswith("llm-gateway") for name in threads)
+    assert len(set(threads)) <= 2
+
+
+def test_run_passes_arguments_and_context():
+    gateway = LLMGateway(providers={}, max_workers=1)
+
+    async def scenario():
+        request_id.set("req-1")
+        return await gateway.run(lambda prefix, suffix="": f"{prefix}{request_id.get()}{suffix}", "id=", suffix="!")
+
+    assert asyncio.run(scenario()) == "id=req-1!"
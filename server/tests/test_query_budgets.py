@@ -0,0 +1,132 @@
+"""
+Query budgets for endpoints that used to run one query per item (N+1). Each
+request is served with more items than its budget allows queries, so a
+regression to per-item queries fails here.
+
+Needs DATABASE_URL pointing at a migrated database; skipped otherwise.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from fastapi.testclient import TestClient
+
+from app.core.database import SessionLocal
+from app.core.security import create_access_token
+from app.core.sql_instrumentation import query_budget
+from app.db.models import ChatMessage, ChatSession, User, UserFavorite, Video
+from app.db.models import SearchMode
+from app.main import app
+from app.services.trend_upsert import bulk_upsert_trends
+
+ITEMS = 20
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(email=f"query-budget-{uuid.uuid4().hex}@example.com", full_name="Query Budget")
+    db.add(user)
+    db.commit()
+    yield user
+    db.rollback()
+    # Trends, favorites and chat rows cascade in the database
+    db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+    db.query(Video).filter(Video.platform_id.startswith(f"qb-{user.id}-")).delete(synchronize_session=False)
+    db.commit()
+
+
+@pytest.fixture
+def client(user):
+    token = create_access_token({"sub": str(user.id)})
+    return TestClient(app, headers={"Authorization": f"Bearer {token}"})
+
+
+@pytest.fixture
+def trend_ids(db, user):
+    trends = bulk_upsert_trends(db, [
+        {
+            "user_id": user.id,
+            "platform_id": f"qb-{user.id}-{i}",
+            "url": f"https://www.tiktok.com/@qb/video/{i}",
+            "description": f"video {i}",
+            "stats": {"playCount": i},
+            "initial_stats": {"playCount": i},
+            "author_username": "qb",
+            "uts_score": 1.0,
+            "vertical": "test",
+            "search_mode": SearchMode.KEYWORDS,
+        }
+        for i in range(ITEMS)
+    ])
+    db.commit()
+    return [trend.id for trend in trends]
+
+
+def test_chat_sessions_list(client, db, user):
+    now = datetime.utcnow()
+    for i in range(ITEMS):
+        session_id = str(uuid.uuid4())
+        db.add(ChatSession(user_id=user.id, session_id=session_id, title=f"chat {i}", message_count=2))
+        db.add_all([
+            ChatMessage(user_id=user.id, session_id=session_id, role="user", content="hi",
+                        created_at=now - timedelta(minutes=1)),
+            ChatMessage(user_id=user.id, session_id=session_id, role="assistant", content=f"reply {i}",
+                        created_at=now),
+        ])
+    db.commit()
+
+    with query_budget(4, max_repeats=1) as served:
+        response = client.get("/api/chat-sessions/")
+
+    assert response.status_code == 200
+    assert len(served) == 1
+    sessions = response.json()
+    assert len(sessions) == ITEMS
+    assert {s["last_message"] for s in sessions} == {f"reply {i}" for i in range(ITEMS)}
+
+
+def test_bulk_add_favorites(client, db, user, trend_ids):
+    # One already favorited, one unknown: both go through the batch lookups too
+    db.add(UserFavorite(user_id=user.id, trend_id=trend_ids[0]))
+    db.commit()
+
+    with query_budget(8, max_repeats=1) as served:
+        response = client.post("/api/favorites/bulk", json={"trend_ids": trend_ids + [0], "tags": ["qb"]})
+
+    assert response.status_code == 200
+    assert len(served) == 1
+    body = response.json()
+    assert body["success_count"] == ITEMS - 1
+    assert body["failed_count"] == 2
+    assert db.query(UserFavorite).filter(UserFavorite.user_id == user.id).count() == ITEMS
+
+
+def test_bulk_delete_favorites(client, db, user, trend_ids):
+    favorites = [UserFavorite(user_id=user.id, trend_id=trend_id) for trend_id in trend_ids]
+    db.add_all(favorites)
+    db.commit()
+    favorite_ids = [favorite.id for favorite in favorites]
+
+    with query_budget(8, max_repeats=1) as served:
+        response = client.request("DELETE", "/api/favorites/bulk", json={"favorite_ids": favorite_ids + [0]})
+
+    assert response.status_code == 200
+    assert len(served) == 1
+    body = response.json()
+    assert body["success_count"] == ITEMS
+    assert body["failed_count"] == 1
+    db.expire_all()
+    assert db.query(UserFavorite).filter(UserFavorite.user_id == user.id).count() == 0
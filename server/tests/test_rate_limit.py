@@ -0,0 +1,94 @@
+"""
+GCRA rate limit stores: the in-memory store and the Redis Lua script (run
+against fakeredis) must agree on bursts, refills, retry_after and counters.
+"""
+
+import time
+
+import pytest
+
+from app.core.rate_limit import InMemoryRateLimitStore, RedisRateLimitStore
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis runs Lua scripts through lupa
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return InMemoryRateLimitStore()
+    return RedisRateLimitStore(fakeredis.FakeRedis())
+
+
+def test_gcra_allows_burst_up_to_limit(store):
+    results = [store.gcra("user:1", limit=5, period=60) for _ in range(6)]
+
+    assert [r.allowed for r in results] == [True] * 5 + [False]
+    assert [r.remaining for r in results[:5]] == [4, 3, 2, 1, 0]
+    # Next slot frees up one emission interval (60 / 5) later
+    assert results[-1].retry_after == pytest.approx(12, abs=0.5)
+    assert results[-1].reset_after == pytest.approx(60, abs=0.5)
+
+
+def test_gcra_keys_are_independent(store):
+    for _ in range(3):
+        store.gcra("user:1", limit=3, period=60)
+
+    assert not store.gcra("user:1", limit=3, period=60).allowed
+    assert store.gcra("user:2", limit=3, period=60).allowed
+
+
+def test_gcra_refills_one_interval_at_a_time(store):
+    for _ in range(2):
+        assert store.gcra("user:1", limit=2, period=1).allowed
+    assert not store.gcra("user:1", limit=2, period=1).allowed
+
+    time.sleep(0.55)  # One interval (0.5s): exactly one request again
+    assert store.gcra("user:1", limit=2, period=1).allowed
+    assert not store.gcra("user:1", limit=2, period=1).allowed
+
+
+def test_gcra_cost_zero_only_reports(store):
+    store.gcra("user:1", limit=10, period=60)
+
+    peek = store.gcra("user:1", limit=10, period=60, cost=0)
+    assert peek.allowed and peek.remaining == 9
+    assert store.gcra("user:1", limit=10, period=60, cost=0).remaining == 9
+
+
+def test_gcra_cost_larger_than_remaining_is_rejected(store):
+    assert store.gcra("tokens", limit=100, period=60, cost=80).allowed
+
+    rejected = store.gcra("tokens", limit=100, period=60, cost=30)
+    assert not rejected.allowed
+    assert rejected.retry_after == pytest.approx(6, abs=0.5)  # 10 units at 0.6s each
+    assert store.gcra("tokens", limit=100, period=60, cost=20).allowed
+
+
+def test_hit_counter_stops_at_limit(store):
+    hits = [store.hit_counter("deep:1", limit=2, ttl_seconds=60) for _ in range(3)]
+
+    assert hits == [(True, 1), (True, 2), (False, 2)]
+    assert store.get_counter("deep:1") == 2
+    assert store.get_counter("deep:2") == 0
+
+
+def test_redis_store_sets_expiry():
+    client = fakeredis.FakeRedis()
+    store = RedisRateLimitStore(client, prefix="rl:")
+
+    store.gcra("user:1", limit=10, period=60)
+    store.hit_counter("deep:1", limit=5, ttl_seconds=30)
+
+    assert 0 < client.pttl("rl:user:1") <= 6000  # TAT is one interval ahead
+    assert 0 < client.pttl("rl:deep:1") <= 30000
+
+
+def test_redis_store_fails_open():
+    server = fakeredis.FakeServer()
+    server.connected = False  # Every command raises ConnectionError
+    store = RedisRateLimitStore(fakeredis.FakeRedis(server=server))
+
+    assert store.gcra("user:1", limit=1, period=60).allowed
+    assert store.hit_counter("deep:1", limit=1, ttl_seconds=60) == (True, 0)
+    assert store.get_counter("deep:1") == 0
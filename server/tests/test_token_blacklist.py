@@ -0,0 +1,116 @@
+"""
+Token blacklist on a shared store (fakeredis): revocations reach other
+workers through the log's delta sync, re-pulls don't double count, a
+saturated Bloom filter is rebuilt, and a store outage fails closed.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.security import TokenBlacklist
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis runs Lua scripts through lupa
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def worker(server, **kwargs) -> TokenBlacklist:
+    """One uvicorn worker's blacklist, sharing the store with the others."""
+    kwargs.setdefault("sync_seconds", 0)
+    return TokenBlacklist(fakeredis.FakeRedis(server=server), **kwargs)
+
+
+def test_revocation_reaches_other_workers(server):
+    a, b = worker(server), worker(server)
+    assert not b.is_blacklisted("jti-1")
+
+    a.blacklist("jti-1", time.time() + 600)
+
+    assert b.is_blacklisted("jti-1")
+    assert not b.is_blacklisted("jti-2")
+
+
+def test_expired_revocations_are_not_synced(server):
+    a, b = worker(server), worker(server)
+    a.blacklist("live", time.time() + 600)
+    # Logged while still valid, expired by the time the other worker syncs
+    client = fakeredis.FakeRedis(server=server)
+    client.zadd(TokenBlacklist.LOG_KEY, {f"expired:{int(time.time()) - 1}": time.time()})
+
+    b.is_blacklisted("live")
+
+    assert b._bloom.count == 1
+    assert not b.is_blacklisted("expired")
+
+
+def test_resync_skips_entries_at_the_watermark(server):
+    b = worker(server)
+    client = fakeredis.FakeRedis(server=server)
+    exp = int(time.time()) + 600
+    # Two revocations in the same instant: both sit at the watermark score
+    client.zadd(TokenBlacklist.LOG_KEY, {f"jti-1:{exp}": 1000.0, f"jti-2:{exp}": 1000.0})
+
+    for _ in range(3):
+        b.is_blacklisted("other")
+
+    assert b._bloom.count == 2
+    assert b._watermark == 1000.0
+
+    client.zadd(TokenBlacklist.LOG_KEY, {f"jti-3:{exp}": 1001.0})
+    b.is_blacklisted("other")
+    assert b._bloom.count == 3
+
+
+def test_saturated_filter_is_rebuilt(server):
+    a, b = worker(server), worker(server, bloom_capacity=2)
+    for i in range(3):
+        a.blacklist(f"jti-{i}", time.time() + 600)
+        b.is_blacklisted("other")
+    assert b._bloom.saturated
+
+    b.is_blacklisted("other")  # Next sync rebuilds from the whole log
+
+    assert not b._bloom.saturated
+    assert b._bloom.capacity == 6
+    assert b._bloom.count == 3
+    assert all(b.is_blacklisted(f"jti-{i}") for i in range(3))
+
+
+def test_store_outage_fails_closed_on_filter_hits(server):
+    a, b = worker(server), worker(server, sync_seconds=60)
+    a.blacklist("revoked", time.time() + 600)
+    assert b.is_blacklisted("revoked")
+
+    server.connected = False
+
+    # A filter hit can't be confirmed -> rejected; a filter miss needs no store
+    assert b.is_blacklisted("revoked")
+    assert not b.is_blacklisted("never-revoked")
+
+
+def test_cached_verdict_needs_no_store_for_misses(server):
+    a, b = worker(server), worker(server, sync_seconds=60)
+    a.blacklist("revoked", time.time() + 600)
+
+    assert b.cached_verdict("anything") is None  # First sync due
+    assert asyncio.run(b.is_blacklisted_async("anything")) is False
+
+    assert b.cached_verdict("anything") is False
+    assert b.cached_verdict("revoked") is None  # Filter hit: confirm in a thread
+    assert asyncio.run(b.is_blacklisted_async("revoked")) is True
+
+
+def test_without_shared_store_revocations_stay_local():
+    blacklist = TokenBlacklist(sync_seconds=0)
+    blacklist._client_resolved = True  # No REDIS_URL
+
+    blacklist.blacklist("jti-1", time.time() + 600)
+
+    assert blacklist.cached_verdict("jti-1") is True
+    assert blacklist.cached_verdict("jti-2") is False
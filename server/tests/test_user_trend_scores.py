@@ -0,0 +1,82 @@
+"""
+Per-user scoring on a shared catalog video: one user's deep search, visual
+clustering or rescan must not change another user's uts_score / cluster_id.
+
+Needs DATABASE_URL pointing at a migrated database; skipped otherwise.
+"""
+
+import os
+import uuid
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from app.core.database import SessionLocal
+from app.db.models import SearchMode, Trend, User, Video
+from app.services.scheduler import _set_scores
+from app.services.trend_upsert import bulk_upsert_trends
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def users(db):
+    users = [User(email=f"trend-scores-{uuid.uuid4().hex}@example.com") for _ in range(2)]
+    db.add_all(users)
+    db.commit()
+    platform_id = f"ts-{users[0].id}"
+    yield users, platform_id
+    db.rollback()
+    # User trends cascade in the database
+    db.query(User).filter(User.id.in_([u.id for u in users])).delete(synchronize_session=False)
+    db.query(Video).filter(Video.platform_id == platform_id).delete(synchronize_session=False)
+    db.commit()
+
+
+def _upsert(db, user, platform_id, score):
+    trend = bulk_upsert_trends(db, [{
+        "user_id": user.id,
+        "platform_id": platform_id,
+        "url": f"https://www.tiktok.com/@ts/video/{platform_id}",
+        "stats": {"playCount": 100},
+        "initial_stats": {"playCount": 100},
+        "uts_score": score,
+        "vertical": "test",
+        "search_mode": SearchMode.KEYWORDS,
+    }])[0]
+    db.commit()
+    return trend
+
+
+def _scores(db, users):
+    db.expire_all()
+    return [
+        db.query(Trend.uts_score, Trend.cluster_id).filter(Trend.user_id == u.id).one()
+        for u in users
+    ]
+
+
+def test_scores_and_clusters_stay_per_user(db, users):
+    users, platform_id = users
+    first = _upsert(db, users[0], platform_id, 10.0)
+    first.cluster_id = 3  # What cluster_trends_by_visuals assigns
+    db.commit()
+
+    second = _upsert(db, users[1], platform_id, 80.0)
+    second.cluster_id = -1
+    db.commit()
+
+    assert first.video_id == second.video_id
+    assert _scores(db, users) == [(10.0, 3), (80.0, -1)]
+
+    _set_scores(db, users[0].id, {first.video_id: 42.0})  # users[0]'s rescan
+    db.commit()
+
+    assert _scores(db, users) == [(42.0, 3), (80.0, -1)]
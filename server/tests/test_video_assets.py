@@ -0,0 +1,92 @@
+"""
+Video asset registry: one download/upload in flight per video, even while
+releases sweep expired assets of the same video, and every upload is deleted.
+"""
+
+import threading
+import time
+from itertools import count
+
+import pytest
+
+from app.services import video_assets
+from app.services.video_assets import VideoAssetManager
+
+
+class FakeGemini:
+    """Stands in for download_video / upload_to_gemini / delete_from_gemini."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = count()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.uploaded = []
+        self.deleted = []
+
+    def download_video(self, url):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.002)
+        return f"/nonexistent/{url}.mp4"
+
+    def upload_to_gemini(self, file_path):
+        with self._lock:
+            self.in_flight -= 1
+            name = f"files/{next(self._ids)}"
+            self.uploaded.append(name)
+        return type("GeminiFile", (), {"name": name})()
+
+    def delete_from_gemini(self, gemini_file):
+        with self._lock:
+            self.deleted.append(gemini_file.name)
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    fake = FakeGemini()
+    for name in ("download_video", "upload_to_gemini", "delete_from_gemini"):
+        monkeypatch.setattr(video_assets, name, getattr(fake, name))
+    return fake
+
+
+def test_reuses_asset_while_in_use(gemini):
+    manager = VideoAssetManager(ttl_seconds=0)
+    first = manager.acquire("video")
+    second = manager.acquire("video")
+
+    assert first is second
+    assert gemini.uploaded == ["files/0"]
+
+    manager.release(first)
+    assert gemini.deleted == []
+    manager.release(second)
+    assert gemini.deleted == ["files/0"]
+    assert manager.stats()["assets"] == 0
+
+
+def test_single_flight_while_sweeping(gemini):
+    manager = VideoAssetManager(ttl_seconds=0)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(50):
+                asset = manager.acquire("video")
+                assert asset is not None
+                manager.release(asset)
+        except Exception as e:  # Surface assertion errors from threads
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert gemini.max_in_flight == 1
+    # Nothing left behind: every upload was deleted exactly once
+    assert manager.stats()["assets"] == 0
+    assert sorted(gemini.deleted) == sorted(gemini.uploaded)
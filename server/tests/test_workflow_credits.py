@@ -0,0 +1,117 @@
+"""
+Workflow node charging: an AI node is charged before it runs and refunded
+when the provider fails, including failures a node processor catches and
+turns into error text.
+
+Needs DATABASE_URL pointing at a migrated database; skipped otherwise.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import CreditManager
+from app.core.database import SessionLocal
+from app.core.security import create_access_token
+from app.db.models import User
+from app.main import app
+from app.services import llm_gateway as gateway_module
+from app.services.llm_gateway import llm_gateway
+
+BALANCE = 50
+GENERATE_COST = CreditManager.get_workflow_node_cost("generate", "gemini")
+
+WORKFLOW = {
+    "nodes": [
+        {"id": 1, "type": "brand", "brandData": {"name": "Acme"}},
+        {"id": 2, "type": "generate"},
+    ],
+    "connections": [{"from": 1, "to": 2}],
+    "use_cache": False,
+}
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class StubGemini:
+    """genai.Client stand-in: models.generate_content returns text or raises."""
+
+    def __init__(self, error=None):
+        self.models = self
+        self._error = error
+
+    def generate_content(self, model, contents, config=None):
+        if self._error:
+            raise self._error
+        return SimpleNamespace(text="Hook. Body. Call to action.", usage_metadata=None)
+
+    def generate_content_stream(self, model, contents, config=None):
+        yield self.generate_content(model, contents, config)
+
+
+@pytest.fixture
+def user():
+    db = SessionLocal()
+    user = User(
+        email=f"workflow-credits-{uuid.uuid4().hex}@example.com",
+        credits=BALANCE,
+        credits_reset_at=datetime.utcnow() + timedelta(days=20),
+    )
+    db.add(user)
+    db.commit()
+    yield user
+    db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+def _balance(user_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(User.credits).filter(User.id == user_id).scalar()
+    finally:
+        db.close()
+
+
+def _run(user, monkeypatch, client):
+    monkeypatch.setitem(llm_gateway._clients, "gemini", client)
+    monkeypatch.setattr(gateway_module, "LLM_MAX_RETRIES", 0)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+    with TestClient(app) as http:
+        response = http.post("/api/workflows/execute", json=WORKFLOW, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_successful_node_is_charged(user, monkeypatch):
+    body = _run(user, monkeypatch, StubGemini())
+
+    assert body["credits_used"] == GENERATE_COST
+    assert _balance(user.id) == BALANCE - GENERATE_COST
+
+
+@pytest.mark.parametrize("client", [
+    StubGemini(ProviderError(503)),  # 5xx after retries
+    StubGemini(ProviderError(429)),  # Still rate limited -> LLMRateLimitError
+    None,                            # No API key -> LLMUnavailableError
+], ids=["server-error", "rate-limited", "unavailable"])
+def test_provider_failure_is_refunded(user, monkeypatch, client):
+    body = _run(user, monkeypatch, client)
+
+    generate = next(r for r in body["results"] if r["node_id"] == 2)
+    assert generate["content"].startswith("Generation error")
+    assert generate["credits"] == 0
+    assert body["credits_used"] == 0
+    assert _balance(user.id) == BALANCE